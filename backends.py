@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import time
+import importlib
+
+from formulator import Formulator
+from profiler import profiler
+
+INF = float('inf')
+
+
+class Result:
+    # the solution of a model solved in-process, e.g.
+    #   status: 'optimal', 'feasible' (stopped at the time limit), 'infeasible', or 'unknown'
+    #   selected_tcs: the selected test cases, including those fixed to 1 by the reduction
+    #   values: variable -> value, for every variable of the model (t and v_)
+    def __init__(self, backend, status, objective, values, selected_tcs, bound=None, elapsed=0.0):
+        self.backend = backend
+        self.status = status
+        self.objective = objective
+        self.values = values
+        self.selected_tcs = selected_tcs
+        self.bound = bound
+        self.elapsed = elapsed
+
+    def save(self, proj_dir, name, tc_list):
+        # e.g. t6                              0
+        #      t57                             1
+        # the same format as the solutions of solver.py, so that generator.py can read it
+        out_path = os.path.join(proj_dir, name + '.' + self.backend + '.sol')
+        selected_tcs = set(self.selected_tcs)
+        with open(out_path, 'w') as f:
+            for tc in tc_list:
+                f.write('%-32s%d\n' % (tc, 1 if tc in selected_tcs else 0))
+        return out_path
+
+
+class Backend:
+    # pass the model built by the formulator straight to an ILP solver through its Python API,
+    # instead of writing a model file, running the solver, and parsing its output;
+    # the solvers read the arrays of the Model of model.py (variable ids in model.names):
+    #   objective: [(variable index, coefficient)]
+    #   rows:      [([variable index], [coefficient], lower, upper)]
+    # a subclass solves them in run(hint) -> (status, objective value, [value of each variable], best bound),
+    # hint being [(variable index, value)] of an initial solution, or None
+    name = None
+    module = None  # the Python API of the solver, imported only when the backend is used
+
+    def __init__(self, formulator, time_limit=None):
+        self.formulator = formulator
+        self.config = formulator.config
+        self.time_limit = time_limit
+        self.minimize = 'min' in self.config['min_or_max'].lower()
+        self.all_tcs = list(formulator.tc_list)  # before the reduction, if any
+        # Nemo-Nonlinear needs a nonlinear solver, e.g. Couenne with the couenne_ampl output format
+        assert not self.config['nonlinear'] or self.config['relax'], \
+            'the %s backend cannot solve the nonlinear objective of %s: set "relax": true (Nemo-Aux), ' \
+            'or write couenne_ampl for Couenne' % (self.name, self.config['name'])
+        with profiler.stage('build'):
+            self.model = formulator.get_model()
+        self.var_names = self.model.names
+        self.var_index = self.model.index
+        self.objective = list(self.model.iter_objective())
+        self.rows = [(list(indices), list(coeffs), lower, upper)
+                     for indices, coeffs, lower, upper in self.model.iter_bounds()]
+
+    @classmethod
+    def is_available(cls):
+        try:
+            importlib.import_module(cls.module)
+        except ImportError:
+            return False
+        return True
+
+    def solve(self, start=None):
+        # start: a previous selection of test cases, passed to the solver as a (partial) initial solution
+        begin = time.time()
+        hint = None
+        if start is not None:
+            start = set(start)
+            hint = [(self.var_index[tc], 1.0 if tc in start else 0.0) for tc in self.formulator.tc_list]
+        with profiler.stage('solve'):
+            status, objective, values, bound = self.run(hint)
+        values = dict(zip(self.var_names, values)) if values is not None else dict()
+        selected_tcs = list()
+        if self.formulator.reduction is not None:
+            selected_tcs.extend(self.formulator.reduction['fixed_to_one'])
+            offset = self.formulator.reduction['objective_offset']
+            objective = objective + offset if objective is not None else None
+            bound = bound + offset if bound is not None else None
+        selected_tcs.extend(tc for tc in self.formulator.tc_list if values.get(tc, 0) > 0.5)
+        return Result(self.name, status, objective, values, selected_tcs, bound, time.time() - begin)
+
+
+class HighsBackend(Backend):
+    name = 'highs'
+    module = 'highspy'
+
+    def run(self, hint=None):
+        import highspy
+        h = highspy.Highs()
+        h.setOptionValue('output_flag', False)
+        if self.time_limit is not None:
+            h.setOptionValue('time_limit', float(self.time_limit))
+        n = len(self.var_names)
+        if n == 0:  # e.g. every test case fixed by the reduction, which HiGHS reports as kModelEmpty
+            return 'optimal', 0.0, [], 0.0
+        costs = [0.0] * n
+        for i, coeff in self.objective:
+            costs[i] += coeff
+        h.addCols(n, costs, [0.0] * n, [1.0] * n, 0, [], [], [])
+        h.changeColsIntegrality(n, list(range(n)), [highspy.HighsVarType.kInteger] * n)
+        for indices, coeffs, lower, upper in self.rows:
+            lower = -highspy.kHighsInf if lower == -INF else lower
+            upper = highspy.kHighsInf if upper == INF else upper
+            h.addRow(lower, upper, len(indices), indices, coeffs)
+        h.changeObjectiveSense(highspy.ObjSense.kMinimize if self.minimize else highspy.ObjSense.kMaximize)
+        if hint:
+            h.setSolution(len(hint), [i for i, _ in hint], [v for _, v in hint])
+        h.run()
+        model_status = h.getModelStatus()
+        info = h.getInfo()
+        if model_status == highspy.HighsModelStatus.kOptimal:
+            status = 'optimal'
+        elif model_status == highspy.HighsModelStatus.kInfeasible:
+            return 'infeasible', None, None, None
+        elif info.primal_solution_status == 2:  # a feasible solution, e.g. at the time limit
+            status = 'feasible'
+        else:
+            return 'unknown', None, None, None
+        return status, info.objective_function_value, list(h.getSolution().col_value), info.mip_dual_bound
+
+
+class PulpBackend(Backend):
+    name = 'pulp'
+    module = 'pulp'
+
+    def run(self, hint=None):
+        import pulp
+        prob = pulp.LpProblem(self.config['name'], pulp.LpMinimize if self.minimize else pulp.LpMaximize)
+        xs = [pulp.LpVariable(name, cat='Binary') for name in self.var_names]
+        prob += pulp.lpSum(coeff * xs[i] for i, coeff in self.objective)
+        for indices, coeffs, lower, upper in self.rows:
+            lhs = pulp.lpSum(coeff * xs[i] for i, coeff in zip(indices, coeffs))
+            if lower == upper:
+                prob += lhs == lower
+                continue
+            if lower != -INF:
+                prob += lhs >= lower
+            if upper != INF:
+                prob += lhs <= upper
+        for i, v in hint or []:
+            xs[i].setInitialValue(v)
+        prob.solve(pulp.PULP_CBC_CMD(msg=0, timeLimit=self.time_limit, warmStart=bool(hint)))
+        status = pulp.LpStatus[prob.status].lower()
+        if status == 'optimal' and prob.sol_status != pulp.LpSolutionOptimal:
+            status = 'feasible'  # e.g. stopped at the time limit with an integer solution
+        elif status != 'optimal':
+            return ('infeasible' if status == 'infeasible' else 'unknown'), None, None, None
+        return status, pulp.value(prob.objective) or 0.0, [x.varValue or 0.0 for x in xs], None
+
+
+class OrToolsBackend(Backend):
+    name = 'ortools'
+    module = 'ortools.linear_solver.pywraplp'
+
+    def run(self, hint=None):
+        from ortools.linear_solver import pywraplp
+        solver = pywraplp.Solver.CreateSolver('SCIP') or pywraplp.Solver.CreateSolver('CBC')
+        assert solver is not None
+        if self.time_limit is not None:
+            solver.SetTimeLimit(int(float(self.time_limit) * 1000))
+        xs = [solver.BoolVar(name) for name in self.var_names]
+        for indices, coeffs, lower, upper in self.rows:
+            ct = solver.Constraint(-solver.infinity() if lower == -INF else lower,
+                                   solver.infinity() if upper == INF else upper)
+            for i, coeff in zip(indices, coeffs):
+                ct.SetCoefficient(xs[i], ct.GetCoefficient(xs[i]) + coeff)
+        obj = solver.Objective()
+        for i, coeff in self.objective:
+            obj.SetCoefficient(xs[i], obj.GetCoefficient(xs[i]) + coeff)
+        if self.minimize:
+            obj.SetMinimization()
+        else:
+            obj.SetMaximization()
+        if hint:
+            solver.SetHint([xs[i] for i, _ in hint], [v for _, v in hint])
+        result = solver.Solve()
+        if result == pywraplp.Solver.OPTIMAL:
+            status = 'optimal'
+        elif result == pywraplp.Solver.FEASIBLE:
+            status = 'feasible'
+        elif result == pywraplp.Solver.INFEASIBLE:
+            return 'infeasible', None, None, None
+        else:
+            return 'unknown', None, None, None
+        return status, obj.Value(), [x.solution_value() for x in xs], obj.BestBound()
+
+
+backends = [HighsBackend, PulpBackend, OrToolsBackend]
+
+
+def get_backend(name=None):  # the given backend, or the first one installed
+    for backend in backends:
+        if (name is None or backend.name == name) and backend.is_available():
+            return backend
+    assert False, 'backend not installed: %s' % (name or ', '.join(b.name for b in backends))
+
+
+if __name__ == '__main__':
+    args = profiler.parse_args(sys.argv)  # e.g. --profile=highs.profile.json
+    proj_dir = args[1]
+    config_fname = args[2]
+    formulator = Formulator(proj_dir, config_fname)
+    name = args[3] if len(args) > 3 else formulator.config.get('backend')
+    time_limit = float(args[4]) if len(args) > 4 else formulator.config.get('time_limit', 60)
+    backend = get_backend(name)(formulator, time_limit)
+    result = backend.solve()
+    print('Status: %s' % result.status)
+    if result.objective is not None:
+        print('Objective value: %0.6f' % result.objective)
+    if result.bound is not None:
+        print('Bound: %0.6f' % result.bound)
+    print('# Minimized test suite: %d' % len(result.selected_tcs))
+    print('Time: %0.3fs' % result.elapsed)
+    if result.status in ['optimal', 'feasible']:
+        print('Solution: %s' % result.save(proj_dir, formulator.config['name'], backend.all_tcs))
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import copy
+import json
+import glob
+import time
+import itertools
+import multiprocessing
+
+from criteria import Criteria, find_crio_file
+from formulator import Formulator
+from solver import Solver, NemoSolver
+from backends import Result, get_backend
+from cache import Cache, CACHE_KEYS
+from evaluation import EVALUATION, Evaluator
+
+COLUMNS = ['subject', 'config', 'name', 'params', 'solver', 'status', 'objective', 'tests'] + \
+          [label for label, _, _ in EVALUATION] + ['time']
+
+# subject -> Criteria, parsed once in the main process before the workers are forked,
+# so that all the configs of a subject share the parsed criterion files
+criteria_cache = dict()
+
+
+def load_spec(fname):
+    # e.g. {
+    #   "name": "weights",                               # file name of the summary table
+    #   "subjects": ["subject_programs/*", "example"],   # directories, or patterns of directories
+    #   "configs": ["config.linear.json", "config.nemo-aux.json"],
+    #   "solvers": ["greedy", "highs"],                  # algorithms of solver.py or backends of backends.py
+    #   "time_limit": 60,
+    #   "processes": 4,                                  # (optional) the number of CPUs by default
+    #   "save": false,                                   # (optional) also write the model and the solution files
+    #   "cache": ".nemo_cache", "cache_size": 1024,      # (optional) the cache of criteria, models, and solutions
+    #   "sweep": {"relative_cria.0.weight": [1, 2, 4], "absolute_cria.0.rhs": [1, 2, 3]}
+    # }
+    # the sweep is the cartesian product of the values of each key, a path in the config;
+    # a key missing from a config (e.g. no second relative criterion) is not varied for that config
+    with open(fname, 'r') as f:
+        spec = json.load(f)
+    subjects = list()
+    for pattern in spec['subjects']:
+        for d in sorted(glob.glob(pattern)):
+            if os.path.isdir(d) and d not in subjects:
+                subjects.append(d)
+    spec['subjects'] = subjects
+    return spec
+
+
+def get_path(config, path):  # e.g. 'relative_cria.0.weight' -> (the dict or list, 'weight'), or None
+    keys = [int(k) if k.isdigit() else k for k in path.split('.')]
+    node = config
+    for k in keys[:-1]:
+        try:
+            node = node[k]
+        except (KeyError, IndexError, TypeError):
+            return None
+    if isinstance(node, list) and isinstance(keys[-1], int) and keys[-1] < len(node):
+        return node, keys[-1]
+    if isinstance(node, dict) and keys[-1] in node:
+        return node, keys[-1]
+    return None
+
+
+def gen_points(config, sweep):  # (params, config) for every point of the sweep applying to the config
+    paths = sorted(path for path in sweep if get_path(config, path) is not None)
+    for values in itertools.product(*[sweep[path] for path in paths]):
+        point = copy.deepcopy(config)
+        params = list()
+        for path, value in zip(paths, values):
+            node, k = get_path(point, path)
+            node[k] = value
+            params.append('%s=%s' % (path, json.dumps(value)))
+        yield ','.join(params), point
+
+
+def gen_tasks(spec):
+    tasks = list()
+    for subject in spec['subjects']:
+        for config_fname in spec['configs']:
+            if not os.path.exists(os.path.join(subject, config_fname)):
+                continue
+            with open(os.path.join(subject, config_fname), 'r') as f:
+                config = json.load(f)
+            for k, (params, point) in enumerate(gen_points(config, spec.get('sweep', dict()))):
+                point['name'] = '%s.%d' % (config['name'], k)
+                for key in CACHE_KEYS:
+                    if key in spec:
+                        point[key] = spec[key]
+                for solver in spec['solvers']:
+                    # the model file of a point is written once, with its first solver
+                    save = spec.get('save', False)
+                    tasks.append((subject, config_fname, params, point, solver, spec.get('time_limit', 60),
+                                  save and solver == spec['solvers'][0], save))
+    return tasks
+
+
+def load_criteria(tasks):
+    for subject, _, _, config, _, _, _, _ in tasks:
+        if subject not in criteria_cache:
+            criteria_cache[subject] = Criteria(subject, Cache.from_config(config))
+        criteria = criteria_cache[subject]
+        fnames = [crio['file'] for crio in config['relative_cria'] + config['absolute_cria']]
+        for fname in fnames + [fname for _, fname, _ in EVALUATION]:
+            if os.path.exists(find_crio_file(subject, fname)):
+                crio_file = criteria.get(fname)
+                crio_file.get_tc_bitsets()
+                crio_file.get_values()
+
+
+def get_solver(formulator, solver, time_limit, previous=None):  # the Solver of solver.py of a heuristic
+    # previous: the model of a previous Solver and the test cases changed since, see Solver.update
+    if solver in NemoSolver.algorithms:
+        return NemoSolver(formulator, time_limit, previous)
+    return Solver(formulator, previous)
+
+
+def solve(formulator, solver, time_limit, start=None, s=None):  # -> a Result of backends.py, for the heuristics as well
+    # start: a previous selection of test cases to warm start from
+    # s: the Solver of a heuristic if it is already built (see get_solver)
+    if solver in Solver.algorithms + NemoSolver.algorithms:
+        begin = time.time()
+        s = s or get_solver(formulator, solver, time_limit)
+        selected_tcs, status = s.solve(solver, start)
+        values = dict((tc, 1 if tc in selected_tcs else 0) for tc in formulator.tc_list)
+        bound = s.sign * s.bound if solver == 'branch_and_bound' and s.bound is not None else None
+        return Result(solver, status, s.get_objective(selected_tcs), values, selected_tcs, bound, time.time() - begin)
+    return get_backend(solver)(formulator, time_limit).solve(start)
+
+
+def evaluate(criteria, subject, selected_tcs):  # e.g. {'statements': '3086/3143', ...}
+    evaluator = Evaluator(subject, criteria)
+    metrics = evaluator.evaluate(selected_tcs)
+    return dict((label, '%d/%d' % (metrics[label], evaluator.totals[label]) if label in metrics else '')
+                for label, _, _ in EVALUATION)
+
+
+def run_task(task):  # formulate, solve, and evaluate one point of the sweep
+    subject, config_fname, params, config, solver, time_limit, save_model, save_solution = task
+    row = dict(subject=subject, config=config_fname, name=config['name'], params=params, solver=solver)
+    start = time.time()
+    try:
+        cache = Cache.from_config(config)
+        criteria = criteria_cache.get(subject) or Criteria(subject, cache)
+        formulator = Formulator(subject, config_fname, config=config, criteria=criteria)
+        all_tcs = list(formulator.tc_list)
+        if save_model:
+            Formulator(subject, config_fname, config=config, criteria=criteria).gen_model()
+        result = None
+        if cache is not None:
+            key = cache.solution_key(cache.model_key(subject, config), solver, time_limit)
+            result = cache.load(key)
+        if result is None:
+            result = solve(formulator, solver, time_limit)
+            if cache is not None:
+                cache.dump(key, result)
+        if save_solution and result.status in ['optimal', 'feasible']:
+            result.save(subject, config['name'], all_tcs)
+        row.update(status=result.status, tests=len(result.selected_tcs),
+                   objective='%0.6f' % result.objective if result.objective is not None else '')
+        row.update(evaluate(criteria, subject, result.selected_tcs))
+    except Exception as e:
+        row.update(status='error: %s' % (str(e) or type(e).__name__))
+    row['time'] = '%0.3f' % (time.time() - start)
+    return row
+
+
+def save_summary(rows, name):
+    # one row per point of the sweep, tab-separated
+    out_path = name + '.summary.tsv'
+    with open(out_path, 'w') as f:
+        f.write('\t'.join(COLUMNS) + '\n')
+        for row in rows:
+            f.write('\t'.join(str(row.get(c, '')) for c in COLUMNS) + '\n')
+    return out_path
+
+
+def print_summary(rows):
+    widths = [max([len(c)] + [len(str(row.get(c, ''))) for row in rows]) for c in COLUMNS]
+    print('  '.join(c.ljust(w) for c, w in zip(COLUMNS, widths)))
+    for row in rows:
+        print('  '.join(str(row.get(c, '')).ljust(w) for c, w in zip(COLUMNS, widths)))
+
+
+if __name__ == '__main__':
+    spec_fname = sys.argv[1]
+    spec = load_spec(spec_fname)
+    tasks = gen_tasks(spec)
+    load_criteria(tasks)
+    processes = spec.get('processes') or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(min(processes, max(len(tasks), 1)))
+    rows = pool.map(run_task, tasks, chunksize=1)
+    pool.close()
+    pool.join()
+    print_summary(rows)
+    print('Summary: %s' % save_summary(rows, spec.get('name', os.path.splitext(os.path.basename(spec_fname))[0])))
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import glob
+import shutil
+import random
+import platform
+import multiprocessing
+import subprocess
+
+from solver import Solver, NemoSolver
+
+NEMO_DIR = os.path.dirname(os.path.abspath(__file__))
+COLUMNS = ['subject', 'scale', 'config', 'step', 'metric', 'value']
+STATEMENTS = 'cov.info'  # the criterion file whose crio_ids are multiplied by the statements scale
+DENSITY = 0.9  # probability that a copy of a test case keeps a statement, or a copy of a statement a test case
+THRESHOLD = 0.1  # the relative change of a metric reported by the comparison
+
+DEFAULT_SPEC = {
+    'name': 'benchmark',
+    'subjects': ['example', 'subject_programs/*'],
+    'configs': ['config*.json'],
+    'solvers': ['greedy'],
+    'scales': [{'tests': 1, 'statements': 1}, {'tests': 10, 'statements': 1}, {'tests': 1, 'statements': 10}],
+    'repeat': 1,
+    'seed': 0,
+    'time_limit': 60,
+}
+
+
+def load_spec(fname=None):
+    # e.g. {
+    #   "name": "benchmark",                            # file names of the results and of the work directory
+    #   "subjects": ["example", "subject_programs/*"],   # directories, or patterns of directories
+    #   "configs": ["config*.json"],                     # patterns of the configs in each subject
+    #   "solvers": ["greedy"],                           # algorithms of solver.py or backends of backends.py
+    #   "scales": [{"tests": 1, "statements": 1}, {"tests": 10, "statements": 1}],
+    #   "repeat": 3,                                     # each step is run this number of times, the fastest is kept
+    #   "seed": 0,                                       # of the synthetic variants
+    #   "time_limit": 60,
+    #   "python": "python2"                              # (optional) the interpreter of the steps, this one by default
+    # }
+    spec = dict(DEFAULT_SPEC)
+    if fname:
+        with open(fname, 'r') as f:
+            spec.update(json.load(f))
+    subjects = list()
+    for pattern in spec['subjects']:
+        for d in sorted(glob.glob(pattern)):
+            if os.path.isdir(d) and d not in subjects:
+                subjects.append(d)
+    spec['subjects'] = subjects
+    return spec
+
+
+def get_scale(scale):  # e.g. {'tests': 10, 'statements': 1} -> '10x1'
+    return '%dx%d' % (scale.get('tests', 1), scale.get('statements', 1))
+
+
+def read_info(path):  # [(test case, [crio_id or value, ...])] of a text criterion file
+    lines = list()
+    with open(path, 'r') as f:
+        for line in f:
+            tc, sep, rest = line.rstrip('\r\n').partition(':')
+            if sep:
+                lines.append((tc, rest.split()))
+    return lines
+
+
+def get_tc_copy(tc, j, offset):  # e.g. the second copy (j = 1) of t3 with 100 test cases -> t103
+    if j == 0:
+        return tc
+    if tc[1:].isdigit():
+        return 't%d' % (int(tc[1:]) + j * offset)
+    return '%s_%d' % (tc, j)
+
+
+def scale_subject(subject, out_dir, scale, configs, seed=0):
+    # a synthetic variant of a subject: every test case copied scale['tests'] times, in every criterion file,
+    # and every crio_id of STATEMENTS copied scale['statements'] times, with the ids shifted past the largest;
+    # a copy keeps each of the statements (or test cases) of the original with the probability DENSITY,
+    # so that the copies are not plain duplicates, and the budgets (is_coefficient) grow with the test cases
+    n_tests, n_statements = scale.get('tests', 1), scale.get('statements', 1)
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir)
+    rand = random.Random(seed)
+    files = dict((os.path.basename(p), read_info(p)) for p in sorted(glob.glob(os.path.join(subject, '*.info'))))
+    offset = max([int(tc[1:]) for lines in files.values() for tc, _ in lines if tc[1:].isdigit()] + [0])
+    for fname, lines in sorted(files.items()):
+        is_statements = fname == STATEMENTS
+        largest = max([int(c) for _, ids in lines for c in ids if c.isdigit()] + [0]) if is_statements else 0
+        with open(os.path.join(out_dir, fname), 'w') as f:
+            for j in range(n_tests):
+                for tc, ids in lines:
+                    if is_statements:
+                        ids = [c for c in ids if j == 0 or rand.random() < DENSITY]
+                        ids += [str(int(c) + k * largest) for k in range(1, n_statements) for c in ids
+                                if rand.random() < DENSITY]
+                    f.write('%s:%s\n' % (get_tc_copy(tc, j, offset), ' '.join(ids)))
+    for config_fname in configs:
+        with open(os.path.join(subject, config_fname), 'r') as f:
+            config = json.load(f)
+        for crio in config['absolute_cria']:
+            if crio['is_coefficient']:
+                crio['rhs'] = crio['rhs'] * n_tests
+        with open(os.path.join(out_dir, config_fname), 'w') as f:
+            json.dump(config, f, indent=2, separators=(',', ': '))
+
+
+def get_configs(subject, patterns):
+    configs = list()
+    for pattern in patterns:
+        for path in sorted(glob.glob(os.path.join(subject, pattern))):
+            if os.path.basename(path) not in configs:
+                configs.append(os.path.basename(path))
+    return configs
+
+
+def run_step(python, script, args, profile_path, repeat=1):
+    # runs a script of Nemo with --profile, the metrics of its fastest run -> (exit code, stdout, profile)
+    best = None
+    for _ in range(max(repeat, 1)):
+        if os.path.exists(profile_path):
+            os.remove(profile_path)
+        p = subprocess.Popen([python, os.path.join(NEMO_DIR, script)] + args + ['--profile=' + profile_path],
+                             cwd=NEMO_DIR, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        out, err = p.communicate()
+        if p.returncode != 0 or not os.path.exists(profile_path):
+            return p.returncode or 1, out + err, None
+        with open(profile_path, 'r') as f:
+            profile = json.load(f)
+        if best is None or profile['time'] < best[2]['time']:
+            best = (0, out, profile)
+    return best
+
+
+def get_metrics(code, out, profile):
+    # e.g. [('exit', 0), ('total.time', 1.52), ('constraints.time', 0.12), ('count.tests', 605), ('objective', 44.0)]
+    metrics = [('exit', code)]
+    if profile is not None:
+        metrics += [('total.time', round(profile['time'], 6)), ('total.peak_rss', profile['peak_rss'])]
+        for stage, stats in profile['stages'].items():
+            metrics += [('%s.time' % stage, round(stats['time'], 6)), ('%s.calls' % stage, stats['calls']),
+                        ('%s.items' % stage, stats['items']), ('%s.rss_growth' % stage, stats['rss_growth'])]
+        metrics += [('count.%s' % name, value) for name, value in profile['counts'].items()]
+    labels = None  # the columns of the table of evaluation.py
+    for line in out.splitlines():
+        if line.startswith('Objective value:'):
+            metrics.append(('objective', float(line.split(':', 1)[1])))
+        elif line.startswith('# Minimized test suite:'):
+            metrics.append(('selected', int(line.split(':', 1)[1])))
+        elif line.startswith('name '):
+            labels = line.split()[1:]
+        elif labels and not line.startswith('(original)') and not line.startswith('Pareto front:'):
+            # e.g. linear.greedy.sol  2  3  3  2  *
+            metrics += [('suite.%s' % label, value) for label, value in zip(labels, line.split()[1:])
+                        if label != 'pareto']
+    return metrics
+
+
+def run(spec):  # formulate, solve, and evaluate every config of every variant, one step at a time -> rows
+    python = spec.get('python') or sys.executable
+    work_dir = os.path.abspath(spec['name'] + '.bench')
+    rows = list()
+    for subject in spec['subjects']:
+        configs = get_configs(subject, spec['configs'])
+        for scale in spec['scales']:
+            label = get_scale(scale)
+            proj_dir = os.path.join(work_dir, '%s.%s' % (os.path.basename(os.path.normpath(subject)), label))
+            scale_subject(subject, proj_dir, scale, configs, spec.get('seed', 0))
+            for config_fname in configs:
+                with open(os.path.join(proj_dir, config_fname), 'r') as f:
+                    name = json.load(f)['name']
+                steps = [('formulate', 'formulator.py', [proj_dir, config_fname])]
+                for solver in spec['solvers']:
+                    script = 'solver.py' if solver in Solver.algorithms + NemoSolver.algorithms else 'backends.py'
+                    steps.append(('solve.' + solver, script,
+                                  [proj_dir, config_fname, solver, str(spec.get('time_limit', 60))]))
+                    steps.append(('evaluate.' + solver, 'evaluation.py',
+                                  [proj_dir, os.path.join(proj_dir, '%s.%s.sol' % (name, solver))]))
+                failed = set()
+                for step, script, args in steps:
+                    if step.startswith('evaluate.') and 'solve.' + step.split('.', 1)[1] in failed:
+                        continue
+                    profile_path = os.path.join(proj_dir, '%s.%s.profile.json' % (name, step))
+                    code, out, profile = run_step(python, script, args, profile_path, spec.get('repeat', 1))
+                    if code != 0:
+                        failed.add(step)
+                        sys.stderr.write('%s %s %s %s failed:\n%s\n' % (subject, label, config_fname, step, out))
+                    for metric, value in get_metrics(code, out, profile):
+                        rows.append(dict(subject=subject, scale=label, config=config_fname, step=step,
+                                         metric=metric, value=value))
+    return rows
+
+
+def save_rows(rows, name):
+    # one row per metric, tab-separated, e.g.
+    #   subject                   scale  config              step       metric            value
+    #   subject_programs/flex_v5  10x1   config.linear.json  formulate  constraints.time  0.913
+    out_path = name + '.benchmark.tsv'
+    with open(out_path, 'w') as f:
+        f.write('\t'.join(COLUMNS) + '\n')
+        for row in rows:
+            f.write('\t'.join(str(row[c]) for c in COLUMNS) + '\n')
+    return out_path
+
+
+def load_rows(path):  # (subject, scale, config, step, metric) -> value
+    values = dict()
+    with open(path, 'r') as f:
+        columns = f.readline().rstrip('\n').split('\t')
+        for line in f:
+            row = dict(zip(columns, line.rstrip('\n').split('\t')))
+            values[tuple(row[c] for c in COLUMNS[:-1])] = row['value']
+    return values
+
+
+def compare(old_path, new_path, threshold=THRESHOLD):
+    # the metrics of two benchmark results that changed by more than threshold (relatively), or that are
+    # in one of them only, e.g. a slowdown of gen_constraint as a larger constraints.time
+    old, new = load_rows(old_path), load_rows(new_path)
+    changes = list()
+    for key in sorted(set(old) | set(new)):
+        a, b = old.get(key, ''), new.get(key, '')
+        try:
+            x, y = float(a), float(b)
+        except ValueError:
+            if a != b:
+                changes.append(key + (a, b, ''))
+            continue
+        if x == y:
+            continue
+        ratio = y / x if x else float('inf')
+        if abs(ratio - 1) > threshold:
+            changes.append(key + (a, b, '%0.2f' % ratio))
+    return changes
+
+
+def print_rows(columns, rows):
+    widths = [max([len(c)] + [len(str(row[k])) for row in rows]) for k, c in enumerate(columns)]
+    print('  '.join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(str(v).ljust(w) for v, w in zip(row, widths)))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2:  # python benchmark.py old.benchmark.tsv new.benchmark.tsv [threshold]
+        threshold = float(sys.argv[3]) if len(sys.argv) > 3 else THRESHOLD
+        changes = compare(sys.argv[1], sys.argv[2], threshold)
+        print_rows(COLUMNS[:-1] + ['old', 'new', 'ratio'], changes)
+        print('# Changed metrics: %d' % len(changes))
+        sys.exit(0)
+    spec = load_spec(sys.argv[1] if len(sys.argv) > 1 else None)
+    print('# Python %s on %s, %d CPUs' % (platform.python_version(), platform.platform(), multiprocessing.cpu_count()))
+    rows = run(spec)
+    print('# Steps: %d, failed: %d' % (len([r for r in rows if r['metric'] == 'exit']),
+                                       len([r for r in rows if r['metric'] == 'exit' and r['value'] != 0])))
+    print('Results: %s' % save_rows(rows, spec['name']))
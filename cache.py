@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from criteria import find_crio_file
+
+# keys of a config that do not change the model
+CACHE_KEYS = ['cache', 'cache_size']
+VERSION = 2  # the format of the entries, part of every key
+
+file_digests = dict()  # (path, size, mtime) -> digest of the content, computed once per process
+
+
+def file_digest(path):
+    stat = os.stat(path)
+    memo = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+    if memo not in file_digests:
+        md5 = hashlib.md5()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                md5.update(chunk)
+        file_digests[memo] = md5.hexdigest()
+    return file_digests[memo]
+
+
+class Cache:
+    # a content-addressed store on disk, shared by all the subjects and configs, e.g.
+    #   .nemo_cache/<key>/  one entry, a directory of files
+    # the key of an entry is a digest of everything it depends on (the content of the criterion
+    # files, the config), so a changed input never hits a stale entry; an entry whose inputs
+    # changed is no longer used, and is evicted in least-recently-used order (the mtime of the
+    # entry, updated at each hit) when the total size exceeds max_size bytes
+    def __init__(self, root, max_size=1 << 30):
+        self.root = root
+        self.max_size = max_size
+        if not os.path.isdir(root):
+            try:
+                os.makedirs(root)
+            except OSError:
+                assert os.path.isdir(root)  # created by another process meanwhile
+
+    @staticmethod
+    def from_config(config):  # the cache of a config, or None, e.g. "cache": ".nemo_cache", "cache_size": 1024 (MB)
+        if not config.get('cache'):
+            return None
+        return Cache(config['cache'], int(config.get('cache_size', 1024)) << 20)
+
+    def key(self, kind, *parts):
+        sha1 = hashlib.sha1()
+        sha1.update(('%s\n%d\n%d\n' % (kind, VERSION, sys.version_info[0])).encode('utf-8'))
+        for part in parts:
+            sha1.update((json.dumps(part, sort_keys=True) + '\n').encode('utf-8'))
+        return kind + '-' + sha1.hexdigest()
+
+    def criterion_key(self, path):
+        return self.key('criterion', file_digest(path))
+
+    def model_key(self, proj_dir, config):
+        # the config, and the content of the criterion files it refers to
+        config = dict((k, v) for k, v in config.items() if k not in CACHE_KEYS)
+        files = sorted(set(crio['file'] for crio in config['relative_cria'] + config['absolute_cria']))
+        return self.key('model', config, [(f, file_digest(find_crio_file(proj_dir, f))) for f in files])
+
+    def solution_key(self, model_key, solver, time_limit):
+        return self.key('solution', model_key, solver, time_limit)
+
+    def lookup(self, key):  # the directory of the entry, or None
+        path = os.path.join(self.root, key)
+        if not os.path.isdir(path):
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            return None  # evicted meanwhile
+        return path
+
+    def store(self, key, files):  # files: name in the entry -> path of the file to copy
+        tmp = os.path.join(self.root, '.tmp-%s-%d' % (key, os.getpid()))
+        if os.path.isdir(tmp):
+            shutil.rmtree(tmp)
+        os.makedirs(tmp)
+        for name, src in files.items():
+            shutil.copyfile(src, os.path.join(tmp, name))
+        try:
+            os.rename(tmp, os.path.join(self.root, key))
+        except OSError:
+            shutil.rmtree(tmp)  # stored by another process meanwhile
+        self.evict()
+
+    def restore(self, key, out_dir):  # copy the files of the entry to out_dir
+        path = self.lookup(key)
+        if path is None:
+            return False
+        try:
+            for name in os.listdir(path):
+                shutil.copyfile(os.path.join(path, name), os.path.join(out_dir, name))
+        except (IOError, OSError):
+            return False
+        return True
+
+    def load(self, key):  # the object pickled in the entry, or None
+        path = self.lookup(key)
+        if path is None:
+            return None
+        try:
+            with open(os.path.join(path, 'data.pickle'), 'rb') as f:
+                return pickle.load(f)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def dump(self, key, obj):
+        tmp = os.path.join(self.root, '.tmp-%s-%d.pickle' % (key, os.getpid()))
+        with open(tmp, 'wb') as f:
+            pickle.dump(obj, f, 2)
+        self.store(key, {'data.pickle': tmp})
+        os.remove(tmp)
+
+    def evict(self):
+        entries = list()
+        total = 0
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith('.') or not os.path.isdir(path):
+                continue
+            try:
+                size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+                entries.append((os.path.getmtime(path), size, path))
+            except OSError:
+                continue
+            total += size
+        entries.sort()
+        while total > self.max_size and entries:
+            _, size, path = entries.pop(0)
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+        return total
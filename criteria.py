@@ -0,0 +1,478 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import mmap
+import multiprocessing
+import array
+import struct
+import binascii
+
+from profiler import profiler
+
+# the binary format of a criterion file (see write_binary), e.g. cov.bin
+MAGIC = b'NEMOCRI1'
+# number of test cases, of crio_ids, of indices, size of the two id tables, layout, width of an index
+HEADER = struct.Struct('<IIIIIHH')
+CSR, BITMAP = 0, 1
+TYPECODES = {2: 'H', 4: 'I' if array.array('I').itemsize == 4 else 'L'}
+
+
+# text files larger than this are parsed in chunks of CHUNK_SIZE bytes by worker processes
+PARALLEL_SIZE = 64 << 20
+CHUNK_SIZE = 16 << 20
+
+
+def popcount(x):
+    return bin(x).count('1')
+
+
+def bits(x):  # indices of the set bits of x
+    while x:
+        low = x & -x
+        yield low.bit_length() - 1
+        x ^= low
+
+
+def to_bitset(indices, size):  # e.g. [0, 3] -> 0b1001, packed through a byte array
+    if not indices:
+        return 0
+    packed = bytearray((size >> 3) + 1)
+    for i in indices:
+        packed[i >> 3] |= 1 << (i & 7)
+    packed.reverse()
+    return int(binascii.hexlify(bytes(packed)), 16)
+
+
+def find_crio_file(proj_dir, fname):  # e.g. cov.info, or its binary version cov.bin if only that one exists
+    path = os.path.join(proj_dir, fname)
+    bin_path = os.path.splitext(path)[0] + '.bin'
+    if not os.path.exists(path) and os.path.exists(bin_path):
+        return bin_path
+    return path
+
+
+def read_array(mm, pos, n, width):  # n little-endian unsigned integers at pos of a memory-mapped file
+    if n == 0:
+        return list()
+    typecode = TYPECODES[width]
+    if sys.byteorder == 'little' and hasattr(memoryview, 'cast'):
+        return memoryview(mm)[pos:pos + width * n].cast(typecode)  # zero-copy
+    values = array.array(typecode)
+    values.fromstring(mm[pos:pos + width * n])
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+def to_bytes(values):  # an array as little-endian bytes
+    if sys.byteorder != 'little':
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes() if hasattr(values, 'tobytes') else values.tostring()
+
+
+def split_chunks(path, chunk_size):  # [(start, end)] of about chunk_size bytes, ending at a line end
+    chunks = list()
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            start = 0
+            while start < len(mm):
+                end = mm.find(b'\n', min(start + chunk_size, len(mm)) - 1)
+                end = len(mm) if end < 0 else end + 1
+                chunks.append((start, end))
+                start = end
+        finally:
+            mm.close()
+    return chunks
+
+
+def read_lines(path, start, end):  # the (test case, crio_ids) of the lines of a chunk of a text file
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            text = mm[start:end]
+        finally:
+            mm.close()
+    if not isinstance(text, str):
+        text = text.decode('utf-8')
+    for line in text.splitlines():
+        if ':' in line:
+            tc, c_str = line.split(':', 1)
+            yield tc, c_str.split()
+
+
+def scan_chunk(chunk):  # the crio_ids of a chunk, in order of appearance
+    path, start, end = chunk
+    seen = set()
+    crio_ids = list()
+    for _, c_list in read_lines(path, start, end):
+        for c in c_list:
+            if c not in seen:
+                seen.add(c)
+                crio_ids.append(c)
+    return crio_ids
+
+
+chunk_index = None  # (crio_id -> crio index, number of crio_ids), shared with the workers of index_chunk
+
+
+def set_chunk_index(crio_index, size):
+    global chunk_index
+    chunk_index = (crio_index, size)
+
+
+def index_chunk(chunk):  # the (test case, bitset of crio indices) of the lines of a chunk
+    path, start, end = chunk
+    crio_index, size = chunk_index
+    return [(tc, to_bitset([crio_index[c] for c in c_list], size)) for tc, c_list in read_lines(path, start, end)]
+
+
+class CriterionFile:
+    # the content of one criterion file, parsed once, e.g.
+    #   t2:390 395 396  # crio_ids covered by the test case (cov.info, fault.info)
+    #   t3:
+    #   t4:100          # or one and only one positive integer (rtime.info)
+    # test cases and crio_ids are renumbered densely in order of appearance
+    def __init__(self, path, processes=None):
+        self.path = path
+        self.processes = processes  # of the parallel parsing of a large text file, the number of CPUs by default
+        self.tcs = list()         # test index -> test case, e.g. 't2' (None if removed by update())
+        self.tc_index = dict()    # test case -> test index
+        self.crio_ids = list()    # crio index -> crio_id, e.g. '390'
+        self.crio_index = dict()  # crio_id -> crio index
+        self.tc_to_crio = list()  # test index -> [crio index, ...]
+        self.crio_to_tc = list()  # crio index -> [test index, ...]
+        self.values = None        # test index -> integer value (or None), built on demand
+        self.tc_bitsets = None    # test index -> bitset of crio indices, built on demand
+        self.crio_bitsets = None  # crio index -> bitset of test indices, built on demand
+        self.num_unused = 0       # crio_ids no longer covered by any test case after update()
+        self.parse()
+
+    def parse(self):
+        with open(self.path, 'rb') as f:
+            is_binary = f.read(len(MAGIC)) == MAGIC
+        if is_binary:
+            self.parse_binary()
+            return
+        if self.processes != 1 and os.path.getsize(self.path) > PARALLEL_SIZE \
+                and not multiprocessing.current_process().daemon:  # e.g. not in a worker of batch.py
+            self.parse_parallel()
+            return
+        crio_index = self.crio_index
+        with open(self.path, 'r') as f:
+            for line in f:
+                if ':' not in line:
+                    continue
+                tc, c_str = line.split(':', 1)
+                c_list = list()
+                for c in c_str.split():
+                    i = crio_index.get(c)
+                    if i is None:
+                        i = len(self.crio_ids)
+                        crio_index[c] = i
+                        self.crio_ids.append(c)
+                        self.crio_to_tc.append(list())
+                    c_list.append(i)
+                t = self.tc_index.get(tc)
+                if t is None:
+                    t = len(self.tcs)
+                    self.tc_index[tc] = t
+                    self.tcs.append(tc)
+                    self.tc_to_crio.append(c_list)
+                else:
+                    self.tc_to_crio[t].extend(c_list)
+                for i in c_list:
+                    self.crio_to_tc[i].append(t)
+
+    def parse_parallel(self, chunk_size=CHUNK_SIZE):
+        # the file is memory-mapped and split into chunks of lines, parsed by worker processes in two passes:
+        #   1. the crio_ids of each chunk, merged in order of the chunks into the crio indices
+        #   2. the bitset of each test case over the crio indices, merged by test case
+        # the workers only return their results, not the text, and the lists are built on first use
+        chunks = [(self.path, start, end) for start, end in split_chunks(self.path, chunk_size)]
+        processes = self.processes or multiprocessing.cpu_count()
+        pool = multiprocessing.Pool(processes)
+        try:
+            for crio_ids in pool.imap(scan_chunk, chunks):
+                for c in crio_ids:
+                    if c not in self.crio_index:
+                        self.crio_index[c] = len(self.crio_ids)
+                        self.crio_ids.append(c)
+        finally:
+            pool.close()
+            pool.join()
+        self.tc_bitsets = list()
+        pool = multiprocessing.Pool(processes, set_chunk_index, (self.crio_index, len(self.crio_ids)))
+        try:
+            for rows in pool.imap(index_chunk, chunks):
+                for tc, b in rows:
+                    t = self.tc_index.get(tc)
+                    if t is None:
+                        self.tc_index[tc] = len(self.tcs)
+                        self.tcs.append(tc)
+                        self.tc_bitsets.append(b)
+                    else:
+                        self.tc_bitsets[t] |= b
+        finally:
+            pool.close()
+            pool.join()
+        del self.tc_to_crio, self.crio_to_tc
+
+    def parse_binary(self):
+        # the file is memory-mapped, and the crio_ids of each test case are sliced out of the arrays
+        # instead of tokenizing text lines; with the bitmap layout, the bitsets come for free
+        with open(self.path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            pos = len(MAGIC)
+            num_tcs, num_crio, nnz, tc_size, crio_size, layout, width = HEADER.unpack_from(mm, pos)
+            pos += HEADER.size
+            self.tcs = mm[pos:pos + tc_size].decode('utf-8').split('\n') if num_tcs else list()
+            pos += tc_size
+            self.crio_ids = mm[pos:pos + crio_size].decode('utf-8').split('\n') if num_crio else list()
+            pos += crio_size
+            pos += -pos % 4
+            self.tc_index = dict((tc, t) for t, tc in enumerate(self.tcs))
+            self.crio_index = dict((c, i) for i, c in enumerate(self.crio_ids))
+            if layout == CSR:
+                offsets = read_array(mm, pos, num_tcs + 1, 4)
+                indices = read_array(mm, pos + 4 * (num_tcs + 1), nnz, width)
+                self.tc_to_crio = [list(indices[offsets[t]:offsets[t + 1]]) for t in range(num_tcs)]
+                del offsets, indices
+                self.crio_to_tc = self.invert(self.tc_to_crio)
+            else:
+                row_size = (num_crio + 7) >> 3
+                self.tc_bitsets = list()
+                for t in range(num_tcs):
+                    row = bytearray(mm[pos + t * row_size:pos + (t + 1) * row_size])
+                    row.reverse()
+                    self.tc_bitsets.append(int(binascii.hexlify(bytes(row)), 16) if row_size else 0)
+                # tc_to_crio and crio_to_tc are built on first use (see __getattr__), e.g. the generator
+                # and the coverage of the solvers only need the bitsets
+                del self.tc_to_crio, self.crio_to_tc
+        finally:
+            mm.close()
+
+    def __getattr__(self, name):  # the lists of a bitmap binary file or of a parallel parsing, built on demand
+        if name == 'tc_to_crio' and self.__dict__.get('tc_bitsets') is not None:
+            self.tc_to_crio = [list(bits(b)) for b in self.tc_bitsets]
+            return self.tc_to_crio
+        if name == 'crio_to_tc' and self.__dict__.get('tc_bitsets') is not None:
+            self.crio_to_tc = self.invert(self.tc_to_crio)
+            return self.crio_to_tc
+        raise AttributeError(name)
+
+    def compact(self):  # keep the bitsets only (e.g. before pickling), the lists are rebuilt on demand
+        self.get_tc_bitsets()
+        self.get_crio_bitsets()
+        self.__dict__.pop('tc_to_crio', None)
+        self.__dict__.pop('crio_to_tc', None)
+        return self
+
+    def invert(self, tc_to_crio):  # crio index -> [test index, ...]
+        crio_to_tc = [list() for _ in self.crio_ids]
+        for t, c_list in enumerate(tc_to_crio):
+            for i in c_list:
+                crio_to_tc[i].append(t)
+        return crio_to_tc
+
+    def write_binary(self, path):
+        # e.g. cov.info -> cov.bin
+        #   MAGIC, HEADER
+        #   the test cases and the crio_ids, utf-8, separated by newlines, padded to 4 bytes
+        #   CSR layout:    offsets uint32[number of test cases + 1], indices uint16/uint32[number of indices],
+        #                  the crio indices of test t are indices[offsets[t]:offsets[t+1]]
+        #   bitmap layout: one row of (number of crio_ids + 7) / 8 bytes per test case, bit i for crio index i
+        # all little-endian; the smaller layout is chosen, e.g. bitmap for a dense statement coverage;
+        # the test cases and crio_ids keep the order of the text file, so the models are the same
+        num_tcs = len(self.tcs)
+        num_crio = len(self.crio_ids)
+        width = 2 if num_crio <= 0xffff else 4
+        nnz = sum(len(c_list) for c_list in self.tc_to_crio)
+        row_size = (num_crio + 7) >> 3
+        if num_tcs * row_size < 4 * (num_tcs + 1) + width * nnz:
+            layout = BITMAP
+            data = list()
+            for b in self.get_tc_bitsets():
+                row = bytearray(binascii.unhexlify('%0*x' % (2 * row_size, b))) if row_size else bytearray()
+                row.reverse()
+                data.append(bytes(row))
+        else:
+            layout = CSR
+            offsets = array.array(TYPECODES[4], [0])
+            indices = array.array(TYPECODES[width])
+            for c_list in self.tc_to_crio:
+                indices.extend(c_list)
+                offsets.append(len(indices))
+            data = [to_bytes(offsets), to_bytes(indices)]
+        tc_table = '\n'.join(self.tcs).encode('utf-8')
+        crio_table = '\n'.join(self.crio_ids).encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(HEADER.pack(num_tcs, num_crio, nnz, len(tc_table), len(crio_table), layout, width))
+            f.write(tc_table)
+            f.write(crio_table)
+            f.write(b'\0' * (-(len(MAGIC) + HEADER.size + len(tc_table) + len(crio_table)) % 4))
+            for chunk in data:
+                f.write(chunk)
+
+    def update(self, tc, c_str):
+        # replace the line of a test case (e.g. 't2', '390 395'; None removes it, unlike '' for 't2:'), keeping
+        # the indices of the other test cases and crio_ids, and the lists and bitsets built so far, up to date;
+        # on the bitsets only (e.g. of a pickle), the cost is proportional to the old and the new line only
+        if c_str is None and tc not in self.tc_index:
+            return
+        tc_lists = 'tc_to_crio' in self.__dict__
+        crio_lists = 'crio_to_tc' in self.__dict__
+        if not crio_lists:
+            self.get_crio_bitsets()  # whether a crio_id is still covered
+        t = self.tc_index.get(tc)
+        if t is None:
+            t = len(self.tcs)
+            self.tc_index[tc] = t
+            self.tcs.append(tc)
+            if tc_lists:
+                self.tc_to_crio.append(list())
+            if self.tc_bitsets is not None:
+                self.tc_bitsets.append(0)
+            if self.values is not None:
+                self.values.append(None)
+        old = set(self.tc_to_crio[t]) if tc_lists else set(bits(self.tc_bitsets[t]))
+        for i in old:
+            if crio_lists:
+                self.crio_to_tc[i] = [u for u in self.crio_to_tc[i] if u != t]
+            if self.crio_bitsets is not None:
+                self.crio_bitsets[i] &= ~(1 << t)
+            if not self.is_covered(i):
+                self.num_unused += 1
+        c_list = list()
+        for c in (c_str or '').split():
+            i = self.crio_index.get(c)
+            if i is None:
+                i = len(self.crio_ids)
+                self.crio_index[c] = i
+                self.crio_ids.append(c)
+                self.num_unused += 1
+                if crio_lists:
+                    self.crio_to_tc.append(list())
+                if self.crio_bitsets is not None:
+                    self.crio_bitsets.append(0)
+            c_list.append(i)
+        if tc_lists:
+            self.tc_to_crio[t] = c_list
+        for i in c_list:
+            if not self.is_covered(i):
+                self.num_unused -= 1
+            if crio_lists:
+                self.crio_to_tc[i].append(t)
+            if self.crio_bitsets is not None:
+                self.crio_bitsets[i] |= 1 << t
+        if self.tc_bitsets is not None:
+            self.tc_bitsets[t] = to_bitset(c_list, len(self.crio_ids))
+        if self.values is not None:
+            self.values[t] = int(self.crio_ids[c_list[0]]) if c_list else None
+        if c_str is None:  # its test index is left empty (None in tcs), a new line gets a new one
+            del self.tc_index[tc]
+            self.tcs[t] = None
+
+    def get_crio_ids(self, tc):  # e.g. 't2' -> set(['390', '395']), empty if the test case has no line
+        t = self.tc_index.get(tc)
+        if t is None:
+            return set()
+        if 'tc_to_crio' in self.__dict__:
+            return set(self.crio_ids[i] for i in self.tc_to_crio[t])
+        return set(self.crio_ids[i] for i in bits(self.tc_bitsets[t]))
+
+    def is_covered(self, i):  # is crio index i covered by some test case
+        if 'crio_to_tc' in self.__dict__:
+            return len(self.crio_to_tc[i]) > 0
+        return self.crio_bitsets[i] != 0
+
+    def covering_tcs(self):  # test cases whose line is not empty
+        if 'tc_to_crio' not in self.__dict__:
+            return [tc for tc, b in zip(self.tcs, self.tc_bitsets) if b]
+        return [tc for tc, c_list in zip(self.tcs, self.tc_to_crio) if c_list]
+
+    def total_num(self):  # number of distinct crio_ids
+        return len(self.crio_ids) - self.num_unused
+
+    def get_tc_bitsets(self):
+        if self.tc_bitsets is None:
+            size = len(self.crio_ids)
+            self.tc_bitsets = [to_bitset(c_list, size) for c_list in self.tc_to_crio]
+        return self.tc_bitsets
+
+    def get_crio_bitsets(self):
+        if self.crio_bitsets is None:
+            size = len(self.tcs)
+            if 'crio_to_tc' in self.__dict__:
+                crio_to_tc = self.crio_to_tc
+            else:  # without keeping the lists, e.g. of a pickle
+                crio_to_tc = self.invert([bits(b) for b in self.tc_bitsets])
+            self.crio_bitsets = [to_bitset(t_list, size) for t_list in crio_to_tc]
+        return self.crio_bitsets
+
+    def get_counts(self):  # test index -> number of distinct crio_ids covered
+        return [popcount(b) for b in self.get_tc_bitsets()]
+
+    def align(self, tcs):  # the bitsets of the given test cases, 0 for those not in the file
+        tc_bitsets = self.get_tc_bitsets()
+        return [tc_bitsets[self.tc_index[tc]] if tc in self.tc_index else 0 for tc in tcs]
+
+    def union(self, tcs):  # bitset of the crio_ids covered by the given test cases
+        covered = 0
+        for b in self.align(tcs):
+            covered |= b
+        return covered
+
+    def get_values(self):  # e.g. t2:100 -> 100; t3: -> None
+        if self.values is None:
+            self.values = [int(self.crio_ids[c_list[0]]) if c_list else None for c_list in self.tc_to_crio]
+        return self.values
+
+    def max_num(self):  # the maximum of the coefficients (e.g., max execution time of a test case)
+        max_num = -1
+        for v in self.get_values():
+            if v is not None and v > max_num:
+                max_num = v
+        return max_num
+
+
+class Criteria:
+    # every criterion file referenced by a config is parsed at most once and shared by all stages;
+    # with a cache (see cache.py), a parsed file is also kept on disk for the next runs
+    def __init__(self, proj_dir, cache=None):
+        self.proj_dir = proj_dir
+        self.cache = cache
+        self.files = dict()
+
+    def get(self, fname):
+        if fname not in self.files:
+            with profiler.stage('parse'):
+                self.files[fname] = self.load(fname)
+            profiler.count('criterion_files', 1)
+            profiler.count('crio_ids', len(self.files[fname].crio_ids))
+        return self.files[fname]
+
+    def load(self, fname):  # e.g. cov.info, read from cov.bin if only that one exists
+        path = find_crio_file(self.proj_dir, fname)
+        if self.cache is None:
+            return CriterionFile(path)
+        key = self.cache.criterion_key(path)
+        crio_file = self.cache.load(key)
+        if crio_file is None:
+            crio_file = CriterionFile(path)
+            crio_file.get_tc_bitsets()
+            self.cache.dump(key, crio_file)
+        crio_file.path = path
+        return crio_file
+
+
+if __name__ == '__main__':
+    # convert criterion files to the binary format, e.g. python criteria.py example/cov.info -> example/cov.bin
+    for path in sys.argv[1:]:
+        out_path = os.path.splitext(path)[0] + '.bin'
+        CriterionFile(path).write_binary(out_path)
+        print('%s: %d -> %d bytes' % (out_path, os.path.getsize(path), os.path.getsize(out_path)))
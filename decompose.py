@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+import sys
+import copy
+import time
+import multiprocessing
+
+from formulator import Formulator
+from solver import Solver, NemoSolver
+from backends import Result
+from batch import solve
+
+GROUP_SIZE = 64  # components smaller than this number of test cases are solved together
+
+# the formulator of the whole problem, set in the main process before the workers are forked,
+# so that the subproblems share its parsed criterion files
+base = None
+
+
+def get_components(formulator):
+    # the connected components of the graph of the test cases and the crio_ids they cover, over the
+    # coverage criteria (is_coefficient: false) and the objective criteria covering crio_ids (is_dependent);
+    # the budgets (is_coefficient: true) couple every test case and are split by split_budgets instead
+    tc_index = dict((tc, i) for i, tc in enumerate(formulator.tc_list))
+    parent = list(range(len(formulator.tc_list)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    fnames = [crio['file'] for crio in formulator.config['absolute_cria'] if not crio['is_coefficient']]
+    fnames += [crio['file'] for crio in formulator.config['relative_cria'] if crio['is_dependent']]
+    for fname in sorted(set(fnames)):
+        crio_file = formulator.criteria.get(fname)
+        for t_list in crio_file.crio_to_tc:
+            roots = [find(tc_index[crio_file.tcs[t]]) for t in t_list if crio_file.tcs[t] in tc_index]
+            for r in roots[1:]:
+                parent[find(r)] = find(roots[0])
+    components = dict()
+    for i, tc in enumerate(formulator.tc_list):
+        components.setdefault(find(i), list()).append(tc)
+    return sorted(components.values(), key=lambda tcs: -len(tcs))
+
+
+def group_components(components, size=GROUP_SIZE):  # [[test case]], the small components packed together
+    groups = list()
+    small = list()
+    for tcs in components:
+        if len(tcs) >= size:
+            groups.append(tcs)
+            continue
+        small.extend(tcs)
+        if len(small) >= size:
+            groups.append(small)
+            small = list()
+    if small:
+        groups.append(small)
+    return groups
+
+
+def split_budgets(formulator, groups):
+    # the config of each group: the rhs of a budget (e.g. rtime.info <= 20) is shared by the groups as
+    # used by the greedy solution of the whole problem, plus the rest of it in proportion to the weights
+    # of the test cases of each group, so that the union of the selections of the groups meets it and
+    # each group does at least as well as its part of the greedy solution;
+    # a group is not reduced, its test cases fixed by the reduction would be lost
+    configs = list()
+    for tcs in groups:
+        config = copy.deepcopy(formulator.config)
+        config['reduce'] = False
+        configs.append(config)
+    if not any(crio['is_coefficient'] for crio in formulator.config['absolute_cria']):
+        return configs
+    solver = Solver(formulator)
+    reference = set(solver.solve('greedy')[0])
+    budgets = iter(solver.budgets)
+    tc_index = dict((tc, i) for i, tc in enumerate(formulator.tc_list))
+    for k, crio in enumerate(formulator.config['absolute_cria']):
+        if not crio['is_coefficient']:
+            continue
+        weights = next(budgets)[0]
+        totals = [sum([weights[tc_index[tc]] for tc in tcs]) for tcs in groups]
+        used = [sum([weights[tc_index[tc]] for tc in tcs if tc in reference]) for tcs in groups]
+        rest = float(crio['rhs']) - sum(used)
+        for config, total, u in zip(configs, totals, used):
+            share = u + rest * total / sum(totals) if sum(totals) else float(crio['rhs']) / len(groups)
+            config['absolute_cria'][k]['rhs'] = share
+    return configs
+
+
+def relax_budgets(formulator, groups):
+    # the config of each group with the whole rhs of every budget: as the weights are not negative, this is a
+    # relaxation of the whole problem, whose optimum is the union of the optimal selections of the groups if it
+    # meets the budgets; None if a budget has a lower bound (>=, >, =), which the groups cannot share this way
+    if any(crio['is_coefficient'] and crio['crio_type'] not in ['<=', '<'] for crio in formulator.config['absolute_cria']):
+        return None
+    configs = list()
+    for tcs in groups:
+        config = copy.deepcopy(formulator.config)
+        config['reduce'] = False
+        configs.append(config)
+    return configs
+
+
+def meets_budgets(solver, selected_tcs):  # does a selection of the whole problem meet its (upper) budgets
+    tc_index = dict((tc, i) for i, tc in enumerate(solver.tc_list))
+    for weights, ctype, rhs in solver.budgets:
+        used = sum([weights[tc_index[tc]] for tc in selected_tcs])
+        if used > rhs or (ctype == '<' and used == rhs):
+            return False
+    return True
+
+
+def get_subproblem(tcs, config):  # the formulator of a group of components, sharing the criteria of base
+    formulator = copy.copy(base)
+    formulator.config = config
+    tc_set = set(tcs)
+    formulator.tc_list = [tc for tc in base.tc_list if tc in tc_set]
+    formulator.tc_set = tc_set
+    formulator.reduction = None
+    formulator.out_paths = list()
+    formulator.aux_vars = set()
+    return formulator
+
+
+def solve_subproblem(task):
+    tcs, config, solver, time_limit = task
+    return solve(get_subproblem(tcs, config), solver, time_limit)
+
+
+def repair(solver, selected_tcs):
+    # a final pass over the whole problem with the merged selection: the test cases exceeding a budget
+    # are dropped, the crio_ids left uncovered are covered again, and the budgets left are used by the
+    # test cases improving the objective, as by the heuristics of solver.py
+    tc_index = dict((tc, i) for i, tc in enumerate(solver.tc_list))
+    selected, used = solver.new_selection()
+    uncovered = solver.required
+    for tc in selected_tcs:
+        i = tc_index[tc]
+        if solver.fits(i, used):
+            solver.select(i, selected, used)
+            uncovered &= ~solver.covs[i]
+    uncovered = solver.cover_greedy(selected, used, uncovered)
+    solver.improve(selected, used)
+    solver.fill(selected, used)
+    feasible = uncovered == 0 and solver.is_satisfied(used)
+    return [solver.tc_list[i] for i in sorted(selected)], feasible
+
+
+def solve_groups(groups, configs, solver, time_limit, processes=None):  # -> [Result of each group]
+    tasks = [(tcs, config, solver, time_limit) for tcs, config in zip(groups, configs)]
+    processes = min(processes or multiprocessing.cpu_count(), len(tasks))
+    if processes > 1 and not multiprocessing.current_process().daemon:
+        pool = multiprocessing.Pool(processes)
+        results = pool.map(solve_subproblem, tasks, chunksize=1)
+        pool.close()
+        pool.join()
+        return results
+    return [solve_subproblem(task) for task in tasks]
+
+
+def run(formulator, solver, time_limit=60, processes=None):
+    # -> (Result of the whole problem, number of components, sizes of the groups)
+    global base
+    begin = time.time()
+    base = formulator
+    components = get_components(formulator)
+    groups = group_components(components)
+    # the objective of the whole problem as evaluated by batch.solve, the one of the config (e.g. Nemo) for all solvers
+    full = Solver(formulator) if solver in Solver.algorithms else NemoSolver(formulator, time_limit)
+    # the groups share the budgets: first each of them with the whole budgets, then, if the union of their
+    # selections exceeds a budget, with the budgets split between them
+    exact = not full.budgets or len(groups) == 1
+    configs = relax_budgets(formulator, groups)
+    results = solve_groups(groups, configs, solver, time_limit, processes) if configs is not None else None
+    if results is not None and not exact:
+        exact = meets_budgets(full, [tc for result in results for tc in result.selected_tcs])
+    if results is None or not exact:
+        results = solve_groups(groups, split_budgets(formulator, groups), solver, time_limit, processes)
+    merged = list()
+    for result in results:
+        merged.extend(result.selected_tcs)
+    selected_tcs, feasible = repair(full, merged)
+    # the union of the optimal selections is optimal unless the split of the budgets restricts the groups
+    if not feasible:
+        # the split of the budgets can leave the groups without a selection meeting them together,
+        # which does not make the whole problem infeasible: it is solved without the decomposition
+        whole = solve(formulator, solver, time_limit)
+        selected_tcs, status = whole.selected_tcs, whole.status
+    elif exact and all(result.status == 'optimal' for result in results) and sorted(selected_tcs) == sorted(merged):
+        status = 'optimal'
+    else:
+        status = 'feasible'
+    selected = set(selected_tcs)
+    values = dict((tc, 1 if tc in selected else 0) for tc in full.tc_list)
+    objective = full.get_objective(selected_tcs) if status in ['optimal', 'feasible'] else None
+    result = Result('decomposed.' + solver, status, objective, values, selected_tcs, elapsed=time.time() - begin)
+    return result, len(components), [len(tcs) for tcs in groups]
+
+
+if __name__ == '__main__':
+    proj_dir = sys.argv[1]
+    config_fname = sys.argv[2]
+    formulator = Formulator(proj_dir, config_fname)
+    solver = sys.argv[3] if len(sys.argv) > 3 else formulator.config.get('solver', 'greedy')
+    time_limit = float(sys.argv[4]) if len(sys.argv) > 4 else formulator.config.get('time_limit', 60)
+    result, num_components, sizes = run(formulator, solver, time_limit)
+    print('# Components: %d, in %d subproblems of %s test cases' % (num_components, len(sizes),
+                                                                 ', '.join(str(n) for n in sizes)))
+    print('Status: %s' % result.status)
+    if result.objective is not None:
+        print('Objective value: %0.6f' % result.objective)
+    print('# Minimized test suite: %d' % len(result.selected_tcs))
+    print('Time: %0.3fs' % result.elapsed)
+    if result.status in ['optimal', 'feasible']:
+        print('Solution: %s' % result.save(proj_dir, formulator.config['name'], formulator.tc_list))
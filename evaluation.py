@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+from collections import OrderedDict
+
+from criteria import Criteria, popcount, find_crio_file
+from solutions import find_parser, read_solution
+from profiler import profiler
+
+# the criteria a minimized test suite is evaluated on, as by generator.py
+# (label, file, is_multiple)
+EVALUATION = [('statements', 'cov.info', True), ('faults', 'fault.info', True), ('rtime', 'rtime.info', False)]
+# whether a larger value is better, for the Pareto front
+MAXIMIZE = {'tests': False, 'statements': True, 'faults': True, 'rtime': False}
+
+
+class Evaluator:
+    # scores minimized test suites, e.g. the solutions of several solvers or the population of a
+    # heuristic, against the criterion files of a subject, each of them parsed once for all suites:
+    # a suite is the union of the bitsets of its test cases for a coverage file (is_multiple),
+    # and the sum of their values otherwise (e.g. running time)
+    def __init__(self, proj_dir, criteria=None):
+        self.proj_dir = proj_dir
+        self.criteria = criteria or Criteria(proj_dir)
+        self.labels = ['tests']
+        self.files = list()  # (label, criterion file, is_multiple), of the files in the subject only
+        self.tc_to_value = dict()  # label -> {test case: value}, of the files that are not is_multiple
+        self.totals = OrderedDict([('tests', 0)])  # label -> the value of the original suite
+        for label, fname, is_multiple in EVALUATION:
+            if not os.path.exists(find_crio_file(proj_dir, fname)):
+                continue
+            crio_file = self.criteria.get(fname)
+            self.labels.append(label)
+            self.files.append((label, crio_file, is_multiple))
+            self.totals['tests'] = max(self.totals['tests'], len(crio_file.tc_index))
+            if is_multiple:
+                self.totals[label] = crio_file.total_num()
+            else:
+                tc_to_value = dict((tc, v) for tc, v in zip(crio_file.tcs, crio_file.get_values()) if v is not None)
+                self.tc_to_value[label] = tc_to_value
+                self.totals[label] = sum(tc_to_value.values())
+
+    def evaluate(self, selected_tcs):  # e.g. {'tests': 2, 'statements': 3, 'faults': 3, 'rtime': 2}
+        metrics = OrderedDict([('tests', len(selected_tcs))])
+        for label, crio_file, is_multiple in self.files:
+            if is_multiple:
+                metrics[label] = popcount(crio_file.union(selected_tcs))
+            else:
+                tc_to_value = self.tc_to_value[label]
+                metrics[label] = sum([tc_to_value.get(tc, 0) for tc in selected_tcs])
+        return metrics
+
+    def evaluate_all(self, suites):  # [(name, selected test cases)] -> [(name, metrics)]
+        return [(name, self.evaluate(selected_tcs)) for name, selected_tcs in suites]
+
+
+def dominates(a, b, labels):  # is a at least as good as b on every label, and better on one
+    better = False
+    for label in labels:
+        x, y = (a[label], b[label]) if MAXIMIZE[label] else (b[label], a[label])
+        if x < y:
+            return False
+        better = better or x > y
+    return better
+
+
+def pareto_front(rows, labels):  # the indices of the rows [(name, metrics)] not dominated by another row
+    # rows sorted by the first label, best first, so that a row is dominated by an earlier one,
+    # or by a later one of the same first value only
+    first = labels[0]
+    order = sorted(range(len(rows)), key=lambda k: rows[k][1][first], reverse=MAXIMIZE[first])
+    front = list()
+    for k in order:
+        if any(dominates(rows[j][1], rows[k][1], labels) for j in front):
+            continue
+        front = [j for j in front if rows[j][1][first] != rows[k][1][first] or
+                 not dominates(rows[k][1], rows[j][1], labels)]
+        front.append(k)
+    return sorted(front)
+
+
+def load_suites(path, proj_dir, fixed_tcs=None):
+    # the solution files of a directory (those with a parser in solutions.py), or a single solution file,
+    # -> [(file name, selected test cases)]; fixed_tcs: the test cases fixed to 1 by a reduction
+    if os.path.isdir(path):
+        fnames = sorted(f for f in os.listdir(path) if find_parser(f) is not None)
+        paths = [os.path.join(path, f) for f in fnames if os.path.isfile(os.path.join(path, f))]
+    else:
+        paths = [path]
+    suites = list()
+    for p in paths:
+        selected_tcs = read_solution(p, proj_dir).selected_tcs
+        selected_tcs += [tc for tc in fixed_tcs or [] if tc not in selected_tcs]
+        suites.append((os.path.basename(p), selected_tcs))
+    return suites
+
+
+def print_table(evaluator, rows, front):
+    # e.g. name                 tests  statements  faults  rtime  pareto
+    #      (original)           3      3           4      3
+    #      linear.sol.cplex     2      3           3      2      *
+    columns = ['name'] + evaluator.labels + ['pareto']
+    lines = [dict(evaluator.totals, name='(original)')]
+    for k, (name, metrics) in enumerate(rows):
+        lines.append(dict(metrics, name=name, pareto='*' if k in front else ''))
+    widths = [max([len(c)] + [len(str(line.get(c, ''))) for line in lines]) for c in columns]
+    print('  '.join(c.ljust(w) for c, w in zip(columns, widths)).rstrip())
+    for line in lines:
+        print('  '.join(str(line.get(c, '')).ljust(w) for c, w in zip(columns, widths)).rstrip())
+
+
+if __name__ == '__main__':
+    args = profiler.parse_args(sys.argv)  # e.g. --profile=evaluation.profile.json
+    proj_dir = args[1]
+    path = args[2] if len(args) > 2 else proj_dir  # a directory of solution files by default
+    with profiler.stage('evaluator'):
+        evaluator = Evaluator(proj_dir)
+    with profiler.stage('solution'):
+        suites = load_suites(path, proj_dir)
+    with profiler.stage('evaluation'):
+        rows = evaluator.evaluate_all(suites)
+    front = pareto_front(rows, evaluator.labels)
+    print_table(evaluator, rows, front)
+    print('Pareto front: %s' % ', '.join(rows[k][0] for k in front))
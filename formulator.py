@@ -3,278 +3,331 @@
 import json
 import sys
 import os
-import random
-import string
-import math
-import re
+from collections import OrderedDict
+
+from criteria import Criteria
+from cache import Cache
+from model import Model, ModelStream, Constraints, ConstraintStream, Expression, format_product
+from reducer import Reducer
+from profiler import profiler
+from writers import get_formats, get_writer, needs_whole_model
 
 
 class Formulator:
-    def __init__(self, proj_dir, config_fname):
+    def __init__(self, proj_dir, config_fname, config=None, criteria=None):
+        # config and criteria let a caller (e.g. batch.py) pass a config built in memory and
+        # criterion files already parsed for the same subject
         self.proj_dir = proj_dir
-        with open(os.path.join(proj_dir, config_fname), 'r') as f:
-            self.config = json.load(f)
-        self.tc_set = self.get_all_tc()
+        if config is None:
+            with open(os.path.join(proj_dir, config_fname), 'r') as f:
+                config = json.load(f)
+        self.config = config
+        self.criteria = criteria if criteria is not None else Criteria(proj_dir, Cache.from_config(config))
+        self.tc_list = self.get_all_tc()
+        self.tc_set = set(self.tc_list)
+        self.reduction = None  # the test cases fixed by the reduction, if any
+        self.out_paths = list()  # the files written for the model
+        self.aux_vars = set()  # the v_ variables of Nemo-Aux, recorded as they are created
 
-    def get_all_tc(self):  # get the ids of all test cases
-        tcs = set()
-        for crio in self.config['relative_cria']:
-            with open(os.path.join(proj_dir, crio['file']), 'r') as f:
-                for line in f:
-                    tc = line.split(':')[0]
-                    if line.split(':')[1].split():
-                        tcs.add(tc)
-        for crio in self.config['absolute_cria']:
-            with open(os.path.join(proj_dir, crio['file']), 'r') as f:
-                for line in f:
-                    tc = line.split(':')[0]
-                    if line.split(':')[1].split():
-                        tcs.add(tc)
+    def get_all_tc(self):  # get the ids of all test cases, in order of appearance
+        tcs = list()
+        seen = set()
+        for crio in self.config['relative_cria'] + self.config['absolute_cria']:
+            for tc in self.criteria.get(crio['file']).covering_tcs():
+                if tc not in seen:
+                    seen.add(tc)
+                    tcs.append(tc)
         return tcs
 
     def gen_model(self):
-        constraints = self.gen_constraint()
-        if self.config['nonlinear']:
-            if self.config['relax']:
-                obj_coeff, extra_constraints = self.gen_objective_aux()
-                constraints += extra_constraints
-            else:
-                obj_coeff = self.gen_objective_nl()
-        else:
-            obj_coeff = self.gen_objective()
-        self.save(obj_coeff, constraints)
+        # with a cache, the model files of the same config and criterion files are copied from the cache
+        cache = Cache.from_config(self.config)
+        if cache is not None:
+            with profiler.stage('cache'):
+                key = cache.model_key(self.proj_dir, self.config)
+                restored = cache.restore(key, self.proj_dir)
+            if restored:
+                return
+        # the whole model only for a writer needing it (e.g. mps), otherwise the rows are generated again
+        # by each writer, one at a time
+        model = self.get_model(stream=not needs_whole_model(self.config))
+        with profiler.stage('write'):
+            self.save(model)
+        if cache is not None:
+            with profiler.stage('cache'):
+                cache.store(key, dict((os.path.basename(path), path) for path in self.out_paths))
+        if profiler.enabled:
+            profiler.count('tests', len(self.tc_list))
+            profiler.count('constraints', model.num_rows())
+            profiler.count('aux_vars', len(self.aux_vars))
+            profiler.count('bytes_written', sum([os.path.getsize(path) for path in self.out_paths]))
+
+    def get_out_path(self, suffix):  # the path of a file written for the model, e.g. '.cplex.lp'
+        out_path = os.path.join(self.proj_dir, self.config['name'] + suffix)
+        self.out_paths.append(out_path)
+        return out_path
+
+    def build_model(self):
+        # the objective terms and the constraint rows are generated lazily, to be streamed to the model
+        # file by save() or passed to a solver by backends.py
+        # (each step of the generators is timed as a stage of the profiler, if enabled)
+        obj_coeff = self.build_objective()
+        constraints = self.build_constraints()
+        if self.config.get('reduce', False):
+            with profiler.stage('reduce'):
+                obj_coeff, constraints = self.reduce(obj_coeff, constraints)
+        return obj_coeff, constraints
+
+    def build_objective(self):
+        if not self.config['nonlinear']:
+            with profiler.stage('objective'):
+                return self.gen_objective()
+        if self.config['relax']:
+            return profiler.wrap('objective', self.gen_objective_aux())
+        return self.gen_objective_nl()
+
+    def build_constraints(self):  # a new ConstraintStream of the rows each time
+        constraints = ConstraintStream().extend(profiler.wrap('constraints', self.gen_constraint()))
+        if self.config['nonlinear'] and self.config['relax']:
+            constraints.extend(profiler.wrap('constraints', self.gen_constraint_aux()))
+        return constraints
+
+    def reduce(self, obj_coeff, constraints):
+        # test cases are only eliminated from a linear model; the mapping lets generator.py
+        # expand the solution of the reduced model back to the original test cases
+        # the reduction needs the whole model in memory
+        if not isinstance(obj_coeff, Expression):
+            obj_coeff = OrderedDict(obj_coeff.items() if isinstance(obj_coeff, dict) else obj_coeff)
+        constraints = Constraints().extend(constraints.iter_terms())
+        reducer = Reducer(self.tc_list, obj_coeff, constraints, self.config['min_or_max'],
+                          not self.config['nonlinear'])
+        self.tc_list, obj_coeff, constraints = reducer.reduce()
+        self.tc_set = set(self.tc_list)
+        self.reduction = reducer.get_mapping()
+        out_path = self.get_out_path('.reduction.json')
+        with open(out_path, 'w') as f:
+            json.dump(self.reduction, f, indent=2, sort_keys=True, separators=(',', ': '))
+        return obj_coeff, constraints
 
     def get_crio_total_num(self, crio_fname):  # get total number of distinct crio_ids
         # e.g. t2:1 3 5  # crio_ids
         #      t3:
         #      t4:199
-        crio_set = set()
-        with open(os.path.join(self.proj_dir, crio_fname), 'r') as f:
-            for line in f:
-                for c in line.split(':')[1].split():
-                    crio_set.add(c)
-        return len(crio_set)
+        return self.criteria.get(crio_fname).total_num()
 
     def get_crio_max_num(self, crio_fname):  # get the maximum of the coefficients (e.g., max execution time of a test case)
         # e.g. t2:100  # one and only one positive integer
         #      t3:23
-        max_num = -1
-        with open(os.path.join(self.proj_dir, crio_fname), 'r') as f:
-            for line in f:
-                c = int(line.split(':')[1])
-                if c > max_num:
-                    max_num = c
-        return max_num
+        return self.criteria.get(crio_fname).max_num()
 
-    def gen_objective(self):
-        tc_to_coefficient = dict()
+    def get_objective_tcs(self):  # test cases of the objective, in order of appearance in the relative_cria
+        tcs = list()
+        seen = set()
+        for crio in self.config['relative_cria']:
+            for tc in self.criteria.get(crio['file']).tcs:
+                if tc in self.tc_set and tc not in seen:
+                    seen.add(tc)
+                    tcs.append(tc)
+        return tcs
+
+    def get_coefficients(self, crio, tcs, penalty=True):
+        # the coefficients of one criterion for the given test cases, in one pass over the counts (or the values)
+        # of its file instead of one lookup per line (None if not in the file)
+        # e.g. t2:1 3  # is_dependent: number of crio_ids / total number of distinct crio_ids
+        #      t3:23   # otherwise: value / maximum value
+        crio_file = self.criteria.get(crio['file'])
+        if crio['is_dependent']:
+            q = float(self.get_crio_total_num(crio['file']))
+            nums = crio_file.get_counts()
+        else:
+            q = float(self.get_crio_max_num(crio['file']))
+            nums = [v if v is not None else 0 for v in crio_file.get_values()]
+        index = [crio_file.tc_index.get(tc) for tc in tcs]
+        coverages = [round(nums[t] / q, 6) if t is not None else None for t in index]
+        if crio['invert']:
+            coeffs = [1 - c if c is not None else None for c in coverages]
+        else:
+            coeffs = coverages
+        if penalty:
+            # if coeff=0, the test can be selected without penalty;
+            # introduce penalty to avoid this, because we want a minimized suite
+            eps = 0.000001 if self.config['min_or_max'].lower() == 'min' else -0.000001
+            coeffs = [eps if c == 0 else c for c in coeffs]
+        return coeffs
+
+    def gen_objective(self, tcs=None):
+        # one list of coefficients per criterion over all test cases (or the given ones, e.g. of solver.py),
+        # summed criterion by criterion
+        tcs = self.get_objective_tcs() if tcs is None else tcs
+        totals = [None] * len(tcs)
         for crio in self.config['relative_cria']:
-            fname = crio['file']
             weight = int(crio['weight'])
-            is_invert = crio['invert']
-            if crio['is_dependent']:
-                q = self.get_crio_total_num(fname)
+            coeffs = self.get_coefficients(crio, tcs)
+            totals = [(weight*c if s is None else s + weight*c) if c is not None else s
+                      for s, c in zip(totals, coeffs)]
+        return OrderedDict([(tc, s) for tc, s in zip(tcs, totals) if s is not None])
+
+    def get_aux_crio(self):
+        # (criterion index, criterion, coefficient of its v_ variables) of the dependent criteria of Nemo-Aux;
+        # the v_ variable of a crio_id is 1 only if a selected test case covers it, and the objective
+        # pushes it to 1 if its coefficient is negative (min) or positive (max) only: otherwise it is 0
+        # in every optimal solution, and is left out of the model with its constraint
+        sign = 1 if 'min' in self.config['min_or_max'].lower() else -1
+        for k, crio in enumerate(self.config['relative_cria']):
+            if not crio['is_dependent']:
+                continue
+            q = self.get_crio_total_num(crio['file'])
+            coeff = int(crio['weight']) * round(1/float(q), 6) * (-1 if crio['invert'] else 1)
+            if sign * coeff < 0:
+                yield k, crio, coeff
+
+    def iter_covering_tcs(self, crio):  # (crio index, test cases covering it) of the crio_ids covered in the model
+        crio_file = self.criteria.get(crio['file'])
+        for c, t_list in enumerate(crio_file.crio_to_tc):
+            tcs = [crio_file.tcs[t] for t in t_list if crio_file.tcs[t] in self.tc_set]
+            if tcs:
+                yield c, tcs
+
+    def iter_distinct_covers(self, crio):
+        # (crio index, test cases covering it, number of crio_ids covered by the same test cases) of the first
+        # of the crio_ids covered by each distinct set of test cases, e.g. the statements of a basic block
+        covers = OrderedDict()
+        for c, tcs in self.iter_covering_tcs(crio):
+            key = tuple(tcs)
+            if key in covers:
+                covers[key][1] += 1
             else:
-                q = self.get_crio_max_num(fname)
-            with open(os.path.join(proj_dir, fname), 'r') as f:
-                for line in f:
-                    tc = line.split(':')[0]
-                    if tc not in self.tc_set:
-                        continue
-                    if crio['is_dependent']:
-                        # e.g. t2:
-                        #      t3:1 3
-                        c_list = line.split(':')[1].split()
-                        if len(c_list) > 0:
-                            c_coverage = len(c_list) / float(q)
-                        else:
-                            c_coverage = 0
-                        if is_invert:
-                            coeff = 1-round(c_coverage, 6)
-                        else:
-                            coeff = round(c_coverage, 6)
-                    else:
-                        # e.g. t2:100  # one and only one positive integer
-                        #      t3:23
-                        c = int(line.split(':')[1])
-                        c_coverage = c/float(q)
-                        if is_invert:
-                            coeff = 1-round(c_coverage, 6)
-                        else:
-                            coeff = round(c_coverage, 6)
-                    if coeff == 0:  
-                        # if coeff=0, the test can be selected without penalty; 
-                        # introduce penalty to avoid this, because we want a minimized suite
-                        if self.config['min_or_max'].lower() == 'min':
-                            coeff = 0.000001
-                        else:  # max
-                            coeff = -0.000001
-                    if tc in tc_to_coefficient.keys():
-                        tc_to_coefficient[tc] += weight*coeff
-                    else:
-                        tc_to_coefficient[tc] = weight*coeff
-        return tc_to_coefficient
+                covers[key] = [c, 1]
+        for tcs, (c, n) in covers.items():
+            yield c, tcs, n
+
+    def iter_aux_vars(self, k, crio):
+        # (v_ variable, test cases covering the crio_id) of each crio_id covered by a test case of the model,
+        # e.g. v_0_12: the crio_id of index 12 of the first relative criterion
+        for c, tcs in self.iter_covering_tcs(crio):
+            yield 'v_%d_%d' % (k, c), tcs
 
     def gen_objective_aux(self):
+        # yields (variable, coefficient); the coefficient of a test case is summed over the criteria
+        # first, then the test cases are followed by one v_ variable per crio_id of the dependent criteria
         tc_to_coefficient = dict()
-        constraints = list()
         for crio in self.config['relative_cria']:
-            prefix = ''.join(random.choice(string.ascii_uppercase + string.digits) for _ in range(3))
-            crio_to_tc = dict()
-            fname = crio['file']
             weight = int(crio['weight'])
-            is_invert = crio['invert']
+            tcs = [tc for tc in self.criteria.get(crio['file']).tcs if tc in self.tc_set]
             if crio['is_dependent']:
-                q = self.get_crio_total_num(fname)
+                if crio['invert']:
+                    for tc in tcs:
+                        tc_to_coefficient[tc] = tc_to_coefficient.get(tc, 0) + weight
             else:
-                q = self.get_crio_max_num(fname)
-            with open(os.path.join(proj_dir, fname), 'r') as f:
-                for line in f:
-                    tc = line.split(':')[0]
-                    if tc not in self.tc_set:
-                        continue
-                    if crio['is_dependent']:
-                        # e.g. t2:
-                        #      t3:1 3
-                        coeff = -round((1/float(q)), 6) if is_invert else round((1/float(q)), 6)
-                        tc_no = tc.replace('t', '')
-                        c_list = line.split(':')[1].split()
-                        v_i_j = ['v_' + prefix + '_' + tc_no + '_' + str(c_no) for c_no in c_list]
-                        if is_invert:
-                            if tc in tc_to_coefficient.keys():
-                                tc_to_coefficient[tc] += weight
-                            else:
-                                tc_to_coefficient[tc] = weight
-                        if len(v_i_j) > 0 and coeff != 0:
-                            for k in v_i_j:  # k is unique in v_i_j
-                                tc_to_coefficient[k] = weight*coeff
-                        for c in c_list:
-                            if c in crio_to_tc.keys():
-                                crio_to_tc[c].append(tc_no)
-                            else:
-                                crio_to_tc[c] = [tc_no]
-                    else:
-                        # e.g. t2:100  # one and only one positive integer
-                        #      t3:23
-                        c = int(line.split(':')[1])
-                        c_coverage = c/float(q)
-                        if is_invert:
-                            coeff = 1-round(c_coverage, 6)
-                        else:
-                            coeff = round(c_coverage, 6)
-                        if tc in tc_to_coefficient.keys():
-                            tc_to_coefficient[tc] += weight*coeff
-                        else:
-                            tc_to_coefficient[tc] = weight*coeff
-            # extra constraints
-            for j in crio_to_tc.keys():
-                v_i_j = list()
-                for tc_no in crio_to_tc[j]:
-                    lhs = 'v_' + prefix + '_' + tc_no + '_' + j
-                    rhs = 't' + tc_no
-                    constraints.append((lhs, '<=', rhs))
-                    v_i_j.append(lhs)
-                lhs = '+'.join(v_i_j)
-                if (lhs, '<=', 1) not in constraints:
-                    constraints.append((lhs, '<=', 1))
-        return tc_to_coefficient, constraints                                                                 
+                # e.g. t2:100  # one and only one positive integer
+                #      t3:23
+                for tc, coeff in zip(tcs, self.get_coefficients(crio, tcs, penalty=False)):
+                    tc_to_coefficient[tc] = tc_to_coefficient.get(tc, 0) + weight*coeff
+        emitted = set()
+        for crio in self.config['relative_cria']:
+            if crio['invert'] or not crio['is_dependent']:
+                for tc in self.criteria.get(crio['file']).tcs:
+                    if tc in self.tc_set and tc not in emitted:
+                        emitted.add(tc)
+                        yield tc, tc_to_coefficient[tc]
+        for k, crio, coeff in self.get_aux_crio():
+            for v, _ in self.iter_aux_vars(k, crio):
+                yield v, coeff
+
+    def gen_constraint_aux(self):
+        # yields the extra constraints of Nemo-Aux: v_j <= sum_i t_i over the test cases i covering crio_id j,
+        # i.e. v_j can be 1 only if crio_id j is covered (one v_ per crio_id, instead of one per test case
+        # and crio_id with v_i_j <= t_i and sum_i v_i_j <= 1, for the same optimal objective)
+        for k, crio, _ in self.get_aux_crio():
+            for v, tcs in self.iter_aux_vars(k, crio):
+                self.aux_vars.add(v)
+                yield [v] + ['-' + tc for tc in tcs], '<=', 0
 
     def gen_objective_nl(self):
-        equations = list()
-        for crio in self.config['relative_cria']:
-            fname = crio['file']
+        # the objective of Nemo-Nonlinear as an Expression of model.py, streamed to the model file by the writer
+        return Expression(lambda: profiler.wrap('objective', self.gen_defined_nl()),
+                          lambda: profiler.wrap('objective', self.gen_terms_nl()))
+
+    def gen_defined_nl(self):
+        # yields (defined variable, expression); e_k_c is 1 if exactly one of the selected test cases covers
+        # crio_id c of the relative criterion k, e.g. for t1, t3, t5 covering it:
+        #   e_k_c = t1*(1-t3)*(1-t5) + t3*(1-t1)*(1-t5) + t5*(1-t1)*(1-t3)
+        # written with the products of the (1-t) before (p_k_c_i) and after (s_k_c_i) the i-th test case,
+        # shared by the terms, so that the model grows with the test cases covering a crio_id instead of their square;
+        # the crio_ids covered by the same test cases share the e_k_c of the first of them
+        for k, crio in enumerate(self.config['relative_cria']):
+            if not crio['is_dependent']:
+                continue
+            for c, tcs, _ in self.iter_distinct_covers(crio):
+                m = len(tcs)
+                if m < 2:
+                    continue
+                factors = ['(1-' + tc + ')' for tc in tcs]
+                before = [None] * m
+                after = [None] * m
+                for i in range(1, m):
+                    if i == 1:
+                        before[i] = factors[0]
+                    else:
+                        before[i] = 'p_%d_%d_%d' % (k, c, i)
+                        yield before[i], before[i - 1] + '*' + factors[i - 1]
+                for i in range(m - 2, -1, -1):
+                    if i == m - 2:
+                        after[i] = factors[m - 1]
+                    else:
+                        after[i] = 's_%d_%d_%d' % (k, c, i)
+                        yield after[i], factors[i + 1] + '*' + after[i + 1]
+                products = ['*'.join([tc] + [x for x in (before[i], after[i]) if x is not None])
+                            for i, tc in enumerate(tcs)]
+                yield 'e_%d_%d' % (k, c), '+'.join(products)
+
+    def gen_terms_nl(self):
+        # yields the terms of the objective, criterion by criterion:
+        #   is_dependent: weight/q * n * e_k_c for each e_k_c of n crio_ids (or the only test case covering them),
+        #                 weight * t - weight/q * n * e_k_c instead if invert
+        #   otherwise:    weight * coefficient * t, the coefficients of get_coefficients
+        for k, crio in enumerate(self.config['relative_cria']):
             weight = int(crio['weight'])
-            is_invert = crio['invert']
+            crio_file = self.criteria.get(crio['file'])
             if crio['is_dependent']:
-                q = self.get_crio_total_num(fname)
-                coeff_denom = round(1/float(q), 6)
-                # first pass
-                crio_to_tc = dict()
-                tc_to_crio = dict()
-                with open(os.path.join(proj_dir, fname), 'r') as f:
-                    for line in f:
-                        tc = line.split(':')[0]
-                        if tc not in self.tc_set:
-                            continue
-                        c_list = line.split(':')[1].split()
-                        if c_list:
-                            tc_to_crio[tc] = c_list
-                            for c in c_list:
-                                if c in crio_to_tc.keys():
-                                    crio_to_tc[c].append(tc)
-                                else:
-                                    crio_to_tc[c] = [tc]
-                        else:
-                            tc_to_crio[tc] = list()
-                # second pass
-                equation = ''
-                if is_invert:
-                    for t, c_list in tc_to_crio.items():
-                        inner_equations = list()
-                        for c in c_list:
-                            tcs = ['(1-' + t_i + ')' for t_i in crio_to_tc[c] if t_i != t]
-                            if tcs:
-                                inner_equations.append('*'.join(tcs))
-                            else:
-                                inner_equations.append('1')
-                        if inner_equations:
-                            equation += t + '*(1-' + str(coeff_denom) + '*('
-                            equation += '\n+'.join(inner_equations)
-                            equation += '))\n+'
-                        else:
-                            equation += t + '\n+'
-                    equations.append(equation[:-2])  # remove the final '\n+'
-                else:
-                    for t, c_list in tc_to_crio.items():
-                        inner_equations = list()
-                        for c in c_list:
-                            tcs = ['(1-' + t_i + ')' for t_i in crio_to_tc[c] if t_i != t]
-                            if tcs:
-                                inner_equations.append('*'.join(tcs))
-                            else:
-                                inner_equations.append('1')
-                        if inner_equations:
-                            equation += t + '*(' + str(coeff_denom) + '*('
-                            equation += '\n+'.join(inner_equations)
-                            equation += '))\n+'
-                    equations.append(equation[:-2])  # remove the final '\n+'
+                coeff = round(weight * round(1/float(self.get_crio_total_num(crio['file'])), 6), 6)
+                if crio['invert']:
+                    for tc in crio_file.tcs:
+                        if tc in self.tc_set:
+                            yield format_product(weight, tc)
+                    coeff = -coeff
+                for c, tcs, n in self.iter_distinct_covers(crio):
+                    yield format_product(round(n * coeff, 6), tcs[0] if len(tcs) == 1 else 'e_%d_%d' % (k, c))
             else:
-                q = self.get_crio_max_num(fname)
-                assert False  # not implemented yet
-        return '+'.join(equations)
+                # e.g. t2:100  # one and only one positive integer
+                #      t3:23
+                tcs = [tc for tc in crio_file.tcs if tc in self.tc_set]
+                for tc, coeff in zip(tcs, self.get_coefficients(crio, tcs, penalty=False)):
+                    if coeff:
+                        yield format_product(round(weight * coeff, 6), tc)
 
-    def gen_constraint(self):
-        constraints = list()
+    def gen_constraint(self):  # yields (terms, ctype, rhs)
         for crio in self.config['absolute_cria']:
             fname = crio['file']
+            crio_file = self.criteria.get(fname)
             if crio['is_coefficient']:
-                tc_to_coeff = dict()
-                with open(os.path.join(self.proj_dir, fname), 'r') as f:
-                    # e.g. t33:50  # the coeffecient for the test case, instead of the crio_ids
-                    #      t34:72
-                    for line in f:
-                        tc = line.split(':')[0]
-                        tc_to_coeff[tc] = line.split(':')[1].strip()
-                lhs = '+'.join([v + k for k, v in tc_to_coeff.items()]).replace('+-', '-')
-                if (lhs, crio['crio_type'], crio['rhs']) not in constraints:
-                    constraints.append((lhs, crio['crio_type'], crio['rhs']))
+                # e.g. t33:50  # the coeffecient for the test case, instead of the crio_ids
+                #      t34:72
+                tc_to_coeff = OrderedDict()
+                for t, tc in enumerate(crio_file.tcs):
+                    c_list = crio_file.tc_to_crio[t]
+                    if c_list and tc in self.tc_set:
+                        tc_to_coeff[tc] = crio_file.crio_ids[c_list[0]]
+                yield [v + k for k, v in tc_to_coeff.items()], crio['crio_type'], crio['rhs']
             else:
                 # all of the crio_id have to be covered at least once
-                crio_to_tcs = dict()
-                with open(os.path.join(self.proj_dir, fname), 'r') as f:
-                    for line in f:
-                        # e.g. t2:390 395 396 400 401 405 406 409 412 413 450 ... (crio_ids)
-                        tc = line.split(':')[0]
-                        for crio_id in line.split(':')[1].split():
-                            if crio_id in crio_to_tcs.keys():
-                                crio_to_tcs[crio_id].append(tc)
-                            else:
-                                crio_to_tcs[crio_id] = [tc]                
+                # e.g. t2:390 395 396 400 401 405 406 409 412 413 450 ... (crio_ids)
                 # for the classic minimization problem: statements are covered at least once
-                for tc_list in crio_to_tcs.values():
-                    lhs = '+'.join(tc_list)
-                    if (lhs, '>=', 1) not in constraints:
-                        constraints.append((lhs, '>=', 1))                
+                # a crio_id no longer covered after an update is not required, and one of the test cases
+                # of another component (see decompose.py) is not part of the model
+                for t_list in crio_file.crio_to_tc:
+                    if t_list and crio_file.tcs[t_list[0]] in self.tc_set:
+                        yield [crio_file.tcs[t] for t in t_list], '>=', 1
                 '''
                 # for the variant bi-criteria minimization problem:
                 # some statements are covered multiple times
@@ -296,166 +349,32 @@ class Formulator:
                     if (lhs, '>=', 1) not in constraints:
                         constraints.append((lhs, '>=', 1))
                 '''
-        return constraints
 
-    def save(self, tc_to_coeff, constraints):
-        if self.config['output_format'] == 'lp_solve':
-            # tc_to_coeff is a dict here
-            out_path = os.path.join(self.proj_dir, self.config['name'] + '.lp_solve')
-            with open(out_path, 'w') as f:
-                # objctive function
-                obj_func = list()
-                f.write('/*objective function*/\n')
-                for tc, coeff in tc_to_coeff.items():
-                    if coeff != 0:
-                        coeff_str = '%0.6f' % coeff
-                        obj_func.append(coeff_str + ' ' + tc)
-                f.write(self.config['min_or_max']+ ': ')
-                f.write('+'.join(obj_func).replace('+-', '-') + ';\n')
-                # constraints
-                f.write('/* constraints */\n')
-                for lhs, ctype, rhs in constraints:
-                    f.write(lhs + ctype + str(rhs) + ';\n')
+    def iter_objective(self, tc_to_coeff):  # (variable, coefficient) pairs of a dict or of a generator
+        return tc_to_coeff.items() if isinstance(tc_to_coeff, dict) else tc_to_coeff
+
+    def get_model(self, stream=False):
+        # the Model of model.py, the rows deduplicated as they are generated; with stream, a ModelStream
+        # generating the rows again each time they are read instead of keeping them, unless the reduction
+        # has kept them in memory anyway
+        if stream and not self.config.get('reduce', False):
+            obj_coeff = self.build_objective()
+            with profiler.stage('model'):
+                return ModelStream(self.config['min_or_max'], self.tc_list, obj_coeff,
+                                   lambda: profiler.wrap('dedup', self.build_constraints().iter_terms()))
+        obj_coeff, constraints = self.build_model()
+        with profiler.stage('model'):
+            return Model.build(self.config['min_or_max'], self.tc_list, obj_coeff,
+                               profiler.wrap('dedup', constraints.iter_terms()))
+
+    def save(self, model):  # the model files of every output format, from the same model
+        for output_format in get_formats(self.config):
+            get_writer(output_format)(model, self)
 
-                for tc in self.tc_set:
-                    f.write('0<=' + tc + '<=1;\n')
-                # assign variables as binary would make variables in single-variable equation (e.g. t2 >=1) are 'redefined'
-                # by the solver when solving the equations and therefore produce wrong answer'
-                f.write('/* variables */\n')
-                f.write('int ' + ','.join(list(self.tc_set)) + ';\n')
-        elif self.config['output_format'] == 'cplex_lp':
-            # tc_to_coeff is a dict here
-            out_path = os.path.join(self.proj_dir, self.config['name'] + '.cplex.lp')
-            with open(out_path, 'w') as f:
-                # objctive function
-                if 'min' in self.config['min_or_max']:
-                    f.write('minimize\n\n')
-                else:
-                    f.write('maximize\n\n')
-                obj_func = list()
-                for tc, coeff in tc_to_coeff.items():
-                    if coeff != 0:
-                        #coeff_str = str(coeff)
-                        coeff_str = '%0.6f' % coeff
-                        if coeff_str[0] != '-':
-                            coeff_str = '+' + coeff_str
-                        obj_func.append(coeff_str + ' ' + tc)
-                num_group = int(math.floor(len(obj_func)/500)) + 1
-                for i in range(0, num_group):
-                    obj_str = ' '.join(obj_func[i*500:(i+1)*500]).replace('+ -', '-') + '\n'
-                    f.write(obj_str)
-                    #if i < num_group-1 and (i+1)*500 < len(obj_func) and not obj_str.startswith('-'):
-                    #    f.write(' + ')
-                f.write('\n')
-                # constraints
-                vij_set = set()
-                f.write('subject to\n\n')
-                for lhs, ctype, rhs in constraints:
-                    for vij in re.findall('v_\w{3}_\d+_\d+', lhs):
-                        vij_set.add(vij)
-                    if str(rhs).isdigit():
-                        f.write(lhs + ctype + str(rhs) + '\n')
-                    else:
-                        f.write(lhs + '-' + str(rhs) + ctype + '0\n')
-                f.write('\n')
-                # variable declaration
-                all_tc = list(self.tc_set) + list(vij_set)
-                num_group = int(math.floor(len(all_tc)/500)) + 1
-                f.write('binary\n\n')
-                for i in range(0, num_group):
-                    f.write(' '.join(all_tc[i*500:(i+1)*500]) + '\n')
-                f.write('\nend')
-        elif self.config['output_format'] == 'ampl':
-             # tc_to_coeff is a dict here
-             out_path = os.path.join(self.proj_dir, self.config['name'] + '.ampl')
-             with open(out_path, 'w') as f:
-                # var declaration
-                for t in self.tc_set:
-                    f.write('var %s binary;\n' % t)
-                # objective func
-                obj_func = list()
-                if 'min' in self.config['min_or_max']:
-                    f.write('minimize obj:')
-                else:
-                    f.write('maximize obj:')
-                for tc, coeff in tc_to_coeff.items():
-                    if coeff != 0:
-                        coeff_str = '%0.6f' % coeff
-                        obj_func.append(coeff_str + '*' + tc)
-                f.write('+'.join(obj_func).replace('+-', '-') + ';\n')
-                # constraints
-                c_no = 1
-                for lhs, ctype, rhs in constraints:
-                    f.write('subject to c%s: %s;\n' % (str(c_no), lhs + ctype + str(rhs)))
-                    c_no += 1
-        elif self.config['output_format'] == 'couenne_ampl':  # ampl format
-            # tc_to_coeff is a string here
-            assert self.config['nonlinear']
-            assert not self.config['relax']
-            out_path = os.path.join(self.proj_dir, self.config['name'] + '.ampl')
-            with open(out_path, 'w') as f:
-                # var declaration
-                for t in self.tc_set:
-                    f.write('var %s binary;\n' % t)
-                if 'min' in self.config['min_or_max']:
-                    f.write('minimize obj:')
-                else:
-                    f.write('maximize obj:')
-                # objctive function
-                f.write(tc_to_coeff + ';\n')
-                # constraints
-                c_no = 1
-                for lhs, ctype, rhs in constraints:
-                    f.write('subject to c%s: %s;\n' % (str(c_no), lhs + ctype + str(rhs)))
-                    c_no += 1
-        elif self.config['output_format'] == 'mints': 
-            # reorder and remap all test cases sequentially
-            tc_to_newid = dict()
-            t_index = 1
-            for t in self.tc_set:
-                if t not in tc_to_newid.keys():
-                    tc_to_newid[t] = t_index
-                    t_index += 1
-            out_path = os.path.join(self.proj_dir, self.config['name'] + '.mints.mapping.json')
-            with open(out_path, 'w') as f:
-                json.dump(tc_to_newid, f, indent=2, sort_keys=True)
-            # objective function
-            # tc_to_coeff is a dict here
-            out_path = os.path.join(self.proj_dir, self.config['name'] + '.relative')
-            with open(out_path, 'w') as f:
-                f.write('1\n')
-                tc_list = tc_to_coeff.keys()
-                newid_list = [tc_to_newid[t] for t in tc_list]
-                coeff_list = [tc_to_coeff[t] for t in tc_list]
-                tmp_out = list()
-                assert len(tc_to_newid) == len(tc_list)
-                for i in range(1, len(tc_to_newid)+1):
-                    assert i in newid_list
-                    idx = newid_list.index(i)
-                    coeff = int(coeff_list[idx] * 1000000)
-                    tmp_out.append(str(coeff))
-                f.write(' '.join(tmp_out) + '\n')
-            # constraints
-            out_path = os.path.join(self.proj_dir, self.config['name'] + '.absolute')
-            with open(out_path, 'w') as f:
-                for lhs, ctype, rhs in constraints:
-                    assert ctype == '>=' and rhs == 1
-                    f.write('b\n1\n')
-                    tc_list = lhs.split('+')
-                    newid_list = [tc_to_newid[tc] for tc in tc_list]
-                    tmp_out = list()
-                    for i in range(1, len(tc_to_newid)+1):
-                        if i in newid_list:
-                            tmp_out.append('1')
-                        else:
-                            tmp_out.append('0')
-                    f.write(' '.join(tmp_out) + '\n')
-        else:
-            assert False  # not implemented yet
-    
 
 if __name__ == '__main__':
-    proj_dir = sys.argv[1]
-    config_fname = sys.argv[2]
+    args = profiler.parse_args(sys.argv)  # e.g. --profile=linear.profile.json --cprofile=linear.prof
+    proj_dir = args[1]
+    config_fname = args[2]
     formulator = Formulator(proj_dir, config_fname)
     formulator.gen_model()
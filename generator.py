@@ -3,205 +3,73 @@
 
 import sys
 import os
-import xml.etree.ElementTree
 import json
 
-cov_fname = 'cov.info'
-fault_fname = 'fault.info'
-rtime_fname = 'rtime.info'
+from solutions import read_solution
+from evaluation import Evaluator, load_suites, pareto_front, print_table
+from profiler import profiler
+
+sys.argv = profiler.parse_args(sys.argv)  # e.g. --profile=generator.profile.json --cprofile=generator.prof
 proj_path = sys.argv[1]
-sol_fname = sys.argv[2]  # linear.sol.cplex | nonlinear.sol.couenne | minisat | obpdp
+sol_fname = sys.argv[2]  # linear.sol.cplex | nonlinear.sol.couenne | minisat | obpdp, see solutions.py,
+                         # or a directory of solution files to compare
+reduction_fname = sys.argv[3] if len(sys.argv) > 3 else None  # e.g. linear.reduction.json
 assert proj_path
 assert sol_fname
 
 
-def load_mints_mapping():
-    tc_to_newid = dict()
-    newid_to_tc = dict()
-    assert os.path.exists(os.path.join(proj_path, 'linear_so.mints.mapping.json'))
-    with open(os.path.join(proj_path, 'linear_so.mints.mapping.json'), 'r') as f:
-        tc_to_newid = json.load(f)
-    for tc, newid in tc_to_newid.items():
-        k = 't' + str(newid)
-        if k not in newid_to_tc.keys():
-            newid_to_tc[k] = tc
-    return newid_to_tc
-    
-def get_selected_tcs(fname):
-    selected_tcs = list()
-    if fname.endswith('.sol'):
-        with open(os.path.join(proj_path, fname), 'r') as f:
-            for line in f:
-                if line.startswith('t'):
-                    # e.g. t6                              0
-                    #      t57                             1
-                    if line.split()[1] == '1':
-                        selected_tcs.append(line.split()[0])
-                    else:
-                        assert line.split()[1] == '0'
-    elif fname.endswith('.soplex'):
-        with open(os.path.join(proj_path, fname), 'r') as f:
-            is_start = False
-            for line in f:
-                if line.startswith('Primal solution'):
-                    is_start = True
-                    continue
-                if is_start and line.startswith('All other variables'):
-                    is_start = False
-                if not is_start:
-                    continue
-                else:
-                    assert line.startswith('t')
-                    # e.g. t1854                                       0.1e1
-                    #      t1854                                       0.1e1
-                    selected_tcs.append(line.split()[0])
-    elif fname.endswith('.bpmpd'):
-        with open(os.path.join(proj_path, fname), 'r') as f:
-            is_start = False
-            for line in f:
-                if line.startswith(' -------------C-O-L-U-M-N-S'):
-                    is_start = True
-                    continue
-                if is_start and line.startswith(' ---------------S-L-A-C-K---R-E-'):
-                    is_start = False
-                if not is_start:
-                    continue
-                else:
-                    if line.startswith(' t'):
-                        # e.g. t1459     0.00000000000E+00 CHEPDU  0.10000000000E+01
-                        #      t1453     0.10000000000E+01 CHEPDU  0.96153800000E+00
-                        if line.split()[1] == '0.10000000000E+01':
-                            selected_tcs.append(line.split()[0])
-                        elif line.split()[1] != '0.00000000000E+00':
-                            print line.split()[1]
-    elif fname.endswith('.cplex'):
-        with open(os.path.join(proj_path, fname), 'r') as f:
-            is_start = False
-            for line in f:
-                if line.startswith('CPLEX> Variable Name') or line.startswith('CPLEX> Incumbent solution'):
-                    is_start = True
-                    continue
-                if is_start and line.startswith('All other variables'):
-                    is_start = False
-                if not is_start:
-                    continue
-                else:
-                    assert line.startswith('t') or line.startswith('Variable Name') or line.startswith('v_')
-                    if line.startswith('t'):
-                        assert line.split()[1] == '1.000000'
-                        # e.g. t1431                         1.000000
-                        selected_tcs.append(line.split()[0])
-                    elif line.startswith('v_'):
-                        assert line.split()[1] == '1.000000'
-    elif fname.endswith('.xml'):
-        e = xml.etree.ElementTree.parse(os.path.join(proj_path, fname)).getroot()
-        for v in e.find('variables').findall('variable'):
-            if v.get('name').startswith('t'):
-                if v.get('value') == '1':
-                    selected_tcs.append(v.get('name'))
-                else:
-                    assert v.get('value') == '0' or v.get('value') == '-0'
-    elif fname.endswith('minisat'):  # for MINTS-minisat+
-        newid_to_tc = load_mints_mapping()
-        with open(os.path.join(proj_path, fname), 'r') as f:
-            for line in f:
-                if line.startswith('v'):
-                    tcs = line.split()[1:]
-            for tc in tcs:
-                if tc.startswith('x'):
-                    selected_tcs.append(newid_to_tc[tc.replace('x', 't')])
-    elif fname.endswith('opbdp'):  # for MINTS-opbdp
-        # 0-1 Variables fixed to 1 : x1 x6 x21 x33
-        newid_to_tc = load_mints_mapping()
-        with open(os.path.join(proj_path, fname), 'r') as f:
-            for line in f:
-                if line.startswith('0-1 Variables'):
-                    tcs = line.split()[5:]
-            for tc in tcs:
-                if tc.startswith('x'):
-                    selected_tcs.append(newid_to_tc[tc.replace('x', 't')])
-    elif fname.endswith('couenne'):
-        with open(os.path.join(proj_path, fname), 'r') as f:
-            is_var_start = False
-            for line in f:
-                if line.startswith(':') and '_varname' in line:
-                    is_var_start = True
-                    continue
-                if not is_var_start:
-                    continue
-                if line.startswith(';'):
-                    break
-                # 488   t424     0
-                # t_index, t_id, t_value = line.split()
-                if line.split()[2] == '1':
-                    selected_tcs.append(line.split()[1])
-                else:
-                    assert line.split()[2] == '0' or line.split()[2][-4:] in ['e-15', 'e-14', 'e-47']
-    elif 'Neos' in fname:
-        with open(fname, 'rU') as f:
-            for line in f:
-                sp = ',' if ',' in line else '='
-                tc, value = line.split(sp)
-                value = value.strip()
-                if value in ['1', '1.00E+00']:
-                    selected_tcs.append(tc)
-                elif value in ['0', '2.22E-16', '0.00E+00', '1.11E-15', '1.03E-09', '1.12E-09', '1.11E-09', '1.14E-09', '5.11E-10']:
-                    pass
-                else:
-                    print value
-                    assert False
-    else:
-        print 'Wrong solution file'
-        assert False
-    return selected_tcs
+def expand_reduced_tcs(fname, selected_tcs):
+    # the test cases fixed to 1 by the reduction stage of the formulator are not in the model
+    with open(os.path.join(proj_path, fname), 'r') as f:
+        mapping = json.load(f)
+    return selected_tcs + [tc for tc in mapping['fixed_to_one'] if tc not in selected_tcs]
+
 
+def get_solution(fname):
+    # parsed by the parser of its format, see solutions.py
+    path = os.path.join(proj_path, fname)
+    if not os.path.exists(path) and os.path.exists(fname):
+        path = fname  # e.g. a Neos output, relative to the working directory
+    return read_solution(path, proj_path)
 
-def get_coverage(fname, crio_type, is_multiple, selected_tcs):
-    crio_set = set()
-    tc_to_crio = dict()
-    crio_to_tc = dict()
-    with open(os.path.join(proj_path, fname), 'r') as f:
-        for line in f:
-            # e.g. t2:
-            #      t3:1 3
-            tc = line.split(':')[0]
-            if is_multiple:
-                c_list = line.split(':')[1].split()
-                tc_to_crio[tc] = c_list
-                if len(c_list) > 0:
-                    for c in c_list:
-                        crio_set.add(c)
-                        if crio_type == 'faults':
-                            if c not in crio_to_tc.keys():
-                                crio_to_tc[c] = [tc]
-                            else:
-                                crio_to_tc[c].append(tc)
-            else:
-                if line.split(':')[1].replace('\n', ''):
-                    value = int(line.split(':')[1])
-                    tc_to_crio[tc] = value
-    if is_multiple:
-        print '# %s by original suite: %d' % (crio_type, len(crio_set))
-    else:
-        print '# %s by original suite: %d' % (crio_type, sum([v for _, v in tc_to_crio.items()]))
 
-    # Reduced test suite
-    selected_crio_set = set()
-    for tc in selected_tcs:
-        if is_multiple:
-            for crio in tc_to_crio[tc]:
-                selected_crio_set.add(crio)
-    if is_multiple:
-        print '# %s by minimized suite: %d' % (crio_type, len(selected_crio_set))
-    else:
-        print '# %s by minimized suite: %d' % (crio_type, sum([tc_to_crio[tc] for tc in selected_tcs]))
+def get_coverage(evaluator, selected_tcs):
+    # e.g. t2:
+    #      t3:1 3
+    # the criterion files are parsed once by the evaluator, for all the suites
+    metrics = evaluator.evaluate(selected_tcs)
+    for label, crio_type in [('statements', 'Statements'), ('faults', 'Faults'), ('rtime', 'Running time')]:
+        if label in metrics:
+            print '# %s by original suite: %d' % (crio_type, evaluator.totals[label])
+            print '# %s by minimized suite: %d' % (crio_type, metrics[label])
+
+
+def compare(evaluator, path, fixed_tcs):  # every solution file of a directory, as a table and a Pareto front
+    rows = evaluator.evaluate_all(load_suites(path, proj_path, fixed_tcs))
+    front = pareto_front(rows, evaluator.labels)
+    print_table(evaluator, rows, front)
+    print 'Pareto front:', [rows[k][0] for k in front]
 
 
 if __name__ == '__main__':
-    selected_tcs = get_selected_tcs(sol_fname)
+    with profiler.stage('evaluator'):
+        evaluator = Evaluator(proj_path)
+    if os.path.isdir(os.path.join(proj_path, sol_fname)):
+        fixed_tcs = expand_reduced_tcs(reduction_fname, []) if reduction_fname else None
+        with profiler.stage('evaluation'):
+            compare(evaluator, os.path.join(proj_path, sol_fname), fixed_tcs)
+        sys.exit(0)
+    with profiler.stage('solution'):
+        solution = get_solution(sol_fname)
+    selected_tcs = solution.selected_tcs
+    if reduction_fname:
+        selected_tcs = expand_reduced_tcs(reduction_fname, selected_tcs)
+    profiler.count('variables', len(solution.values))
+    profiler.count('tests', len(selected_tcs))
+    print 'Status:', solution.status
+    if solution.objective is not None:
+        print 'Objective value: %0.6f' % solution.objective
     print 'Minimized test suite:', selected_tcs
     print '# Minimized test suite:', len(selected_tcs)
-    get_coverage(cov_fname, 'Statements', True, selected_tcs)
-    get_coverage(fault_fname, 'Faults', True, selected_tcs)
-    get_coverage(rtime_fname, 'Running time', False, selected_tcs)
-
+    with profiler.stage('evaluation'):
+        get_coverage(evaluator, selected_tcs)
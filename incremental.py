@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import hashlib
+from collections import OrderedDict
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from criteria import Criteria
+from formulator import Formulator
+from cache import CACHE_KEYS
+from solver import Solver, NemoSolver
+from batch import get_solver, solve
+
+STATE_VERSION = 2  # the format of the state, a state of another format is not used
+
+
+def parse_diff(fname):
+    # a unified diff of criterion files (e.g. the output of diff -u or git diff), e.g.
+    #   index 83db48f..bf269f4 100644
+    #   --- a/cov.info
+    #   +++ b/cov.info
+    #   @@ -2,2 +2,3 @@
+    #   -t3:1 3
+    #   +t3:1 3 4
+    #   +t9:2
+    # -> {'cov.info': ({'t3': '1 3'}, {'t3': '1 3 4', 't9': '2'}, ('83db48f', 'bf269f4'))}, the removed and
+    # the added lines, and the git ids of the file before and after the change (None if not a git diff)
+    changes = OrderedDict()
+    removed = added = index = None
+    with open(fname, 'r') as f:
+        for line in f:
+            if line.startswith('diff '):
+                removed = added = index = None
+            elif line.startswith('index ') and removed is None:
+                index = tuple(line.split()[1].split('..'))
+            elif line.startswith('+++ '):
+                name = os.path.basename(line[4:].split('\t')[0].strip())
+                removed, added, _ = changes.setdefault(name, (OrderedDict(), OrderedDict(), index))
+            elif line.startswith('--- ') or line.startswith('@@') or removed is None:
+                continue
+            elif line[:1] in ['-', '+'] and ':' in line:
+                tc, c_str = line[1:].split(':', 1)
+                (removed if line[0] == '-' else added)[tc.strip()] = c_str.strip()
+    return changes
+
+
+def git_digest(path):  # the id of the content of a file in git, e.g. the bf269f4... of the index line of a git diff
+    sha1 = hashlib.sha1(('blob %d\0' % os.path.getsize(path)).encode('ascii'))
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def get_stamp(path):  # (size, mtime), a file with the same stamp is not hashed again
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime
+
+
+def get_state_path(proj_dir, name, fname=None):  # e.g. linear.state.pickle, linear.state.cov.info.pickle
+    return os.path.join(proj_dir, name + '.state' + ('.' + fname if fname else '') + '.pickle')
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def save_state(path, state):
+    with open(path, 'wb') as f:
+        pickle.dump(state, f, 2)
+
+
+def get_fnames(config):
+    return sorted(set(crio['file'] for crio in config['relative_cria'] + config['absolute_cria']))
+
+
+def same_model(config, other):
+    return dict((k, v) for k, v in config.items() if k not in CACHE_KEYS) == \
+        dict((k, v) for k, v in other.items() if k not in CACHE_KEYS)
+
+
+def check_file(path, entry):  # -> why the file is not the one of the state, or None
+    stamp, digest = entry
+    if get_stamp(path) != stamp and git_digest(path) != digest:
+        return 'changed since the previous run'
+    return None
+
+
+def check_diff(entry, digest, crio_file, change):
+    # -> why the diff is not the change from the file of the state (entry) to the file on disk (digest), or None;
+    # the git ids of the diff are compared with the digests, the removed lines with the parsed file
+    removed, added, index = change
+    if index is not None:
+        if not entry[1].startswith(index[0]):
+            return 'the diff is not based on the file of the previous run'
+        if not digest.startswith(index[1]):
+            return 'the file is not the one after the diff'
+    for tc, c_str in removed.items():
+        if tc not in crio_file.tc_index or crio_file.get_crio_ids(tc) != set(c_str.split()):
+            return 'the removed line of %s is not the one of the previous run' % tc
+    for tc in added:
+        if tc not in removed and tc in crio_file.tc_index:
+            return 'the added line of %s is already in the previous run' % tc
+    return None
+
+
+def update(crio_file, change):  # patch a parsed criterion file in place, -> the number of changed lines
+    removed, added, _ = change
+    num_lines = 0
+    for tc in removed:
+        if tc not in added:
+            crio_file.update(tc, None)
+            num_lines += 1
+    for tc, c_str in added.items():
+        if removed.get(tc) != c_str:
+            crio_file.update(tc, c_str)
+            num_lines += 1
+    return num_lines
+
+
+def load(proj_dir, config, diff_fname):
+    # -> (the state of the previous run, the changes of its criterion files, why it cannot be used or None);
+    # only the files in the diff are hashed, the others are compared by their stamp (size, mtime) first
+    state = load_state(get_state_path(proj_dir, config['name']))
+    if state is None:
+        return None, None, 'no previous run'
+    if state.get('version') != STATE_VERSION:
+        return None, None, 'the state of the previous run has another format'
+    if not same_model(config, state['config']):
+        return None, None, 'the config changed'
+    changes = parse_diff(os.path.join(proj_dir, diff_fname)) if diff_fname is not None else dict()
+    changes = dict((fname, changes[fname]) for fname in get_fnames(config) if fname in changes)
+    for fname, entry in sorted(state['digests'].items()):
+        if fname not in changes:
+            reason = check_file(os.path.join(proj_dir, fname), entry)
+            if reason is not None:
+                return None, None, '%s: %s, %s' % (fname, reason, 'not in the diff' if diff_fname else 'without a diff')
+    state['files'] = dict()
+    for fname in state['digests']:
+        state['files'][fname] = load_state(get_state_path(proj_dir, config['name'], fname))
+        if state['files'][fname] is None:  # e.g. removed, the files not in the diff are merged as they are
+            return None, None, '%s: no parsed file in the previous run' % fname
+        if fname in changes:
+            path = os.path.join(proj_dir, fname)
+            entry = (get_stamp(path), git_digest(path))
+            reason = check_diff(state['digests'][fname], entry[1], state['files'][fname], changes[fname])
+            if reason is not None:
+                return None, None, '%s: %s' % (fname, reason)
+            state['digests'][fname] = entry
+    return state, changes, None
+
+
+def run(proj_dir, config_fname, diff_fname=None, solver=None, time_limit=None):
+    # re-minimize from the state of the previous run (<name>.state.pickle, and one <name>.state.<file>.pickle
+    # per criterion file): the criterion files parsed then and the model of the heuristics built then, both
+    # patched with the diff, and the selection found then, used as the initial solution; the state is used
+    # only if the diff is the change of the files since then (without a diff, if they did not change),
+    # otherwise they are parsed and solved from scratch
+    with open(os.path.join(proj_dir, config_fname), 'r') as f:
+        config = json.load(f)
+    solver = solver or config.get('solver', 'greedy')
+    time_limit = time_limit if time_limit is not None else config.get('time_limit', 60)
+    state, changes, reason = load(proj_dir, config, diff_fname)
+    num_lines = 0
+    criteria = Criteria(proj_dir)
+    previous = None
+    if state is None:
+        state = {'version': STATE_VERSION, 'digests': dict(), 'selected_tcs': None, 'model': None}
+        changed_files = get_fnames(config)
+        for fname in changed_files:
+            path = os.path.join(proj_dir, fname)
+            state['digests'][fname] = (get_stamp(path), git_digest(path))
+            criteria.get(fname)
+    else:
+        changed_files = sorted(changes)
+        for fname in changed_files:
+            num_lines += update(state['files'][fname], changes[fname])
+        criteria.files.update(state.pop('files'))
+        if state['model'] is not None:
+            changed_tcs = set(tc for removed, added, _ in changes.values() for tc in list(removed) + list(added))
+            previous = (state['model'], changed_tcs)
+    # the heuristics patch the model of the previous run, the backends build it from the patched files
+    formulator = Formulator(proj_dir, config_fname, config=config, criteria=criteria)
+    s = None
+    if solver in Solver.algorithms + NemoSolver.algorithms:
+        s = get_solver(formulator, solver, time_limit, previous)
+    result = solve(formulator, solver, time_limit, state['selected_tcs'], s)
+    kept = len(set(result.selected_tcs) & set(state['selected_tcs'] or []))
+    state.update(config=config, selected_tcs=result.selected_tcs, model=s.get_model() if s is not None else None)
+    save_state(get_state_path(proj_dir, config['name']), state)
+    for fname in changed_files:  # the files of the state that did not change are not written again
+        save_state(get_state_path(proj_dir, config['name'], fname), criteria.get(fname).compact())
+    return result, formulator, num_lines, kept, reason
+
+
+if __name__ == '__main__':
+    proj_dir = sys.argv[1]
+    config_fname = sys.argv[2]
+    diff_fname = sys.argv[3] or None if len(sys.argv) > 3 else None  # '' for none
+    solver = sys.argv[4] if len(sys.argv) > 4 else None
+    start = time.time()
+    result, formulator, num_lines, kept, reason = run(proj_dir, config_fname, diff_fname, solver)
+    if reason is not None:
+        print('From scratch: %s' % reason)
+    print('Status: %s' % result.status)
+    if result.objective is not None:
+        print('Objective value: %0.6f' % result.objective)
+    print('# Changed lines: %d' % num_lines)
+    print('# Minimized test suite: %d (%d kept from the previous one)' % (len(result.selected_tcs), kept))
+    print('Time: %0.3fs' % (time.time() - start))
+    if result.status in ['optimal', 'feasible']:
+        print('Solution: %s' % result.save(proj_dir, formulator.config['name'], formulator.tc_list))
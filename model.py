@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+
+import re
+import array
+import hashlib
+
+
+def row_key(terms, ctype, rhs):
+    # the key ignores the order of the terms, e.g. t1+t3>=1 and t3+t1>=1 are the same row;
+    # a digest keeps the memory per row constant however long the row is
+    key = '+'.join(sorted(terms)) + '\n' + ctype + '\n' + str(rhs)
+    return hashlib.md5(key.encode('utf-8')).digest()
+
+
+def to_lhs(terms):  # e.g. ['50t33', '-72t34'] -> '50t33-72t34'
+    return '+'.join(terms).replace('+-', '-')
+
+
+def parse_term(term):  # e.g. '50t33' -> (50.0, 't33'), '-t2' -> (-1.0, 't2'), 'v_X1Z_2_3' -> (1.0, 'v_X1Z_2_3')
+    m = re.match(r'^([+-]?\d*\.?\d*)\s*\*?\s*([A-Za-z_]\w*)$', term)
+    if m is None:
+        raise ValueError('cannot parse the term: %s' % term)
+    coeff = m.group(1)
+    return (float(coeff) if coeff not in ['', '+', '-'] else float(coeff + '1')), m.group(2)
+
+
+class Constraints:
+    # constraints (lhs, ctype, rhs) in insertion order, with hash-based deduplication
+    def __init__(self):
+        self.rows = list()
+        self.terms = list()
+        self.keys = set()
+
+    def add(self, terms, ctype, rhs):  # e.g. terms = ['t1', 't3'] or ['50t33', '72t34']
+        key = row_key(terms, ctype, rhs)
+        if key in self.keys:
+            return False
+        self.keys.add(key)
+        self.terms.append(terms)
+        self.rows.append((to_lhs(terms), ctype, rhs))
+        return True
+
+    def extend(self, rows):  # rows of (terms, ctype, rhs)
+        for terms, ctype, rhs in rows:
+            self.add(terms, ctype, rhs)
+        return self
+
+    def iter_terms(self):
+        for terms, (_, ctype, rhs) in zip(self.terms, self.rows):
+            yield terms, ctype, rhs
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+class ConstraintStream:
+    # constraints produced by generators of (terms, ctype, rhs), deduplicated while they are
+    # consumed, so that only one row is in memory at a time (plus the digests of the rows)
+    def __init__(self):
+        self.sources = list()
+
+    def extend(self, rows):
+        self.sources.append(rows)
+        return self
+
+    def iter_terms(self):
+        keys = set()
+        for rows in self.sources:
+            for terms, ctype, rhs in rows:
+                key = row_key(terms, ctype, rhs)
+                if key in keys:
+                    continue
+                keys.add(key)
+                yield terms, ctype, rhs
+
+    def __iter__(self):
+        for terms, ctype, rhs in self.iter_terms():
+            yield to_lhs(terms), ctype, rhs
+
+
+class Expression:
+    # the objective of Nemo-Nonlinear, generated again each time it is written instead of being built
+    # as one string: iter_defined and iter_terms return generators of the defined variables of AMPL
+    # (name, expression), shared by the terms and the definitions after them, and of the terms of the
+    # objective with their sign, e.g.
+    #   defined: ('p_0_4_2', '(1-t1)*(1-t3)'), ..., ('e_0_4', 't1*s_0_4_0+t3*(1-t1)*(1-t5)+t5*p_0_4_2')
+    #   terms:   '+t2', '-0.25*e_0_4', '+0.5*t3'
+    def __init__(self, iter_defined, iter_terms):
+        self.iter_defined = iter_defined
+        self.iter_terms = iter_terms
+
+
+def format_number(x):  # e.g. 50.0 -> '50', 0.25 -> '0.25'
+    return '%d' % x if x == int(x) else repr(x)
+
+
+def format_product(coeff, var):  # e.g. (0.25, 'e_0_4') -> '+0.25*e_0_4', (-1.0, 't2') -> '-t2'
+    if coeff == 1 or coeff == -1:
+        return ('+' if coeff > 0 else '-') + var
+    return ('+' if coeff >= 0 else '') + format_number(coeff) + '*' + var
+
+
+def format_term(coeff, var):  # e.g. (50.0, 't33') -> '50t33', (-1.0, 't2') -> '-t2'
+    if coeff == 1:
+        return var
+    if coeff == -1:
+        return '-' + var
+    return format_number(coeff) + var
+
+
+def split_term(term):  # parse_term, without a regular expression for a plain variable or its negation
+    if term[0].isalpha():
+        return 1.0, term
+    if term[0] == '-' and term[1:2].isalpha():
+        return -1.0, term[1:]
+    return parse_term(term)
+
+
+class Model:
+    # a model as sparse arrays over integer variable ids, built once from the objective and the constraint
+    # rows of the formulator, and consumed by the writers of writers.py and the backends of backends.py
+    # (see ModelStream for the writers reading the rows once), e.g.
+    # for min: 0.75 t1 + 0.25 t2 subject to t1+t2>=1, 50t1+72t2<=100:
+    #   names:      ['t1', 't2']    variable id -> name, the test cases first (num_tcs of them)
+    #   obj_vars:   [0, 1]          the terms of the objective, zero coefficients included
+    #   obj_coeffs: [0.75, 0.25]
+    #   row_start:  [0, 2, 4]       the terms of row r are row_start[r]:row_start[r + 1]
+    #   row_vars:   [0, 1, 0, 1]
+    #   row_coeffs: [1, 1, 50, 72]
+    #   ctypes:     ['>=', '<='], rhs: [1, 100]
+    # the objective of Nemo-Nonlinear is an Expression instead of obj_vars and obj_coeffs;
+    # a row whose rhs is a variable (e.g. v<=t2) has it moved to the lhs (v-t2<=0)
+    def __init__(self, min_or_max, tcs):
+        self.minimize = 'min' in min_or_max.lower()
+        self.names = list()
+        self.index = dict()
+        for tc in tcs:
+            self.var(tc)
+        self.num_tcs = len(self.names)
+        self.obj_vars = array.array('i')
+        self.obj_coeffs = array.array('d')
+        self.expression = None
+        self.row_start = array.array('i', [0])
+        self.row_vars = array.array('i')
+        self.row_coeffs = array.array('d')
+        self.ctypes = list()
+        self.rhs = array.array('d')
+
+    @classmethod
+    def build(cls, min_or_max, tcs, obj_coeff, rows):
+        # obj_coeff: a dict or a generator of (variable, coefficient), or the Expression of a nonlinear objective;
+        # rows: (terms, ctype, rhs), e.g. of the iter_terms() of Constraints or ConstraintStream
+        model = cls(min_or_max, tcs)
+        model.set_objective(obj_coeff)
+        for terms, ctype, rhs in rows:
+            model.add_row(terms, ctype, rhs)
+        return model
+
+    def set_objective(self, obj_coeff):
+        if isinstance(obj_coeff, Expression):
+            self.expression = obj_coeff
+        else:
+            for var, coeff in (obj_coeff.items() if isinstance(obj_coeff, dict) else obj_coeff):
+                self.obj_vars.append(self.var(var))
+                self.obj_coeffs.append(coeff)
+
+    def var(self, name):
+        i = self.index.get(name)
+        if i is None:
+            i = len(self.names)
+            self.index[name] = i
+            self.names.append(name)
+        return i
+
+    def add_row(self, terms, ctype, rhs):  # e.g. ['50t33', '-t34'], '<=', 2; a variable repeated in a row is summed
+        indices, coeffs, ctype, rhs = self.parse_row(terms, ctype, rhs)
+        self.row_vars.extend(indices)
+        self.row_coeffs.extend(coeffs)
+        self.row_start.append(len(self.row_vars))
+        self.ctypes.append(ctype)
+        self.rhs.append(rhs)
+
+    def parse_row(self, terms, ctype, rhs):  # -> (variable ids, coefficients, ctype, rhs), as yielded by iter_rows
+        coeffs = dict()
+        order = list()
+        for term in terms:
+            coeff, var = split_term(term)
+            i = self.var(var)
+            if i not in coeffs:
+                coeffs[i] = 0.0
+                order.append(i)
+            coeffs[i] += coeff
+        try:
+            rhs = float(rhs)
+        except ValueError:
+            coeff, var = split_term(str(rhs))
+            i = self.var(var)
+            if i not in coeffs:
+                coeffs[i] = 0.0
+                order.append(i)
+            coeffs[i] -= coeff
+            rhs = 0.0
+        return order, [coeffs[i] for i in order], ctype, rhs
+
+    def num_rows(self):
+        return len(self.ctypes)
+
+    def iter_objective(self):  # (variable id, coefficient) of the nonzero terms
+        for i, coeff in zip(self.obj_vars, self.obj_coeffs):
+            if coeff != 0:
+                yield i, coeff
+
+    def iter_rows(self):  # (variable ids, coefficients, ctype, rhs)
+        for r in range(len(self.ctypes)):
+            start, end = self.row_start[r], self.row_start[r + 1]
+            yield self.row_vars[start:end], self.row_coeffs[start:end], self.ctypes[r], self.rhs[r]
+
+    def iter_bounds(self):  # (variable ids, coefficients, lower, upper), e.g. 2t1+3t2<5 as 2t1+3t2<=4
+        inf = float('inf')
+        for indices, coeffs, ctype, rhs in self.iter_rows():
+            if ctype in ['<', '>']:
+                # the solvers have no strict bounds: over integer coefficients, the lhs is an integer
+                # and a strict bound is the next integer; otherwise it cannot be written exactly
+                assert all(c == int(c) for c in coeffs) and rhs == int(rhs), \
+                    'strict constraint with non-integer coefficients, use <= or >= instead: %s%s%s' \
+                    % (self.get_lhs(indices, coeffs), ctype, format_number(rhs))
+                ctype, rhs = ('<=', rhs - 1) if ctype == '<' else ('>=', rhs + 1)
+            if ctype == '>=':
+                yield indices, coeffs, rhs, inf
+            elif ctype == '<=':
+                yield indices, coeffs, -inf, rhs
+            else:
+                assert ctype in ['=', '=='], 'unknown constraint type: %s' % ctype
+                yield indices, coeffs, rhs, rhs
+
+    def get_lhs(self, indices, coeffs):  # e.g. '50t33-72t34'
+        return '+'.join([format_term(c, self.names[i]) for i, c in zip(indices, coeffs)]).replace('+-', '-')
+
+
+class ModelStream(Model):
+    # a Model whose rows are not kept: get_rows() returns a new generator of the rows (terms, ctype, rhs)
+    # each time they are read, so a writer reading them once in order (iter_rows) holds one row at a time;
+    # only the variables and the objective are kept. Every variable is a test case or a variable of the
+    # objective (e.g. the v_ of Nemo-Aux), so that the writers can declare them before the rows
+    def __init__(self, min_or_max, tcs, obj_coeff, get_rows):
+        Model.__init__(self, min_or_max, tcs)
+        self.set_objective(obj_coeff)
+        self.get_rows = get_rows
+        self.rows_read = 0  # the number of rows of the last pass, see num_rows
+
+    def num_rows(self):  # known once the rows have been read
+        return self.rows_read
+
+    def iter_rows(self):
+        num_vars = len(self.names)
+        num_rows = 0
+        for terms, ctype, rhs in self.get_rows():
+            row = self.parse_row(terms, ctype, rhs)
+            assert len(self.names) == num_vars, 'a variable only in the rows of a streamed model: %s' % to_lhs(terms)
+            num_rows += 1
+            yield row
+        self.rows_read = num_rows
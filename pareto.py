@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import math
+import time
+import random
+
+from criteria import popcount, bits, find_crio_file
+from formulator import Formulator
+from solver import Solver
+
+
+class ParetoSolver(Solver):
+    # the trade-offs between the criteria of a config, instead of their weighted sum: an NSGA-II search
+    # over the test suites (bitsets of test indices) of one formulation, for the objectives
+    #   - each relative criterion, maximized if (min_or_max is max) != invert, whatever its weight:
+    #     the number of distinct crio_ids covered (is_dependent), or the sum of the values
+    #   - each coverage criterion (is_coefficient: false), maximized instead of required
+    #   - the cost (the sum of the values of the "cost" file, rtime.info by default), minimized
+    # the budgets (is_coefficient: true, e.g. rtime.info <= 2) are constraints: a suite exceeding
+    # them is dominated by every suite that does not (constrained domination); the greedy solutions
+    # of solver.py are in the initial population, e.g.
+    #   "pareto": {"population": 100, "generations": 200, "seed": 0, "cost": "rtime.info"}
+    def __init__(self, formulator, time_limit=60):
+        Solver.__init__(self, formulator)
+        self.time_limit = time_limit
+        params = self.config.get('pareto', dict())
+        self.population = int(params.get('population', 100))
+        self.generations = int(params.get('generations', 200))
+        self.random = random.Random(params.get('seed', 0))
+        self.objectives = self.get_objectives(params.get('cost', 'rtime.info'))
+        self.memo = dict()  # suite -> (objectives, violation)
+        self.generation = 0
+
+    def get_objectives(self, cost_fname):  # [(label, maximize, is_dependent, bitsets or values of the test cases)]
+        objectives = list()
+        fnames = set()
+        maximize = 'max' in self.config['min_or_max'].lower()
+        cria = [(crio['file'], crio['is_dependent'], maximize != crio['invert']) for crio in self.config['relative_cria']]
+        cria += [(crio['file'], True, True) for crio in self.config['absolute_cria'] if not crio['is_coefficient']]
+        if os.path.exists(find_crio_file(self.formulator.proj_dir, cost_fname)):
+            cria.append((cost_fname, False, False))
+        for fname, is_dependent, is_max in cria:
+            if fname in fnames:
+                continue
+            fnames.add(fname)
+            crio_file = self.formulator.criteria.get(fname)
+            if is_dependent:
+                data = crio_file.align(self.tc_list)
+            else:
+                values = crio_file.get_values()
+                data = list()
+                for tc in self.tc_list:
+                    t = crio_file.tc_index.get(tc)
+                    data.append(values[t] if t is not None and values[t] is not None else 0)
+            objectives.append((os.path.splitext(os.path.basename(fname))[0], is_max, is_dependent, data))
+        return objectives
+
+    def evaluate(self, x):  # -> (objectives to minimize, violation of the budgets)
+        if x in self.memo:
+            return self.memo[x]
+        selected = list(bits(x))
+        objs = list()
+        for _, is_max, is_dependent, data in self.objectives:
+            if is_dependent:
+                covered = 0
+                for i in selected:
+                    covered |= data[i]
+                value = popcount(covered)
+            else:
+                value = sum([data[i] for i in selected])
+            objs.append(-value if is_max else value)
+        violation = 0.0
+        for weights, ctype, rhs in self.budgets:
+            u = sum([weights[i] for i in selected])
+            if ctype in ['<=', '='] and u > rhs:
+                violation += u - rhs
+            if ctype in ['>=', '='] and u < rhs:
+                violation += rhs - u
+            if (ctype == '<' and u >= rhs) or (ctype == '>' and u <= rhs):
+                violation += abs(u - rhs) + 1
+        self.memo[x] = (tuple(objs), violation)
+        return self.memo[x]
+
+    @staticmethod
+    def dominates(a, b):  # constrained domination of (objectives, violation) pairs
+        if a[1] != b[1]:
+            return a[1] < b[1]
+        if a[1] > 0 or a[0] == b[0]:
+            return False
+        for p, q in zip(a[0], b[0]):
+            if p > q:
+                return False
+        return True
+
+    def sort(self, suites):  # the fronts of the suites, as lists of indices
+        # in the order of (violation, objectives), a suite can only be dominated by an earlier one
+        evals = [self.evaluate(x) for x in suites]
+        order = sorted(range(len(suites)), key=lambda k: (evals[k][1], evals[k][0]))
+        dominated = [list() for _ in suites]  # k -> the suites dominated by suite k
+        counts = [0] * len(suites)  # k -> the number of suites dominating suite k
+        for n, k in enumerate(order):
+            for j in order[n + 1:]:
+                if self.dominates(evals[k], evals[j]):
+                    dominated[k].append(j)
+                    counts[j] += 1
+        fronts = [[k for k in order if counts[k] == 0]]
+        while fronts[-1]:
+            front = list()
+            for k in fronts[-1]:
+                for j in dominated[k]:
+                    counts[j] -= 1
+                    if counts[j] == 0:
+                        front.append(j)
+            fronts.append(front)
+        return fronts[:-1]
+
+    def crowding(self, suites, front):  # front index -> crowding distance
+        distance = dict((k, 0.0) for k in front)
+        for m in range(len(self.objectives)):
+            ordered = sorted(front, key=lambda k: self.evaluate(suites[k])[0][m])
+            low, high = self.evaluate(suites[ordered[0]])[0][m], self.evaluate(suites[ordered[-1]])[0][m]
+            distance[ordered[0]] = distance[ordered[-1]] = float('inf')
+            if high == low:
+                continue
+            for n in range(1, len(ordered) - 1):
+                prev, succ = self.evaluate(suites[ordered[n - 1]])[0][m], self.evaluate(suites[ordered[n + 1]])[0][m]
+                distance[ordered[n]] += (succ - prev) / float(high - low)
+        return distance
+
+    def select_survivors(self, suites):  # the best self.population suites, by front and crowding distance
+        survivors = list()
+        rank = dict()
+        distance = dict()
+        for r, front in enumerate(self.sort(suites)):
+            d = self.crowding(suites, front)
+            if len(survivors) + len(front) > self.population:
+                front = sorted(front, key=lambda k: -d[k])[:self.population - len(survivors)]
+            for k in front:
+                rank[len(survivors)] = r
+                distance[len(survivors)] = d[k]
+                survivors.append(suites[k])
+            if len(survivors) >= self.population:
+                break
+        return survivors, rank, distance
+
+    def tournament(self, rank, distance):
+        a = self.random.randrange(len(rank))
+        b = self.random.randrange(len(rank))
+        return a if (rank[a], -distance[a]) <= (rank[b], -distance[b]) else b
+
+    def crossover(self, x, y):  # uniform crossover
+        mask = self.random.getrandbits(len(self.tc_list)) if self.tc_list else 0
+        return (x & mask) | (y & ~mask)
+
+    def mutate(self, x):  # flip each bit with the probability 1/n, skipping geometrically to the next flip
+        p = 1.0 / max(len(self.tc_list), 2)
+        i = -1
+        while True:
+            i += 1 + int(math.log(1.0 - self.random.random()) / math.log(1.0 - p))
+            if i >= len(self.tc_list):
+                return x
+            x ^= 1 << i
+
+    def initial_population(self):
+        suites = list()
+        for algorithm in Solver.algorithms:
+            tc_index = dict((tc, i) for i, tc in enumerate(self.tc_list))
+            x = 0
+            for tc in Solver.solve(self, algorithm)[0]:
+                x |= 1 << tc_index[tc]
+            suites.append(x)
+        while len(suites) < self.population:
+            density = self.random.random()
+            x = 0
+            for i in range(len(self.tc_list)):
+                if self.random.random() < density:
+                    x |= 1 << i
+            suites.append(x)
+        return suites[:max(self.population, 1)]
+
+    def solve(self, algorithm='nsga2', start=None):  # -> the non-dominated suites, [(selected test cases, objectives)]
+        begin = time.time()
+        suites = self.initial_population()
+        if start is not None:
+            tc_index = dict((tc, i) for i, tc in enumerate(self.tc_list))
+            x = 0
+            for tc in start:
+                if tc in tc_index:
+                    x |= 1 << tc_index[tc]
+            suites[-1] = x
+        suites, rank, distance = self.select_survivors(suites)
+        while self.generation < self.generations and time.time() - begin <= self.time_limit:
+            self.generation += 1
+            offspring = list()
+            for _ in range(len(suites)):
+                x = suites[self.tournament(rank, distance)]
+                y = suites[self.tournament(rank, distance)]
+                offspring.append(self.mutate(self.crossover(x, y) if self.random.random() < 0.9 else x))
+            suites, rank, distance = self.select_survivors(list(set(suites + offspring)))
+        front = sorted(set(suites[k] for k in rank if rank[k] == 0 and self.evaluate(suites[k])[1] == 0),
+                       key=lambda x: self.evaluate(x)[0])
+        return [([self.tc_list[i] for i in bits(x)], self.get_values(x)) for x in front]
+
+    def get_values(self, x):  # e.g. [('fault', 4), ('cov', 3), ('rtime', 2)]
+        objs = self.evaluate(x)[0]
+        return [(label, -v if is_max else v) for (label, is_max, _, _), v in zip(self.objectives, objs)]
+
+    def save_front(self, front):
+        # e.g. fault  cov  rtime  tests  selected
+        #      4      3    2      2      t1 t2
+        out_path = os.path.join(self.formulator.proj_dir, self.config['name'] + '.pareto.tsv')
+        with open(out_path, 'w') as f:
+            f.write('\t'.join([label for label, _, _, _ in self.objectives] + ['tests', 'selected']) + '\n')
+            for selected_tcs, values in front:
+                f.write('\t'.join(['%g' % v for _, v in values] + [str(len(selected_tcs)), ' '.join(selected_tcs)]) + '\n')
+        return out_path
+
+
+if __name__ == '__main__':
+    proj_dir = sys.argv[1]
+    config_fname = sys.argv[2]
+    formulator = Formulator(proj_dir, config_fname)
+    time_limit = float(sys.argv[3]) if len(sys.argv) > 3 else formulator.config.get('time_limit', 60)
+    start = time.time()
+    solver = ParetoSolver(formulator, time_limit)
+    front = solver.solve()
+    labels = [('max ' if is_max else 'min ') + label for label, is_max, _, _ in solver.objectives]
+    print('Objectives: %s' % ', '.join(labels))
+    for selected_tcs, values in front:
+        print('%s  # %d: %s' % ('  '.join('%s=%g' % lv for lv in values), len(selected_tcs), ' '.join(selected_tcs)))
+    print('# Non-dominated suites: %d (%d generations)' % (len(front), solver.generation))
+    print('Time: %0.3fs' % (time.time() - start))
+    print('Front: %s' % solver.save_front(front))
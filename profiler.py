@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+import sys
+import json
+import time
+import atexit
+from collections import OrderedDict
+try:
+    import resource
+except ImportError:  # e.g. on Windows
+    resource = None
+
+
+def peak_rss():  # the peak resident memory of the process in bytes, or None
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class Profiler:
+    # the wall time, the peak memory, and the counts of the stages of a run, e.g. of
+    # formulator.py --profile=flex.profile.json
+    #   {"argv": [...], "time": 1.52, "peak_rss": 84213760,
+    #    "stages": {"parse": {"time": 0.31, "calls": 3, "items": 0, "peak_rss": 60817408, "rss_growth": 31457280},
+    #               "constraints": {"time": 0.12, "calls": 3143, "items": 3143, ...}, ...},
+    #    "counts": {"tests": 605, "crio_ids": 3180, "constraints": 3143, "aux_vars": 0, "bytes_written": 112033}}
+    # the time of a stage excludes the stages nested in it, e.g. the rows generated by gen_constraint
+    # (constraints) while they are deduplicated (dedup) and written (write); a generator is timed
+    # step by step (wrap), as the rows are streamed from one stage to the next; rss_growth is how much
+    # the peak memory grew during the stage
+    def __init__(self):
+        self.enabled = False
+        self.out_path = None  # None: JSON on stderr
+        self.cprofile = None  # path of the cProfile dump
+        self.profile = None
+        self.begin = None
+        self.argv = None
+        self.stages = OrderedDict()
+        self.counts = OrderedDict()
+        self.stack = list()  # [name, start time, time of the nested stages, peak memory at the start]
+
+    def parse_args(self, argv):
+        # strips --profile[=path] and --cprofile=path from the arguments, and enables the profiler
+        args = list()
+        for arg in argv:
+            if arg == '--profile' or arg.startswith('--profile='):
+                self.enabled = True
+                self.out_path = arg.split('=', 1)[1] if '=' in arg else None
+            elif arg.startswith('--cprofile='):
+                self.enabled = True
+                self.cprofile = arg.split('=', 1)[1]
+            else:
+                args.append(arg)
+        if self.enabled:
+            self.start(args)
+        return args
+
+    def start(self, argv):
+        self.enabled = True
+        self.argv = argv
+        self.begin = time.time()
+        if self.cprofile:
+            import cProfile
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        atexit.register(self.finish)
+
+    def enter(self, name):
+        self.stack.append([name, time.time(), 0.0, peak_rss()])
+
+    def leave(self):
+        name, start, nested, rss = self.stack.pop()
+        elapsed = time.time() - start
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = OrderedDict([('time', 0.0), ('calls', 0), ('items', 0),
+                                                     ('peak_rss', None), ('rss_growth', 0)])
+        stage['time'] += elapsed - nested
+        stage['calls'] += 1
+        if rss is not None:
+            stage['peak_rss'] = peak_rss()
+            stage['rss_growth'] += stage['peak_rss'] - rss
+        if self.stack:
+            self.stack[-1][2] += elapsed
+        return stage
+
+    def stage(self, name):  # with profiler.stage('parse'): ...
+        return Stage(self, name) if self.enabled else NULL_STAGE
+
+    def wrap(self, name, iterable):  # the items of iterable, each of them generated in the stage name
+        if not self.enabled:
+            return iterable
+        return self.iter_stage(name, iter(iterable))
+
+    def iter_stage(self, name, it):
+        while True:
+            self.enter(name)
+            try:
+                item = next(it)
+            except StopIteration:
+                self.leave()
+                return
+            except Exception:
+                self.leave()
+                raise
+            self.leave()['items'] += 1
+            yield item
+
+    def count(self, name, value):
+        if self.enabled:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def report(self):
+        return OrderedDict([('argv', self.argv), ('time', time.time() - self.begin), ('peak_rss', peak_rss()),
+                            ('stages', self.stages), ('counts', self.counts)])
+
+    def finish(self):
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile.dump_stats(self.cprofile)
+        report = json.dumps(self.report(), indent=2)
+        if self.out_path:
+            with open(self.out_path, 'w') as f:
+                f.write(report + '\n')
+        else:
+            sys.stderr.write(report + '\n')
+
+
+class Stage:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.enter(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.leave()
+        return False
+
+
+class NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_STAGE = NullStage()
+
+# the profiler of the process, disabled unless a command is run with --profile or --cprofile
+profiler = Profiler()
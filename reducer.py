@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+import re
+from collections import OrderedDict
+
+from model import Constraints, format_number, to_lhs
+
+
+def is_satisfied(lhs, ctype, rhs):  # e.g. (8, '<=', 4) -> False
+    if ctype == '<=':
+        return lhs <= rhs
+    if ctype == '<':
+        return lhs < rhs
+    if ctype == '>=':
+        return lhs >= rhs
+    if ctype == '>':
+        return lhs > rhs
+    assert ctype in ['=', '=='], 'unknown constraint type: %s' % ctype
+    return lhs == rhs
+
+
+class Reducer:
+    # shrink the coverage part of a model (the 't1+t3>=1' rows) before it is saved:
+    #   - a row implied by a smaller row is dropped (row dominance, includes duplicates)
+    #   - an essential test case (the only one covering some row) is fixed to 1
+    #   - a test case whose rows are covered by a cheaper test case is fixed to 0
+    #     (column dominance; equal rows and equal cost means the two are equivalent)
+    # test cases are eliminated from the model only for a linear objective (tc_to_coeff is a
+    # dict of test cases), otherwise only the rows are reduced and essential test cases keep
+    # their single-variable row.
+    def __init__(self, tc_list, tc_to_coeff, constraints, min_or_max, eliminate):
+        self.tc_list = tc_list
+        self.tc_to_coeff = tc_to_coeff
+        self.constraints = constraints
+        self.sign = 1 if 'min' in min_or_max.lower() else -1
+        self.eliminate = eliminate
+        self.tc_index = dict((tc, i) for i, tc in enumerate(tc_list))
+        self.fixed_one = set()
+        self.fixed_zero = set()
+        self.equivalent_to = dict()  # removed test index -> representative test index
+
+    def split_rows(self):
+        cover_rows = list()  # bitsets of test indices
+        side_rows = list()   # (terms, ctype, rhs)
+        for terms, ctype, rhs in self.constraints.iter_terms():
+            if ctype == '>=' and str(rhs) == '1' and all(t in self.tc_index for t in terms):
+                row = 0
+                for t in terms:
+                    row |= 1 << self.tc_index[t]
+                cover_rows.append(row)
+            else:
+                side_rows.append((terms, ctype, rhs))
+        return cover_rows, side_rows
+
+    def parse_side_rows(self, side_rows):
+        # e.g. ['50t33', '-72t34'] <= 2; test cases in a row that cannot be parsed are never
+        # eliminated (locked), the others are only excluded from column dominance (shared)
+        locked = set()
+        shared = set()
+        parsed = list()
+        for terms, ctype, rhs in side_rows:
+            coeffs = OrderedDict()
+            for term in terms:
+                m = re.match(r'^([+-]?\d*\.?\d*)(t\w+)$', term)
+                if m is None or m.group(2) not in self.tc_index:
+                    coeffs = None
+                    break
+                coeff = m.group(1)
+                coeffs[self.tc_index[m.group(2)]] = float(coeff) if coeff not in ['', '+', '-'] else float(coeff + '1')
+            try:
+                rhs_num = float(rhs)
+            except ValueError:
+                coeffs = None
+            if coeffs is None:
+                for term in terms + [str(rhs)]:
+                    for tc in re.findall(r't\w+', term):
+                        if tc in self.tc_index:
+                            locked.add(self.tc_index[tc])
+                parsed.append((terms, ctype, rhs, None))
+            else:
+                shared.update(coeffs)
+                parsed.append((terms, ctype, rhs_num, coeffs))
+        return parsed, locked, shared
+
+    def reduce_rows(self, rows):
+        # drop duplicated rows and every row that is a superset of another row
+        rows = sorted(set(rows), key=lambda r: bin(r).count('1'))
+        kept = list()
+        by_test = dict()  # test index -> kept rows containing it
+        for row in rows:
+            dominated = False
+            candidates = set()
+            r = row
+            while r:
+                low = r & -r
+                candidates.update(by_test.get(low.bit_length() - 1, ()))
+                r ^= low
+            for k in candidates:
+                if kept[k] & ~row == 0:
+                    dominated = True
+                    break
+            if dominated:
+                continue
+            k = len(kept)
+            kept.append(row)
+            r = row
+            while r:
+                low = r & -r
+                by_test.setdefault(low.bit_length() - 1, list()).append(k)
+                r ^= low
+        return kept
+
+    def cost(self, i):
+        coeff = self.tc_to_coeff.get(self.tc_list[i], 0) if isinstance(self.tc_to_coeff, dict) else 0
+        return self.sign * coeff
+
+    def reduce_columns(self, rows, locked):
+        # column bitsets over the row indices
+        cols = dict()
+        for k, row in enumerate(rows):
+            r = row
+            while r:
+                low = r & -r
+                i = low.bit_length() - 1
+                cols[i] = cols.get(i, 0) | (1 << k)
+                r ^= low
+        removed = set()
+        for i in range(len(self.tc_list)):
+            if i in locked or i in self.fixed_one or i in self.fixed_zero:
+                continue
+            c_i = self.cost(i)
+            if c_i < 0:
+                continue  # selecting it improves the objective on its own
+            col = cols.get(i, 0)
+            if col == 0:
+                removed.add(i)
+                continue
+            # candidates are the test cases covering the first row of i
+            first = (col & -col).bit_length() - 1
+            r = rows[first]
+            while r:
+                low = r & -r
+                j = low.bit_length() - 1
+                r ^= low
+                if j == i or j in removed or j in locked:
+                    continue
+                col_j = cols.get(j, 0)
+                if col & ~col_j:
+                    continue
+                c_j = self.cost(j)
+                if c_j < c_i or (c_j == c_i and (col_j != col or j < i)):
+                    removed.add(i)
+                    if col_j == col and c_j == c_i:
+                        self.equivalent_to[i] = j
+                    break
+        return removed
+
+    def reduce(self):
+        rows, side_rows = self.split_rows()
+        side_rows, locked, shared = self.parse_side_rows(side_rows)
+        if not self.eliminate:
+            locked = set(range(len(self.tc_list)))
+        while True:
+            rows = self.reduce_rows(rows)
+            essential = set(row.bit_length() - 1 for row in rows if row & (row - 1) == 0)
+            essential -= locked
+            if essential:
+                self.fixed_one.update(essential)
+                mask = 0
+                for i in essential:
+                    mask |= 1 << i
+                rows = [row for row in rows if row & mask == 0]
+                continue
+            removed = self.reduce_columns(rows, locked | shared)
+            if not removed:
+                break
+            self.fixed_zero.update(removed)
+            mask = 0
+            for i in removed:
+                mask |= 1 << i
+            rows = [row & ~mask for row in rows]
+        return self.rebuild(rows, side_rows)
+
+    def rebuild(self, rows, side_rows):
+        eliminated = self.fixed_one | self.fixed_zero
+        tc_list = [tc for i, tc in enumerate(self.tc_list) if i not in eliminated]
+        if isinstance(self.tc_to_coeff, dict):
+            tc_to_coeff = OrderedDict((k, v) for k, v in self.tc_to_coeff.items()
+                                      if k not in self.tc_index or self.tc_index[k] not in eliminated)
+        else:
+            tc_to_coeff = self.tc_to_coeff
+        constraints = Constraints()
+        for terms, ctype, rhs, coeffs in side_rows:
+            if coeffs is None or not (set(coeffs) & eliminated):
+                constraints.add(terms, ctype, rhs if coeffs is None or rhs != int(rhs) else int(rhs))
+                continue
+            fixed = sum([v for i, v in coeffs.items() if i in self.fixed_one])
+            kept = [term for term, i in zip(terms, coeffs) if i not in eliminated]
+            if kept:
+                constraints.add(kept, ctype, int(rhs - fixed) if rhs - fixed == int(rhs - fixed) else rhs - fixed)
+            elif not is_satisfied(fixed, ctype, rhs):
+                # e.g. 3t1+5t2<=4 with t1 and t2 both essential: the row is left as 8<=4, met by no selection
+                raise ValueError('infeasible model: the test cases fixed by the reduction give %s for %s%s%s'
+                                 % (format_number(fixed), to_lhs(terms), ctype, format_number(rhs)))
+        for row in rows:
+            terms = list()
+            r = row
+            while r:
+                low = r & -r
+                terms.append(self.tc_list[low.bit_length() - 1])
+                r ^= low
+            constraints.add(terms, '>=', 1)
+        return tc_list, tc_to_coeff, constraints
+
+    def get_mapping(self):  # lets generator.py expand a solution of the reduced model
+        return {
+            'fixed_to_one': [self.tc_list[i] for i in sorted(self.fixed_one)],
+            'fixed_to_zero': [self.tc_list[i] for i in sorted(self.fixed_zero)],
+            'equivalent_to': dict((self.tc_list[i], self.tc_list[j]) for i, j in self.equivalent_to.items()),
+            # the objective value of the original model is the one of the reduced model plus this offset
+            'objective_offset': self.sign * sum([self.cost(i) for i in self.fixed_one]),
+        }
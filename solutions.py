@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import xml.etree.ElementTree
+from collections import OrderedDict
+
+from backends import Result
+
+# a value within TOLERANCE of 0 or 1 is that integer, e.g. 9.99999E-01 or 1.11E-15
+TOLERANCE = 1e-5
+
+# the parsers of the output formats of the solvers, tried in order:
+#   (name, match: file name -> bool, parse: lines -> (status, objective, values), is_mints)
+# values: variable -> value, in the order of the output; the variables of a MINTS model
+# (is_mints) are x<new id>, renamed with the mapping file of the MINTS model
+parsers = list()
+
+
+def parser(name, match, is_mints=False):
+    def register(parse):
+        parsers.append((name, match, parse, is_mints))
+        return parse
+    return register
+
+
+def find_parser(fname):  # the entry of the parsers matching the file name, or None
+    fname = os.path.basename(fname)
+    for entry in parsers:
+        if entry[1](fname):
+            return entry
+    return None
+
+
+def get_parser(fname):
+    entry = find_parser(fname)
+    assert entry is not None, 'Wrong solution file: %s' % fname
+    return entry
+
+
+def get_status(message):  # e.g. 'MIP - Integer optimal solution' -> 'optimal'
+    message = message.lower()
+    if 'infeasible' in message and 'integer feasible' not in message:
+        return 'infeasible'
+    if 'optimal' in message:
+        return 'optimal'
+    if 'feasible' in message:
+        return 'feasible'
+    return 'unknown'
+
+
+def to_binary(var, value, tolerance=TOLERANCE):
+    if abs(value - 1) <= tolerance:
+        return 1
+    assert abs(value) <= tolerance, 'not a 0-1 value of %s: %r' % (var, value)
+    return 0
+
+
+def is_tc(var):
+    return var.startswith('t')
+
+
+@parser('sol', lambda fname: fname.endswith('.sol'))
+def parse_sol(lines):
+    # e.g. t6                              0
+    #      t57                             1
+    values = OrderedDict()
+    for line in lines:
+        fields = line.split()
+        if len(fields) == 2:
+            values[fields[0]] = float(fields[1])
+    return 'unknown', None, values
+
+
+@parser('soplex', lambda fname: fname.endswith('.soplex'))
+def parse_soplex(lines):
+    # e.g. SoPlex status       : problem is solved [optimal]
+    #      Objective value     : 1.00000000e+00
+    #      Primal solution (name, value):
+    #      t1854                                       0.1e1
+    #      All other variables are zero (within 1.0e-16). Solution has 11 nonzero entries.
+    status, objective = 'unknown', None
+    values = OrderedDict()
+    is_start = False
+    for line in lines:
+        if line.startswith('Primal solution'):
+            is_start = True
+        elif line.startswith('All other variables'):
+            is_start = False
+        elif is_start:
+            fields = line.split()
+            if len(fields) == 2:
+                values[fields[0]] = float(fields[1])
+        elif line.startswith('SoPlex status'):
+            status = get_status(line.split(':', 1)[1])
+        elif line.startswith('Objective value'):
+            objective = float(line.split(':', 1)[1])
+    return status, objective, values
+
+
+@parser('bpmpd', lambda fname: fname.endswith('.bpmpd'))
+def parse_bpmpd(lines):
+    # e.g.  -------------C-O-L-U-M-N-S----...
+    #       t1459     0.00000000000E+00 CHEPDU  0.10000000000E+01
+    #       t1453     0.10000000000E+01 CHEPDU  0.96153800000E+00
+    #       ---------------S-L-A-C-K---R-E-...
+    values = OrderedDict()
+    is_start = False
+    for line in lines:
+        if line.startswith(' -------------C-O-L-U-M-N-S'):
+            is_start = True
+        elif line.startswith(' ---------------S-L-A-C-K---R-E-'):
+            is_start = False
+        elif is_start and line.startswith(' ') and len(line.split()) > 1:
+            fields = line.split()
+            try:
+                values[fields[0]] = float(fields[1])
+            except ValueError:
+                continue  # e.g. the header of the columns
+    return 'unknown', None, values
+
+
+@parser('cplex', lambda fname: fname.endswith('.cplex'))
+def parse_cplex(lines):
+    # e.g. MIP - Integer optimal solution:  Objective =  5.0000000000e-01
+    #      CPLEX> Incumbent solution
+    #      Variable Name           Solution Value
+    #      t2                            1.000000
+    #      All other variables in the range 1-3 are 0.
+    status, objective = 'unknown', None
+    values = OrderedDict()
+    is_start = False
+    for line in lines:
+        if line.startswith('CPLEX> Variable Name') or line.startswith('CPLEX> Incumbent solution'):
+            is_start = True
+        elif line.startswith('All other variables'):
+            is_start = False
+        elif is_start:
+            fields = line.split()
+            if len(fields) == 2 and fields[0] != 'Variable':
+                values[fields[0]] = float(fields[1])
+        elif line.startswith('MIP - ') or line.startswith('Dual simplex - ') or line.startswith('Primal simplex - '):
+            message, _, rest = line.partition('Objective =')
+            status = get_status(message)
+            if rest.strip():
+                objective = float(rest)
+    return status, objective, values
+
+
+@parser('xml', lambda fname: fname.endswith('.xml'))
+def parse_xml(lines):
+    # the solution file of CPLEX, e.g.
+    #   <header ... objectiveValue="2" solutionStatusString="integer optimal solution"/>
+    #   <variables><variable name="t1" index="0" value="1"/> ...
+    status, objective = 'unknown', None
+    values = OrderedDict()
+    for _, e in xml.etree.ElementTree.iterparse(lines):
+        if e.tag == 'variable':
+            values[e.get('name')] = float(e.get('value'))
+        elif e.tag == 'header':
+            status = get_status(e.get('solutionStatusString', ''))
+            if e.get('objectiveValue') is not None:
+                objective = float(e.get('objectiveValue'))
+        e.clear()
+    return status, objective, values
+
+
+@parser('minisat', lambda fname: fname.endswith('minisat'), is_mints=True)
+def parse_minisat(lines):
+    # e.g. o 3
+    #      s OPTIMUM FOUND
+    #      v -x2 x1 x3
+    # the variables of the last solution found, those not in it are 0
+    status, objective = 'unknown', None
+    values = OrderedDict()
+    for line in lines:
+        if line.startswith('o '):
+            objective = float(line.split()[1])
+            values = OrderedDict()
+        elif line.startswith('s '):
+            message = line[2:].strip().upper()
+            if message == 'UNSATISFIABLE':
+                status = 'infeasible'
+            elif message == 'OPTIMUM FOUND':
+                status = 'optimal'
+            elif message == 'SATISFIABLE':
+                status = 'feasible'
+        elif line.startswith('v'):
+            for var in line.split()[1:]:
+                values[var.lstrip('-')] = 0.0 if var.startswith('-') else 1.0
+    return status, objective, values
+
+
+@parser('opbdp', lambda fname: fname.endswith('opbdp'), is_mints=True)
+def parse_opbdp(lines):
+    # e.g. 0-1 Variables fixed to 1 : x1 x6 x21 x33
+    values = OrderedDict()
+    for line in lines:
+        if line.startswith('0-1 Variables'):
+            values = OrderedDict((var, 1.0) for var in line.split(':', 1)[1].split())
+    return 'unknown', None, values
+
+
+@parser('couenne', lambda fname: fname.endswith('couenne'))
+def parse_couenne(lines):
+    # e.g. couenne: Optimal
+    #      : _varname _var    :=
+    #      1   t2       1
+    #      2   t3       0
+    #      ;
+    status = 'unknown'
+    values = OrderedDict()
+    is_start = False
+    for line in lines:
+        if is_start:
+            if line.startswith(';'):
+                break
+            fields = line.split()
+            if len(fields) == 3:
+                values[fields[1]] = float(fields[2])
+        elif line.startswith(':') and '_varname' in line:
+            is_start = True
+        elif line.startswith('couenne:') and line.split(':', 1)[1].strip():
+            status = get_status(line.split(':', 1)[1])
+    return status, None, values
+
+
+@parser('neos', lambda fname: 'Neos' in fname)
+def parse_neos(lines):
+    # e.g. t1,1.00E+00
+    #      t2=2.22E-16
+    values = OrderedDict()
+    for line in lines:
+        if not line.strip():
+            continue
+        var, value = line.split(',' if ',' in line else '=')
+        values[var.strip()] = float(value)
+    return 'unknown', None, values
+
+
+def find_mints_mapping(proj_dir, fname=None):
+    # the mapping file written with the MINTS model, <name>.mints.mapping.json: the name is the longest
+    # prefix of the solution file (e.g. linear.sol.minisat -> linear) having one, else the only mapping
+    # file of the directory, else linear_so.mints.mapping.json
+    fields = os.path.basename(fname).split('.') if fname else []
+    for k in range(len(fields) - 1, 0, -1):
+        path = os.path.join(proj_dir, '.'.join(fields[:k]) + '.mints.mapping.json')
+        if os.path.exists(path):
+            return path
+    paths = [f for f in os.listdir(proj_dir or '.') if f.endswith('.mints.mapping.json')]
+    if len(paths) == 1:
+        return os.path.join(proj_dir, paths[0])
+    return os.path.join(proj_dir, 'linear_so.mints.mapping.json')
+
+
+def load_mints_mapping(proj_dir, fname=None):  # e.g. {'t1': 't3', ...}, the new id of each test case -> the test case
+    newid_to_tc = dict()
+    path = find_mints_mapping(proj_dir, fname)
+    assert os.path.exists(path), 'No mapping file of the MINTS model: %s' % path
+    with open(path, 'r') as f:
+        tc_to_newid = json.load(f)
+    for tc, newid in tc_to_newid.items():
+        k = 't' + str(newid)
+        if k not in newid_to_tc:
+            newid_to_tc[k] = tc
+    return newid_to_tc
+
+
+def read_solution(path, proj_dir=None, tolerance=TOLERANCE):
+    # the output of a solver -> a Result of backends.py, in one pass over the file:
+    #   selected_tcs: the test cases of value 1, values: every variable (test cases and v_ alike),
+    #   objective: None if not reported, status: 'unknown' if not reported but a solution was read
+    name, _, parse, is_mints = get_parser(path)
+    with open(path, 'rb' if name == 'xml' else 'r') as f:
+        status, objective, values = parse(f)
+    if is_mints:
+        newid_to_tc = load_mints_mapping(proj_dir or os.path.dirname(path), path)
+        values = OrderedDict((newid_to_tc[var.replace('x', 't')], value) for var, value in values.items()
+                             if var.startswith('x'))
+    selected_tcs = [var for var, value in values.items() if is_tc(var) and to_binary(var, value, tolerance)]
+    if status == 'unknown' and values:
+        status = 'feasible'
+    return Result(name, status, objective, values, selected_tcs)
+
+
+if __name__ == '__main__':
+    result = read_solution(sys.argv[1])
+    print('Status: %s' % result.status)
+    if result.objective is not None:
+        print('Objective value: %0.6f' % result.objective)
+    print('# Minimized test suite: %d' % len(result.selected_tcs))
@@ -0,0 +1,717 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import time
+import heapq
+import itertools
+
+from criteria import popcount, bits, to_bitset
+from formulator import Formulator
+from profiler import profiler
+
+
+def merge(old, moved, new):  # the entries of the test cases: old[j] for those moved from index j, the next of new for the others
+    new = iter(new)
+    return [old[j] if j is not None else next(new) for j in moved]
+
+
+class Solver:
+    # solve the minimization modeled by a config in-process, without an external ILP solver:
+    #   greedy:            weighted set cover, new crio_ids per unit of the objective coefficient
+    #   additional_greedy: the test case covering the most new crio_ids first
+    #   hgs:               Harrold-Gupta-Soffa, crio_ids covered by the fewest test cases first
+    # the coverage criteria (is_coefficient: false) must be satisfied, and the budgets
+    # (is_coefficient: true, e.g. rtime.info <= 2) are never exceeded; the cost of a test case is the
+    # change of the objective of the config if it is added to the selection (cost), e.g. for Nemo
+    # (nonlinear: true) it depends on the crio_ids already covered, as evaluated by get_nemo_objective
+    algorithms = ['greedy', 'additional_greedy', 'hgs']
+
+    def __init__(self, formulator, previous=None):
+        # previous: (the model of a previous Solver, see get_model, and the test cases whose lines changed in
+        # the criterion files since then), patched instead of built again (see update), e.g. by incremental.py
+        self.formulator = formulator
+        self.config = formulator.config
+        self.tc_list = formulator.tc_list
+        self.tc_index = dict((tc, i) for i, tc in enumerate(self.tc_list))
+        self.sign = 1 if 'min' in self.config['min_or_max'].lower() else -1
+        self.offsets = self.get_offsets()
+        self.scales = self.get_scales()
+        if previous is None:
+            self.covs = self.get_covs(self.tc_list)
+            self.cards = self.get_cards()
+            self.required = 0
+            for cov in self.covs:
+                self.required |= cov
+            self.budgets = self.get_budgets(self.tc_list)
+            self.lin, self.terms = self.get_nemo_objective(self.tc_list)
+        else:
+            self.update(*previous)
+        self.state = self.new_state([])  # the selection of the heuristics, see new_selection
+
+    def get_coverage_files(self):  # the criterion files of the coverage criteria (is_coefficient: false)
+        return [self.formulator.criteria.get(crio['file']) for crio in self.config['absolute_cria']
+                if not crio['is_coefficient']]
+
+    def get_offsets(self):  # the first bit of the crio_ids of each coverage criterion in the bitsets of the test cases
+        offsets = list()
+        offset = 0
+        for crio_file in self.get_coverage_files():
+            offsets.append(offset)
+            offset += len(crio_file.crio_ids)
+        return offsets
+
+    def get_scales(self):  # the total or the maximum of each relative criterion, its coefficients are divided by
+        scales = list()
+        for crio in self.config['relative_cria']:
+            crio_file = self.formulator.criteria.get(crio['file'])
+            scales.append(crio_file.total_num() if crio['is_dependent'] else crio_file.max_num())
+        return scales
+
+    def get_covs(self, tcs):
+        # the crio_ids of all coverage criteria are renumbered into one bitset per test case
+        covs = [0] * len(tcs)
+        for crio_file, offset in zip(self.get_coverage_files(), self.offsets):
+            for i, cov in enumerate(crio_file.align(tcs)):
+                covs[i] |= cov << offset
+        return covs
+
+    def get_cards(self, crio_bits=None):  # crio_id bit -> number of test cases covering it, of the given bits (all by default)
+        cards = dict()
+        for crio_file, offset in zip(self.get_coverage_files(), self.offsets):
+            in_model = to_bitset([t for t, tc in enumerate(crio_file.tcs) if tc in self.formulator.tc_set],
+                                 len(crio_file.tcs))
+            crio_bitsets = crio_file.get_crio_bitsets()
+            if crio_bits is None:
+                indices = range(len(crio_bitsets))
+            else:
+                indices = [b - offset for b in bits(crio_bits) if offset <= b < offset + len(crio_bitsets)]
+            for c in indices:
+                card = popcount(crio_bitsets[c] & in_model)
+                if card:
+                    cards[offset + c] = card
+        return cards
+
+    def get_budgets(self, tcs):  # [(weight of each given test case, ctype, rhs)]
+        budgets = list()
+        for crio in self.config['absolute_cria']:
+            if not crio['is_coefficient']:
+                continue
+            crio_file = self.formulator.criteria.get(crio['file'])
+            values = crio_file.get_values()
+            weights = list()
+            for tc in tcs:
+                t = crio_file.tc_index.get(tc)
+                weights.append(values[t] if t is not None and values[t] is not None else 0)
+            budgets.append((weights, crio['crio_type'], float(crio['rhs'])))
+        return budgets
+
+    def get_model(self):  # the model built from the criterion files, to be patched by a later Solver (see update)
+        return dict((k, getattr(self, k)) for k in
+                    ['tc_list', 'offsets', 'scales', 'covs', 'cards', 'required', 'budgets', 'lin', 'terms'])
+
+    def update(self, model, changed):
+        # patch the model of a previous Solver after the criterion files changed the lines of the given test
+        # cases: the entries of the other test cases are moved to their index in the new list of test cases,
+        # and only those of the changed test cases are computed, with the cards of the crio_ids of their old
+        # or new lines; new crio_ids before a coverage criterion (offsets), or a new total or maximum of a
+        # relative criterion (scales), change the entries of every test case
+        old_index = dict((tc, i) for i, tc in enumerate(model['tc_list']))
+        moved = [old_index.get(tc) if tc not in changed else None for tc in self.tc_list]
+        todo = [tc for tc, j in zip(self.tc_list, moved) if j is None]
+        if self.offsets == model['offsets']:
+            self.covs = merge(model['covs'], moved, self.get_covs(todo))
+            touched = 0
+            for tc in changed:
+                if tc in old_index:
+                    touched |= model['covs'][old_index[tc]]
+                if tc in self.tc_index:
+                    touched |= self.covs[self.tc_index[tc]]
+            self.cards = dict((b, card) for b, card in model['cards'].items() if not touched >> b & 1)
+            self.cards.update(self.get_cards(touched))
+            self.required = model['required'] & ~touched
+            for b in bits(touched):
+                if b in self.cards:
+                    self.required |= 1 << b
+        else:
+            self.covs = self.get_covs(self.tc_list)
+            self.cards = self.get_cards()
+            self.required = 0
+            for cov in self.covs:
+                self.required |= cov
+        self.budgets = [(merge(old_weights, moved, weights), ctype, rhs)
+                        for (old_weights, _, _), (weights, ctype, rhs) in zip(model['budgets'], self.get_budgets(todo))]
+        if self.scales != model['scales']:
+            moved = [None] * len(self.tc_list)
+            todo = self.tc_list
+        lin, terms = self.get_nemo_objective(todo)
+        self.lin = merge(model['lin'], moved, lin)
+        self.terms = [(coeff, merge(old_covs, moved, covs)) for (coeff, covs), (_, old_covs) in zip(terms, model['terms'])]
+
+    def fits(self, i, used):  # can test case i be added without exceeding a budget
+        for (weights, ctype, rhs), u in zip(self.budgets, used):
+            if ctype in ['<=', '='] and u + weights[i] > rhs:
+                return False
+            if ctype == '<' and u + weights[i] >= rhs:
+                return False
+        return True
+
+    def is_satisfied(self, used):  # are the lower bounds of the budgets reached
+        for (weights, ctype, rhs), u in zip(self.budgets, used):
+            if (ctype in ['>=', '='] and u < rhs) or (ctype == '>' and u <= rhs):
+                return False
+        return True
+
+    def budget_weight(self, i):  # the share of the tightest budget used by test case i
+        share = 0.0
+        for weights, ctype, rhs in self.budgets:
+            if ctype in ['<=', '<', '='] and rhs > 0:
+                share = max(share, weights[i] / rhs)
+        return share
+
+    def solve(self, algorithm='greedy', start=None):
+        # start: a previous selection of test cases to warm start from (e.g. of incremental.py);
+        # its test cases still in the model are kept as long as the budgets allow it
+        assert algorithm in Solver.algorithms
+        selected, used = self.new_selection()
+        uncovered = self.required
+        if start is not None:
+            for tc in start:
+                i = self.tc_index.get(tc)
+                if i is not None and i not in self.state['selected'] and self.fits(i, used):
+                    self.select(i, selected, used)
+                    uncovered &= ~self.covs[i]
+        if algorithm == 'greedy':
+            uncovered = self.cover_greedy(selected, used, uncovered)
+        elif algorithm == 'additional_greedy':
+            uncovered = self.cover_additional(selected, used, uncovered)
+        else:
+            uncovered = self.cover_hgs(selected, used, uncovered)
+        self.improve(selected, used)
+        self.remove_redundant(selected, used)
+        self.fill(selected, used)
+        status = 'feasible' if uncovered == 0 and self.is_satisfied(used) else 'infeasible'
+        return [self.tc_list[i] for i in sorted(selected)], status
+
+    def new_selection(self):  # -> (selected, used) of an empty selection, the objective of which is self.state
+        self.state = self.new_state([])
+        return list(), [0] * len(self.budgets)
+
+    def select(self, i, selected, used):
+        selected.append(i)
+        for b, (weights, _, _) in enumerate(self.budgets):
+            used[b] += weights[i]
+        self.apply_add(self.state, i)
+
+    def unselect(self, i, selected, used):
+        selected.remove(i)
+        for b, (weights, _, _) in enumerate(self.budgets):
+            used[b] -= weights[i]
+        self.apply_remove(self.state, i)
+
+    def cost(self, i):  # the change of the objective (to be minimized) by adding test case i to the selection
+        return self.delta_add(self.state, i)
+
+    def cover_greedy(self, selected, used, uncovered):
+        # lazy evaluation: the gain of a test case never grows as crio_ids get covered
+        # (nor does its cost for the Linear approach; for Nemo the scores are recomputed as they are popped)
+        eps = 0.000001
+        heap = list()
+        for i, cov in enumerate(self.covs):
+            if cov:
+                heap.append((-popcount(cov) / max(self.cost(i), eps), i))
+        heapq.heapify(heap)
+        while uncovered and heap:
+            _, i = heapq.heappop(heap)
+            gain = popcount(self.covs[i] & uncovered)
+            if gain == 0 or not self.fits(i, used):
+                continue
+            score = -gain / max(self.cost(i), eps)
+            if heap and score > heap[0][0]:
+                heapq.heappush(heap, (score, i))
+                continue
+            self.select(i, selected, used)
+            uncovered &= ~self.covs[i]
+        return uncovered
+
+    def cover_additional(self, selected, used, uncovered):
+        candidates = set(i for i, cov in enumerate(self.covs) if cov and i not in selected)
+        while uncovered:
+            best = None
+            for i in candidates:
+                gain = popcount(self.covs[i] & uncovered)
+                if gain == 0 or not self.fits(i, used):
+                    continue
+                key = (gain, -self.cost(i), -i)
+                if best is None or key > best[0]:
+                    best = (key, i)
+            if best is None:
+                break
+            i = best[1]
+            candidates.discard(i)
+            self.select(i, selected, used)
+            uncovered &= ~self.covs[i]
+        return uncovered
+
+    def cover_hgs(self, selected, used, uncovered):
+        # group the crio_ids by the number of test cases covering them
+        card_masks = dict()
+        for c, card in self.cards.items():
+            card_masks[card] = card_masks.get(card, 0) | (1 << c)
+        cards = sorted(card_masks.keys())
+        for n, card in enumerate(cards):
+            while uncovered & card_masks[card]:
+                mask = uncovered & card_masks[card]
+                best = None
+                for i, cov in enumerate(self.covs):
+                    if not cov & mask or i in selected or not self.fits(i, used):
+                        continue
+                    # ties are broken by the crio_ids of the next cardinalities
+                    key = tuple([popcount(cov & uncovered & card_masks[k]) for k in cards[n:]]) + (-self.cost(i), -i)
+                    if best is None or key > best[0]:
+                        best = (key, i)
+                if best is None:  # the remaining crio_ids of this cardinality cannot be covered
+                    break
+                i = best[1]
+                self.select(i, selected, used)
+                uncovered &= ~self.covs[i]
+        return uncovered
+
+    def improve(self, selected, used):
+        # add the test cases that improve the objective by themselves (e.g. when maximizing),
+        # the most improvement per unit of budget first
+        eps = 0.000001
+        costs = dict((i, self.cost(i)) for i in range(len(self.tc_list)) if i not in self.state['selected'])
+        candidates = [i for i, c in costs.items() if c < 0]
+        candidates.sort(key=lambda i: (costs[i] / max(self.budget_weight(i), eps), i))
+        for i in candidates:
+            if self.fits(i, used) and self.cost(i) < 0:
+                self.select(i, selected, used)
+
+    def remove_redundant(self, selected, used):
+        # drop the most expensive test cases whose crio_ids are covered by the others
+        savings = dict((i, self.delta_remove(self.state, i)) for i in selected)
+        for i in sorted(selected, key=lambda i: (savings[i], i)):
+            if self.delta_remove(self.state, i) > 0:
+                continue
+            others = 0
+            for j in selected:
+                if j != i:
+                    others |= self.covs[j]
+            if self.covs[i] & self.required & ~others:
+                continue
+            self.unselect(i, selected, used)
+            if not self.is_satisfied(used):
+                self.select(i, selected, used)
+
+    def fill(self, selected, used):
+        # reach the lower bounds of the budgets (e.g. rtime.info >= 10) with the cheapest test cases
+        costs = dict((i, self.cost(i)) for i in range(len(self.tc_list)) if i not in self.state['selected'])
+        candidates = sorted(costs, key=lambda i: (costs[i], i))
+        for i in candidates:
+            if self.is_satisfied(used):
+                break
+            if self.fits(i, used):
+                self.select(i, selected, used)
+
+    def get_nemo_objective(self, tcs):
+        # the objective of the config evaluated exactly on bitsets, e.g. for Nemo (nonlinear: true)
+        #   sum of the linear terms of the test cases + weight/q * (number of distinct crio_ids covered)
+        # as modeled by gen_objective_aux; for the Linear approach, the coefficients of gen_objective
+        # lin: the linear coefficient of each given test case; terms: [(coefficient of a distinct crio_id, bitsets)]
+        if not self.config['nonlinear']:
+            tc_to_coeff = self.formulator.gen_objective(tcs)
+            return [tc_to_coeff.get(tc, 0) for tc in tcs], list()
+        lin = [0.0] * len(tcs)
+        terms = list()
+        for crio in self.config['relative_cria']:
+            crio_file = self.formulator.criteria.get(crio['file'])
+            weight = int(crio['weight'])
+            if crio['is_dependent']:
+                coeff = round(1 / float(crio_file.total_num()), 6)
+                if crio['invert']:
+                    for i, tc in enumerate(tcs):
+                        if tc in crio_file.tc_index:
+                            lin[i] += weight
+                covs = crio_file.align(tcs)
+                terms.append((-weight * coeff if crio['invert'] else weight * coeff, covs))
+            else:
+                q = crio_file.max_num()
+                values = crio_file.get_values()
+                for i, tc in enumerate(tcs):
+                    t = crio_file.tc_index.get(tc)
+                    if t is None or values[t] is None:
+                        continue
+                    coeff = round(values[t] / float(q), 6)
+                    lin[i] += weight * (1 - coeff if crio['invert'] else coeff)
+        return lin, terms
+
+    def new_state(self, selected):
+        state = {'selected': set(), 'used': [0] * len(self.budgets), 'value': 0.0,
+                 'required': Coverage(), 'terms': [Coverage() for _ in self.terms]}
+        for i in selected:
+            self.apply_add(state, i)
+        return state
+
+    def apply_add(self, state, i):
+        state['value'] += self.delta_add(state, i)
+        state['selected'].add(i)
+        for b, (weights, _, _) in enumerate(self.budgets):
+            state['used'][b] += weights[i]
+        state['required'].add(self.covs[i])
+        for (_, covs), cover in zip(self.terms, state['terms']):
+            cover.add(covs[i])
+
+    def apply_remove(self, state, i):
+        state['value'] += self.delta_remove(state, i)
+        state['selected'].discard(i)
+        for b, (weights, _, _) in enumerate(self.budgets):
+            state['used'][b] -= weights[i]
+        state['required'].remove(self.covs[i])
+        for (_, covs), cover in zip(self.terms, state['terms']):
+            cover.remove(covs[i])
+
+    # deltas of the objective to be minimized (the objective times -1 when maximizing)
+    def delta_add(self, state, i):
+        delta = self.lin[i]
+        for (coeff, covs), cover in zip(self.terms, state['terms']):
+            delta += coeff * cover.gain(covs[i])
+        return self.sign * delta
+
+    def delta_remove(self, state, i):
+        delta = -self.lin[i]
+        for (coeff, covs), cover in zip(self.terms, state['terms']):
+            delta -= coeff * cover.loss(covs[i])
+        return self.sign * delta
+
+    def delta_swap(self, state, i, j):  # i is removed, j is added
+        delta = self.lin[j] - self.lin[i]
+        for (coeff, covs), cover in zip(self.terms, state['terms']):
+            delta += coeff * cover.swap(covs[i], covs[j])
+        return self.sign * delta
+
+    def can_remove(self, state, i):
+        if self.covs[i] & state['required'].once:
+            return False
+        used = [u - weights[i] for (weights, _, _), u in zip(self.budgets, state['used'])]
+        return self.is_satisfied(used)
+
+    def can_swap(self, state, i, j):
+        if self.covs[i] & state['required'].once & ~self.covs[j]:
+            return False
+        used = [u - weights[i] for (weights, _, _), u in zip(self.budgets, state['used'])]
+        return self.fits(j, used) and self.is_satisfied([u + weights[j] for (weights, _, _), u in zip(self.budgets, used)])
+
+    def is_feasible(self, state):
+        return self.required & ~state['required'].any == 0 and self.is_satisfied(state['used'])
+
+    def get_objective(self, selected_tcs):
+        state = self.new_state([self.tc_index[tc] for tc in selected_tcs])
+        return self.sign * state['value']
+
+    def save(self, selected_tcs, algorithm):
+        # e.g. t6                              0
+        #      t57                             1
+        # the same format as an lp_solve solution, so that generator.py can read it
+        out_path = os.path.join(self.formulator.proj_dir, self.config['name'] + '.' + algorithm + '.sol')
+        selected_tcs = set(selected_tcs)
+        with open(out_path, 'w') as f:
+            for tc in self.tc_list:
+                f.write('%-32s%d\n' % (tc, 1 if tc in selected_tcs else 0))
+        return out_path
+
+
+class Coverage:
+    # how many selected test cases cover each crio_id, with the bitsets of the crio_ids
+    # covered at least once (any) and exactly once (once) for the delta evaluation
+    def __init__(self):
+        self.cnt = dict()
+        self.any = 0
+        self.once = 0
+
+    def add(self, cov):
+        self.once = (self.once & ~cov) | (cov & ~self.any)
+        self.any |= cov
+        for b in bits(cov):
+            self.cnt[b] = self.cnt.get(b, 0) + 1
+
+    def remove(self, cov):
+        for b in bits(cov):
+            self.cnt[b] -= 1
+            if self.cnt[b] == 1:
+                self.once |= 1 << b
+            elif self.cnt[b] == 0:
+                del self.cnt[b]
+                self.any &= ~(1 << b)
+                self.once &= ~(1 << b)
+
+    def gain(self, cov):  # crio_ids newly covered by adding cov
+        return popcount(cov & ~self.any)
+
+    def loss(self, cov):  # crio_ids no longer covered after removing cov
+        return popcount(cov & self.once)
+
+    def swap(self, cov_out, cov_in):  # change of the covered crio_ids by replacing cov_out by cov_in
+        lost = cov_out & self.once
+        return popcount(cov_in & ~(self.any & ~lost)) - popcount(lost)
+
+
+class NemoSolver(Solver):
+    # searches beyond the greedy solution, on the objective of get_nemo_objective with delta evaluation
+    #   local_search:     add/remove/swap moves from the greedy solution with delta evaluation
+    #   branch_and_bound: depth-first search seeded by the local search, reports the best bound
+    #   budgeted:         lazy greedy by improvement per unit of the budgets, from the seeds of a partial
+    #                     enumeration, for several budgets (see budgeted)
+    # they stop at the time limit (seconds) and keep the constraints of the config satisfied
+    algorithms = ['local_search', 'branch_and_bound', 'budgeted']
+    eps = 0.0000001
+
+    def __init__(self, formulator, time_limit=60, previous=None):
+        Solver.__init__(self, formulator, previous)
+        self.time_limit = time_limit
+        self.bound = None
+        self.nodes = 0
+
+    def solve(self, algorithm='local_search', start=None):
+        assert algorithm in self.algorithms
+        self.start = time.time()
+        if algorithm == 'budgeted':
+            state = self.budgeted(start)
+        else:
+            Solver.solve(self, 'greedy', start)
+            state = self.state
+            self.local_search(state)
+        if algorithm == 'branch_and_bound':
+            state = self.branch_and_bound(state)
+        status = 'feasible' if self.is_feasible(state) else 'infeasible'
+        if status == 'feasible' and self.bound is not None and self.bound >= state['value'] - self.eps:
+            status = 'optimal'
+        return [self.tc_list[i] for i in sorted(state['selected'])], status
+
+    def is_timeout(self):
+        return time.time() - self.start > self.time_limit
+
+    def local_search(self, state):
+        # first improvement over the remove, add and swap moves, until a local optimum
+        n = len(self.tc_list)
+        improved = True
+        while improved and not self.is_timeout():
+            improved = False
+            for i in sorted(state['selected']):
+                if self.can_remove(state, i) and self.delta_remove(state, i) < -self.eps:
+                    self.apply_remove(state, i)
+                    improved = True
+            for j in range(n):
+                if j not in state['selected'] and self.fits(j, state['used']) \
+                        and self.delta_add(state, j) < -self.eps:
+                    self.apply_add(state, j)
+                    improved = True
+            for i in sorted(state['selected']):
+                if self.is_timeout():
+                    break
+                for j in range(n):
+                    if j in state['selected']:
+                        continue
+                    if self.delta_swap(state, i, j) < -self.eps and self.can_swap(state, i, j):
+                        self.apply_remove(state, i)
+                        self.apply_add(state, j)
+                        improved = True
+                        break
+        return state
+
+    def resource_cost(self, i, used):  # the largest share of the capacity left in a budget used by test case i
+        cost = self.eps
+        for (weights, ctype, rhs), u in zip(self.budgets, used):
+            if ctype in ['<=', '<', '=']:
+                cost = max(cost, weights[i] / max(rhs - u, self.eps))
+        return cost
+
+    def budgeted(self, start=None):
+        # the test cases of the best improvement of the objective per unit of resource_cost, picked lazily:
+        # the improvement of a test case never grows as the others are selected (the crio_ids covered count
+        # once, exactly so unless a criterion is inverted), nor does the capacity left, so a test case on top
+        # of the heap after a recomputation is the best; as the ratio alone can miss a large test case, the
+        # greedy is run from every seed of up to "depth" of the "width" best test cases by themselves, and by
+        # the improvement alone (partial enumeration), then the best solution is improved by local_search, e.g.
+        #   "budgeted": {"depth": 2, "width": 8}
+        params = self.config.get('budgeted', dict())
+        depth = int(params.get('depth', 2))
+        width = int(params.get('width', 8))
+        n = len(self.tc_list)
+        empty = self.new_state([])
+        gains = [-self.delta_add(empty, i) for i in range(n)]
+        no_budget = [0] * len(self.budgets)
+        top = [i for i in sorted(range(n), key=lambda i: (-gains[i], i)) if self.fits(i, no_budget)][:width]
+        seeds = [()]
+        for k in range(1, depth + 1):
+            seeds.extend(itertools.combinations(top, k))
+        runs = [(seed, self.resource_cost) for seed in seeds] + [((), lambda i, used: 1.0)]
+        best = None
+        for seed, cost in runs:
+            if best is not None and self.is_timeout():
+                break
+            state = self.lazy_greedy(seed, gains, cost, start)
+            if state is None:
+                continue
+            key = (not self.is_feasible(state), state['value'])
+            if best is None or key < best[0]:
+                best = (key, state)
+        state = best[1]
+        self.local_search(state)
+        return state
+
+    def lazy_greedy(self, seed, gains, cost, start=None):  # -> the state, or None if the seed exceeds a budget
+        selected, used = self.new_selection()
+        for i in seed:
+            if not self.fits(i, used):
+                return None
+            self.select(i, selected, used)
+        if start is not None:  # the test cases of a previous selection, as long as the budgets allow it
+            for tc in start:
+                i = self.tc_index.get(tc)
+                if i is not None and i not in seed and self.fits(i, used):
+                    self.select(i, selected, used)
+        # the required crio_ids of the coverage criteria first, as by the greedy of Solver
+        uncovered = self.required
+        for i in selected:
+            uncovered &= ~self.covs[i]
+        self.cover_greedy(selected, used, uncovered)
+        state = self.state
+        heap = [(-gains[i] / cost(i, state['used']), i) for i in range(len(self.tc_list))
+                if gains[i] > self.eps and i not in state['selected']]
+        heapq.heapify(heap)
+        while heap:
+            _, i = heapq.heappop(heap)
+            if not self.fits(i, state['used']):
+                continue  # the budgets used only grow
+            gain = -self.delta_add(state, i)
+            if gain <= self.eps:
+                continue
+            score = -gain / cost(i, state['used'])
+            if heap and score > heap[0][0]:
+                heapq.heappush(heap, (score, i))
+                continue
+            self.apply_add(state, i)
+        # the lower bounds of the budgets, if any, added to the state by select
+        self.fill(list(state['selected']), list(state['used']))
+        return state
+
+    def branch_and_bound(self, incumbent):
+        # test cases of the incumbent first, then the cheapest ones
+        n = len(self.tc_list)
+        order = sorted(range(n), key=lambda i: (i not in incumbent['selected'], self.sign * self.lin[i], i))
+        self.order = order
+        # what the undecided test cases order[d:] can still cover or spend
+        self.suffix_required = [0] * (n + 1)
+        self.suffix_terms = [[0] * (n + 1) for _ in self.terms]
+        self.suffix_neg = [0.0] * (n + 1)
+        self.suffix_weights = [[0] * (n + 1) for _ in self.budgets]
+        for d in range(n - 1, -1, -1):
+            i = order[d]
+            self.suffix_required[d] = self.suffix_required[d + 1] | self.covs[i]
+            for k, (_, covs) in enumerate(self.terms):
+                self.suffix_terms[k][d] = self.suffix_terms[k][d + 1] | covs[i]
+            self.suffix_neg[d] = self.suffix_neg[d + 1] + min(0.0, self.sign * self.lin[i])
+            for b, (weights, _, _) in enumerate(self.budgets):
+                self.suffix_weights[b][d] = self.suffix_weights[b][d + 1] + weights[i]
+        # test cases covering each required crio_id, as bitsets over the positions in order
+        self.coverers = dict()
+        self.min_cost = dict()
+        for d, i in enumerate(order):
+            for c in bits(self.covs[i]):
+                self.coverers[c] = self.coverers.get(c, 0) | (1 << d)
+                cost = max(0.0, self.sign * self.lin[i])
+                self.min_cost[c] = min(self.min_cost.get(c, cost), cost)
+        # the crio_ids with the fewest coverers give the largest packings
+        self.packing_order = sorted(self.coverers.keys(), key=lambda c: (popcount(self.coverers[c]), c))
+        self.best = {'selected': set(incumbent['selected']), 'value': incumbent['value'],
+                     'feasible': self.is_feasible(incumbent)}
+        self.open_bound = None
+        self.nodes = 0
+        self.search(self.new_state([]))
+        bound = self.best['value'] if self.best['feasible'] else None
+        if self.open_bound is not None:
+            bound = self.open_bound if bound is None else min(bound, self.open_bound)
+        self.bound = bound
+        return self.new_state(self.best['selected'])
+
+    def lower_bound(self, state, d):
+        uncovered = self.required & ~state['required'].any
+        if uncovered & ~self.suffix_required[d]:
+            return None  # some required crio_id cannot be covered anymore
+        for b, (weights, ctype, rhs) in enumerate(self.budgets):
+            if ctype in ['<=', '='] and state['used'][b] > rhs:
+                return None
+            if ctype == '<' and state['used'][b] >= rhs:
+                return None
+            if ctype in ['>=', '='] and state['used'][b] + self.suffix_weights[b][d] < rhs:
+                return None
+            if ctype == '>' and state['used'][b] + self.suffix_weights[b][d] <= rhs:
+                return None
+        bound = state['value'] + self.suffix_neg[d]
+        for k, ((coeff, _), cover) in enumerate(zip(self.terms, state['terms'])):
+            if self.sign * coeff < 0:
+                bound += self.sign * coeff * popcount(self.suffix_terms[k][d] & ~cover.any)
+        # required crio_ids whose remaining coverers are disjoint need distinct test cases
+        undecided = ~((1 << d) - 1)
+        taken = 0
+        for c in self.packing_order:
+            if not uncovered >> c & 1:
+                continue
+            coverers = self.coverers[c] & undecided
+            if coverers & taken == 0:
+                taken |= coverers
+                bound += self.min_cost[c]
+        return bound
+
+    def search(self, state):
+        # depth-first, with the test case order[d] selected first then not, on an explicit stack of
+        # (d, None): the node of depth d, and (None, i): unselect test case i once its subtree is searched
+        stack = [(0, None)]
+        while stack:
+            d, i = stack.pop()
+            if d is None:
+                self.apply_remove(state, i)
+                continue
+            self.nodes += 1
+            bound = self.lower_bound(state, d)
+            if bound is None:
+                continue
+            if self.best['feasible'] and bound >= self.best['value'] - self.eps:
+                continue
+            if self.is_timeout():
+                self.open_bound = bound if self.open_bound is None else min(self.open_bound, bound)
+                continue
+            if d == len(self.order):
+                if self.is_feasible(state) and (not self.best['feasible'] or state['value'] < self.best['value'] - self.eps):
+                    self.best = {'selected': set(state['selected']), 'value': state['value'], 'feasible': True}
+                continue
+            i = self.order[d]
+            stack.append((d + 1, None))
+            if self.fits(i, state['used']):
+                self.apply_add(state, i)
+                stack.append((None, i))
+                stack.append((d + 1, None))
+
+
+if __name__ == '__main__':
+    args = profiler.parse_args(sys.argv)  # e.g. --profile=hgs.profile.json
+    proj_dir = args[1]
+    config_fname = args[2]
+    formulator = Formulator(proj_dir, config_fname)
+    algorithm = args[3] if len(args) > 3 else formulator.config.get('solver', 'greedy')
+    time_limit = float(args[4]) if len(args) > 4 else formulator.config.get('time_limit', 60)
+    with profiler.stage('build'):
+        if algorithm in NemoSolver.algorithms:
+            solver = NemoSolver(formulator, time_limit)
+        else:
+            solver = Solver(formulator)
+    with profiler.stage('solve'):
+        selected_tcs, status = solver.solve(algorithm)
+    out_path = solver.save(selected_tcs, algorithm)
+    print('Status: %s' % status)
+    print('Objective value: %0.6f' % solver.get_objective(selected_tcs))
+    if algorithm == 'branch_and_bound' and solver.bound is not None:
+        print('Bound: %0.6f (%d nodes)' % (solver.sign * solver.bound, solver.nodes))
+    print('# Minimized test suite: %d' % len(selected_tcs))
+    print('Solution: %s' % out_path)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import glob
+import shutil
+import tempfile
+import unittest
+
+NEMO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, NEMO_DIR)
+
+from formulator import Formulator
+from backends import HighsBackend, PulpBackend
+
+
+def solve(work_dir, config, backend):  # -> the Result of the backend on the config over the files of work_dir
+    return backend(Formulator(work_dir, None, config=config), 60).solve()
+
+
+@unittest.skipUnless(HighsBackend.is_available() and PulpBackend.is_available(), 'highspy and pulp not installed')
+class BackendsTest(unittest.TestCase):
+    # the backends give the same optimum, also on a model left without variables by the reduction
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        for path in glob.glob(os.path.join(NEMO_DIR, 'example', '*.info')):
+            shutil.copy(path, self.work_dir)
+        with open(os.path.join(NEMO_DIR, 'example', 'config.linear.json'), 'r') as f:
+            self.config = json.load(f)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def check(self, objective):
+        results = [solve(self.work_dir, dict(self.config), backend) for backend in [HighsBackend, PulpBackend]]
+        for result in results:
+            self.assertEqual(result.status, 'optimal')
+            self.assertAlmostEqual(result.objective, objective, places=6)
+        self.assertEqual(sorted(results[0].selected_tcs), sorted(results[1].selected_tcs))
+
+    def test_linear(self):
+        self.check(0.5)
+
+    def test_fully_reduced(self):
+        # t1 and t2 are essential and t3 is dominated: no variable is left, the objective is the offset
+        self.config['reduce'] = True
+        formulator = Formulator(self.work_dir, None, config=dict(self.config))
+        formulator.get_model()
+        self.assertEqual(formulator.tc_list, [])
+        self.check(0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
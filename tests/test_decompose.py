@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import random
+import shutil
+import tempfile
+import unittest
+
+NEMO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, NEMO_DIR)
+
+import decompose
+from formulator import Formulator
+from batch import solve
+
+NUM_TCS = 70  # test cases per component, more than GROUP_SIZE so that each component is a subproblem
+
+
+def write_subject(work_dir, rhs):
+    # two components of NUM_TCS test cases covering the statements 1-4 and 101-104, e.g.
+    #   cov.info: t1:2 3      cost.info (objective): t1:17      rtime.info (budget, shared): t1:4
+    rng = random.Random(0)
+    files = dict((fname, list()) for fname in ['cov.info', 'cost.info', 'rtime.info'])
+    for c in range(2):
+        for i in range(NUM_TCS):
+            tc = 't%d' % (c * NUM_TCS + i + 1)
+            statements = sorted(rng.sample(range(1, 5), rng.randint(1, 2)))
+            files['cov.info'].append('%s:%s' % (tc, ' '.join(str(c * 100 + s) for s in statements)))
+            files['cost.info'].append('%s:%d' % (tc, rng.randint(1, 20)))
+            files['rtime.info'].append('%s:%d' % (tc, rng.randint(1, 9)))
+    for fname, lines in files.items():
+        with open(os.path.join(work_dir, fname), 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+    config = {
+        'name': 'decomposed', 'output_format': 'cplex_lp', 'nonlinear': False, 'relax': False, 'min_or_max': 'min',
+        'absolute_cria': [{'is_coefficient': False, 'crio_type': '>=', 'rhs': 1, 'file': 'cov.info'},
+                          {'is_coefficient': True, 'crio_type': '<=', 'rhs': rhs, 'file': 'rtime.info'}],
+        'relative_cria': [{'is_dependent': False, 'weight': 1, 'file': 'cost.info', 'invert': False}]}
+    with open(os.path.join(work_dir, 'config.json'), 'w') as f:
+        json.dump(config, f)
+    return files
+
+
+class DecomposeTest(unittest.TestCase):
+    # the merged selection of the subproblems sharing a budget is feasible, and optimal when the budget
+    # does not restrict the subproblems
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def check_feasible(self, files, rhs, selected_tcs):
+        selected = set(selected_tcs)
+        covered = set()
+        statements = set()
+        for line in files['cov.info']:
+            tc, crio_ids = line.split(':')
+            statements.update(crio_ids.split())
+            if tc in selected:
+                covered.update(crio_ids.split())
+        self.assertEqual(covered, statements)
+        self.assertTrue(sum([int(l.split(':')[1]) for l in files['rtime.info'] if l.split(':')[0] in selected]) <= rhs)
+
+    def run_both(self, rhs):  # -> (files, Result of the whole problem, Result of the decomposition)
+        files = write_subject(self.work_dir, rhs)
+        whole = solve(Formulator(self.work_dir, 'config.json'), 'branch_and_bound', 60)
+        result, num_components, sizes = decompose.run(Formulator(self.work_dir, 'config.json'), 'branch_and_bound', 60, 2)
+        self.assertEqual((num_components, sizes), (2, [NUM_TCS, NUM_TCS]))
+        self.assertEqual(whole.status, 'optimal')
+        return files, whole, result
+
+    def test_shared_budget(self):
+        # the optimal selections of the subproblems, each of them with the whole budget, meet it together
+        files, whole, result = self.run_both(40)
+        self.check_feasible(files, 40, result.selected_tcs)
+        self.assertEqual(result.status, 'optimal')
+        self.assertAlmostEqual(result.objective, whole.objective, places=6)
+
+    def test_split_budget(self):
+        # the budget is split between the subproblems, the merged selection is only feasible
+        files, whole, result = self.run_both(12)
+        self.check_feasible(files, 12, result.selected_tcs)
+        self.assertEqual(result.status, 'feasible')
+        self.assertTrue(result.objective >= whole.objective - 1e-6)
+
+    def test_unrepaired_split(self):
+        # no selection of the split budget is left: the whole problem is solved instead
+        files, whole, result = self.run_both(6)
+        self.check_feasible(files, 6, result.selected_tcs)
+        self.assertEqual(result.status, 'optimal')
+        self.assertAlmostEqual(result.objective, whole.objective, places=6)
+
+
+if __name__ == '__main__':
+    unittest.main()
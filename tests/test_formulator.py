@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import sys
+import json
+import glob
+import shutil
+import hashlib
+import tempfile
+import subprocess
+import unittest
+
+NEMO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, NEMO_DIR)
+
+from formulator import Formulator
+from writers import whole_model
+
+# the digest of the canonical model (see canonical) written by the formulator of the baseline commit for each
+# config of the subjects, e.g. {"example/config.linear.json": "0b5f...", ...}; regenerated by:
+#   git show <baseline commit>:formulator.py > /tmp/formulator.py
+#   python2 tests/test_formulator.py --baseline /tmp/formulator.py
+REFERENCES = os.path.join(NEMO_DIR, 'tests', 'formulator.baseline.json')
+SUBJECTS = ['example'] + sorted(os.path.relpath(d, NEMO_DIR) for d in glob.glob(os.path.join(NEMO_DIR, 'subject_programs', '*')))
+BASELINE_FORMATS = ['cplex_lp', 'lp_solve', 'ampl']
+CTYPES = {'<=': '<=', '=<': '<=', '<': '<', '>=': '>=', '=>': '>=', '>': '>', '=': '=', '==': '='}
+MPS_CTYPES = {'L': '<=', 'G': '>=', 'E': '='}
+
+
+def is_baseline_model(config):
+    # the models of Linear are the ones of the baseline; Nemo-Aux has one v_ variable per crio_id instead of
+    # one per test case and crio_id (user-022), and the objective of Nemo-Nonlinear is not parsed here
+    return not config['nonlinear']
+
+
+def get_formats(config):  # every output format of the approach of the config, but mints (integer coefficients)
+    if config['nonlinear'] and not config['relax']:
+        return []
+    return ['cplex_lp', 'lp_solve', 'ampl', 'mps']
+
+
+def parse_terms(expr):  # e.g. '0.25 t2 + 0.25*t3-t1' -> [(0.25, 't2'), (0.25, 't3'), (-1.0, 't1')]
+    expr = re.sub(r'[\s*]', '', expr)
+    terms = re.findall(r'([+-]?)(\d*\.?\d*(?:e[+-]?\d+)?)([A-Za-z_]\w*)', expr)
+    assert ''.join(''.join(term) for term in terms) == expr, 'cannot parse: %s' % expr
+    return [(float(sign + (coeff or '1')), var) for sign, coeff, var in terms]
+
+
+def parse_row(row):  # e.g. 'v_0_1-t2<=0' -> ([(1.0, 'v_0_1'), (-1.0, 't2')], '<=', 0.0)
+    m = re.match(r'^(.*?)(<=|>=|=<|=>|==|<|>|=)(.*)$', row.replace(' ', ''))
+    terms = parse_terms(m.group(1))
+    try:
+        rhs = float(m.group(3))
+    except ValueError:  # a variable on the rhs, e.g. v_X1Z_2_1<=t2 of the baseline lp_solve and ampl
+        terms += [(-coeff, var) for coeff, var in parse_terms(m.group(3))]
+        rhs = 0.0
+    return terms, CTYPES[m.group(2)], rhs
+
+
+def parse_lp(path):  # the (sense, objective terms, rows) of a cplex_lp, lp_solve, or ampl model file
+    with open(path, 'r') as f:
+        text = f.read()
+    if path.endswith('.cplex.lp'):
+        sense = 'min' if text.startswith('minimize') else 'max'
+        objective = text[len(sense + 'imize'):text.index('subject to')]
+        rows = text[text.index('subject to') + len('subject to'):text.index('\nbinary') if '\nbinary' in text else text.index('\nend')]
+        return sense, parse_terms(objective.replace('\n', ' ')), [parse_row(r) for r in rows.split('\n') if r.strip()]
+    if path.endswith('.lp_solve'):
+        lines = [l for l in text.split('\n') if l and not l.startswith('/*') and not l.startswith('int ')]
+        sense, objective = lines[0].rstrip(';').split(':', 1)
+        rows = [l.rstrip(';') for l in lines[1:] if not re.match(r'^0<=\w+<=1;$', l)]
+        return sense, parse_terms(objective), [parse_row(r) for r in rows]
+    lines = [l for l in text.split('\n') if l and not l.startswith('var ')]
+    sense, objective = lines[0].rstrip(';').split(' obj:', 1)
+    rows = [l.rstrip(';').split(': ', 1)[1] for l in lines[1:]]
+    return sense[:3], parse_terms(objective), [parse_row(r) for r in rows]
+
+
+def parse_mps(path):  # the (sense, objective terms, rows) of a free MPS model file
+    sense = 'min'
+    ctypes = dict()
+    terms = dict()  # row -> [(coefficient, variable)]
+    rhs = dict()
+    section = None
+    with open(path, 'r') as f:
+        for line in f:
+            fields = line.split()
+            if not line.startswith(' '):
+                section = fields[0]
+            elif section == 'OBJSENSE':
+                sense = fields[0].lower()
+            elif section == 'ROWS':
+                ctypes[fields[1]] = fields[0]
+            elif section == 'COLUMNS' and fields[1] != "'MARKER'":
+                terms.setdefault(fields[1], list()).append((float(fields[2]), fields[0]))
+            elif section == 'RHS':
+                rhs[fields[1]] = float(fields[2])
+    rows = [(terms.get(r, list()), MPS_CTYPES[t], rhs.get(r, 0.0)) for r, t in ctypes.items() if t != 'N']
+    return sense, terms.get('obj', list()), rows
+
+
+def canonical(sense, objective, rows):
+    # the model up to the order of the terms and of the rows, the formatting of the numbers, and the strict rows
+    # written as <= and >= (e.g. 2t1+3t2<5 -> 2t1+3t2<=4)
+    def collect(terms, fmt):
+        coeffs = dict()
+        for coeff, var in terms:
+            coeffs[var] = coeffs.get(var, 0.0) + coeff
+        return sorted((var, fmt % coeff) for var, coeff in coeffs.items() if fmt % coeff != fmt % 0)
+    obj = collect(objective, '%0.6f')
+    out_rows = list()
+    for terms, ctype, rhs in rows:
+        if ctype in ['<', '>'] and all(c == int(c) for c, _ in terms) and rhs == int(rhs):
+            ctype, rhs = ('<=', rhs - 1) if ctype == '<' else ('>=', rhs + 1)
+        out_rows.append([collect(terms, '%g'), ctype, '%g' % rhs])
+    return [sense, obj, sorted(out_rows)]
+
+
+def get_digest(path):  # the md5 of the canonical model of a model file
+    model = canonical(*(parse_mps(path) if path.endswith('.mps') else parse_lp(path)))
+    return hashlib.md5(json.dumps(model, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def load_config(subject, config_path, work_dir):
+    for path in glob.glob(os.path.join(NEMO_DIR, subject, '*.info')):
+        shutil.copy(path, work_dir)
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+    config.pop('cache', None)
+    return config
+
+
+def formulate(subject, config_path, work_dir, changes=None):
+    # -> {model file: digest} of every format of the config, with the given changes, if any
+    config = load_config(subject, config_path, work_dir)
+    config.update(changes or dict())
+    formats = get_formats(config)
+    digests = dict()
+    # the formats written from a ModelStream, then the ones needing the whole Model (e.g. mps)
+    for group in [[fmt for fmt in formats if fmt not in whole_model], [fmt for fmt in formats if fmt in whole_model]]:
+        if not group:
+            continue
+        config['output_format'] = group
+        formulator = Formulator(work_dir, None, config=config)
+        formulator.gen_model()
+        for out_path in formulator.out_paths:
+            digests[os.path.basename(out_path)] = get_digest(out_path)
+    return digests
+
+
+def formulate_baseline(formulator_path, subject, config_path, work_dir):  # -> the digest of the baseline model
+    config = load_config(subject, config_path, work_dir)
+    digests = set()
+    for fmt in BASELINE_FORMATS:
+        config['output_format'] = fmt
+        with open(os.path.join(work_dir, 'config.json'), 'w') as f:
+            json.dump(config, f)
+        assert subprocess.call([sys.executable, formulator_path, work_dir, 'config.json']) == 0
+        suffix = {'cplex_lp': '.cplex.lp', 'lp_solve': '.lp_solve', 'ampl': '.ampl'}[fmt]
+        digests.add(get_digest(os.path.join(work_dir, config['name'] + suffix)))
+    assert len(digests) == 1, 'the formats of the baseline differ for %s' % config_path
+    return digests.pop()
+
+
+def get_config_paths(subject):
+    return sorted(glob.glob(os.path.join(NEMO_DIR, subject, 'config*.json')))
+
+
+def get_key(subject, config_path):  # e.g. example/config.linear.json
+    return subject + '/' + os.path.basename(config_path)
+
+
+class FormulatorTest(unittest.TestCase):
+    # every model file of a config is the same model as the one of the baseline (if any, see is_baseline_model),
+    # and as the other model files of the config
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        with open(REFERENCES, 'r') as f:
+            self.references = json.load(f)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def check(self, subject):
+        for config_path in get_config_paths(subject):
+            key = get_key(subject, config_path)
+            digests = formulate(subject, config_path, self.work_dir)
+            if not digests:
+                continue
+            self.assertEqual(len(set(digests.values())), 1, '%s: %s' % (key, digests))
+            with open(config_path, 'r') as f:
+                if is_baseline_model(json.load(f)):
+                    self.assertEqual(list(digests.values())[0], self.references[key], key)
+
+
+    def test_strict_rows(self):
+        # t1+t2+t3<3 is t1+t2+t3<=2 in every format, as for the backends (see Model.iter_bounds)
+        config_path = os.path.join(NEMO_DIR, 'example', 'config.3.linear.json')
+        with open(config_path, 'r') as f:
+            absolute_cria = json.load(f)['absolute_cria']
+        absolute_cria[0].update(crio_type='<', rhs=3)
+        digests = formulate('example', config_path, self.work_dir, dict(absolute_cria=absolute_cria))
+        self.assertEqual(set(digests.values()), set([self.references['example/config.3.linear.json']]), digests)
+
+
+def add_test(subject):  # one test per subject, e.g. test_subject_programs_flex_v5
+    def test(self):
+        self.check(subject)
+    setattr(FormulatorTest, 'test_' + subject.replace('/', '_').replace(os.sep, '_'), test)
+
+
+for subject in SUBJECTS:
+    add_test(subject)
+
+
+if __name__ == '__main__':
+    if '--baseline' in sys.argv:
+        formulator_path = os.path.abspath(sys.argv[sys.argv.index('--baseline') + 1])
+        references = dict()
+        for subject in SUBJECTS:
+            for config_path in get_config_paths(subject):
+                work_dir = tempfile.mkdtemp()
+                with open(config_path, 'r') as f:
+                    if is_baseline_model(json.load(f)):
+                        references[get_key(subject, config_path)] = \
+                            formulate_baseline(formulator_path, subject, config_path, work_dir)
+                shutil.rmtree(work_dir)
+        with open(REFERENCES, 'w') as f:
+            json.dump(references, f, indent=2, sort_keys=True, separators=(',', ': '))
+            f.write('\n')
+        print('References: %s (%d configs)' % (REFERENCES, len(references)))
+    else:
+        unittest.main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import glob
+import shutil
+import tempfile
+import unittest
+
+NEMO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, NEMO_DIR)
+
+import incremental
+from formulator import Formulator
+from batch import solve
+
+# t1 also covers the statement 2, and t4 is added
+DIFF = '''--- a/cov.info
++++ b/cov.info
+@@ -1,3 +1,4 @@
+-t1:1
++t1:1 2
+ t2:2 3
+ t3:1 3
++t4:3
+'''
+
+
+class IncrementalTest(unittest.TestCase):
+    # a diff is applied to the state of the previous run only if it is the change of the files since then,
+    # otherwise the problem is solved from scratch
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        for path in glob.glob(os.path.join(NEMO_DIR, 'example', '*.info')) + \
+                [os.path.join(NEMO_DIR, 'example', 'config.linear.json')]:
+            shutil.copy(path, self.work_dir)
+        with open(os.path.join(self.work_dir, 'change.diff'), 'w') as f:
+            f.write(DIFF)
+        result, _, _, _, reason = incremental.run(self.work_dir, 'config.linear.json', None, 'greedy')
+        self.assertEqual(reason, 'no previous run')
+        self.assertEqual(result.status, 'feasible')
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def change(self):  # cov.info after DIFF
+        with open(os.path.join(self.work_dir, 'cov.info'), 'w') as f:
+            f.write('t1:1 2\nt2:2 3\nt3:1 3\nt4:3\n')
+
+    def check_scratch(self, result):  # the result is the one of the changed files solved from scratch
+        expected = solve(Formulator(self.work_dir, 'config.linear.json'), 'greedy', 60)
+        self.assertEqual((result.status, sorted(result.selected_tcs)), (expected.status, sorted(expected.selected_tcs)))
+        self.assertAlmostEqual(result.objective, expected.objective, places=6)
+
+    def test_applied_diff(self):
+        self.change()
+        result, _, num_lines, _, reason = incremental.run(self.work_dir, 'config.linear.json', 'change.diff', 'greedy')
+        self.assertEqual((reason, num_lines), (None, 2))
+        self.check_scratch(result)
+
+    def test_stale_diff(self):
+        # the diff was already applied by the previous run, its removed line is not the one of the state
+        self.change()
+        incremental.run(self.work_dir, 'config.linear.json', 'change.diff', 'greedy')
+        result, _, _, _, reason = incremental.run(self.work_dir, 'config.linear.json', 'change.diff', 'greedy')
+        self.assertEqual(reason, 'cov.info: the removed line of t1 is not the one of the previous run')
+        self.check_scratch(result)
+
+    def test_missing_state(self):
+        # the state of fault.info, which is not in the diff, is missing
+        os.remove(incremental.get_state_path(self.work_dir, 'linear', 'fault.info'))
+        self.change()
+        result, _, _, _, reason = incremental.run(self.work_dir, 'config.linear.json', 'change.diff', 'greedy')
+        self.assertEqual(reason, 'fault.info: no parsed file in the previous run')
+        self.check_scratch(result)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import sys
+import random
+import itertools
+import unittest
+
+NEMO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, NEMO_DIR)
+
+from model import Constraints
+from reducer import Reducer, is_satisfied
+
+
+def get_lhs(terms, selected):  # e.g. (['3t1', 't2'], set(['t1'])) -> 3.0
+    lhs = 0.0
+    for term in terms:
+        m = re.match(r'^([+-]?\d*)(t\w+)$', term)
+        coeff = m.group(1)
+        if m.group(2) in selected:
+            lhs += float(coeff) if coeff not in ['', '+', '-'] else float(coeff + '1')
+    return lhs
+
+
+def get_optimum(tc_list, tc_to_coeff, rows, sign):
+    # the best objective (sign 1: min, -1: max) over every selection meeting the rows, None if there is none
+    best = None
+    for bits in itertools.product([0, 1], repeat=len(tc_list)):
+        selected = set(tc for tc, b in zip(tc_list, bits) if b)
+        if all(is_satisfied(get_lhs(terms, selected), ctype, rhs) for terms, ctype, rhs in rows):
+            value = sum([tc_to_coeff.get(tc, 0) for tc in selected])
+            if best is None or sign * value < sign * best:
+                best = value
+    return best
+
+
+def get_instance(rng):  # a random model of up to 7 test cases: coverage rows and a budget row
+    n = rng.randint(1, 7)
+    tc_list = ['t%d' % (i + 1) for i in range(n)]
+    tc_to_coeff = dict((tc, float(rng.randint(1, 4))) for tc in tc_list)
+    rows = [(sorted(rng.sample(tc_list, rng.randint(1, n))), '>=', 1) for _ in range(rng.randint(1, 6))]
+    budget = sorted(rng.sample(tc_list, rng.randint(1, n)))
+    rows.append((['%d%s' % (rng.randint(1, 6), tc) for tc in budget], rng.choice(['<=', '<', '>=']), rng.randint(0, 10)))
+    return tc_list, tc_to_coeff, rows, rng.choice(['min', 'max'])
+
+
+class ReducerTest(unittest.TestCase):
+    # the reduced model has the same optimum as the original one (plus the coefficients of the test cases
+    # fixed to 1), and is rejected if the test cases fixed by the reduction violate a row
+    def check(self, tc_list, tc_to_coeff, rows, min_or_max):
+        sign = 1 if min_or_max == 'min' else -1
+        expected = get_optimum(tc_list, tc_to_coeff, rows, sign)
+        constraints = Constraints()
+        for terms, ctype, rhs in rows:
+            constraints.add(terms, ctype, rhs)
+        reducer = Reducer(tc_list, dict(tc_to_coeff), constraints, min_or_max, True)
+        try:
+            reduced_tcs, reduced_coeffs, reduced_rows = reducer.reduce()
+        except ValueError:
+            self.assertEqual(expected, None, (tc_list, tc_to_coeff, rows, min_or_max))
+            return
+        reduced_rows = [(terms, ctype, rhs) for terms, (_, ctype, rhs) in zip(reduced_rows.terms, reduced_rows.rows)]
+        optimum = get_optimum(reduced_tcs, reduced_coeffs, reduced_rows, sign)
+        if optimum is not None:  # plus the coefficients of the test cases fixed to 1
+            optimum += sum([tc_to_coeff[tc] for tc in reducer.get_mapping()['fixed_to_one']])
+        self.assertEqual(optimum, expected, (tc_list, tc_to_coeff, rows, min_or_max))
+
+    def test_fixed_budget(self):
+        # t1 and t2 are essential, so the budget is left as 8<=4: infeasible, as the original model
+        self.check(['t1', 't2'], {'t1': 1.0, 't2': 1.0}, [(['t1'], '>=', 1), (['t2'], '>=', 1), (['3t1', '5t2'], '<=', 4)], 'min')
+
+    def test_random(self):
+        rng = random.Random(0)
+        for _ in range(300):
+            self.check(*get_instance(rng))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import sys
+import glob
+import json
+import random
+import itertools
+import shutil
+import tempfile
+import unittest
+
+NEMO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, NEMO_DIR)
+
+from formulator import Formulator
+from solver import Solver, NemoSolver
+
+# the configs whose optimum the heuristics of Solver find; on config.3.nemo-aux.json they select t2 and t3 (1.75),
+# the optimum is t1 and t2 (2.0); the ones of NemoSolver find the optimum of every example config
+EXACT = ['config.linear.json', 'config.3.linear.json', 'config.nemo-aux.json', 'config.nemo-nonlinear.json']
+ALGORITHMS = Solver.algorithms + NemoSolver.algorithms
+TIME_LIMIT = 2  # of the algorithms of NemoSolver, in seconds
+NUM_TCS = 10  # test cases of the random instances, enumerated
+
+
+def get_optimum(subject, name):
+    # the objective of the solution of the subject solved by CPLEX or Couenne, e.g. 0.5 of example/linear.sol.cplex
+    path = glob.glob(os.path.join(NEMO_DIR, subject, name + '.sol.*'))[0]
+    with open(path, 'r') as f:
+        text = f.read()
+    m = re.search(r'Objective =\s*(\S+)', text) or re.search(r'best objective (\S+),', text)
+    return float(m.group(1))
+
+
+def read_info(path):  # e.g. t2:2 3 -> {'t2': ['2', '3']}
+    tc_to_ids = dict()
+    with open(path, 'r') as f:
+        for line in f:
+            if ':' in line:
+                tc, c_str = line.split(':', 1)
+                tc_to_ids[tc.strip()] = c_str.split()
+    return tc_to_ids
+
+
+def write_instance(work_dir, rng):  # random criterion files of 10 test cases, for the configs of example
+    files = dict((fname, list()) for fname in ['cov.info', 'fault.info', 'rtime.info'])
+    for i in range(NUM_TCS):
+        tc = 't%d' % (i + 1)
+        files['cov.info'].append('%s:%s' % (tc, ' '.join(str(c) for c in sorted(rng.sample(range(1, 9), rng.randint(1, 3))))))
+        files['fault.info'].append('%s:%s' % (tc, ' '.join(str(c) for c in sorted(rng.sample(range(1, 5), rng.randint(1, 2))))))
+        files['rtime.info'].append('%s:%d' % (tc, rng.randint(1, 4)))
+    for fname, lines in files.items():
+        with open(os.path.join(work_dir, fname), 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+
+def enumerate_optimum(s):  # the optimum of the objective of a NemoSolver over every selection of test cases
+    best = None
+    for bits in itertools.product([0, 1], repeat=len(s.tc_list)):
+        state = s.new_state([i for i, b in enumerate(bits) if b])
+        within = all(not (ctype in ['<=', '='] and u > rhs) and not (ctype == '<' and u >= rhs)
+                     for (_, ctype, rhs), u in zip(s.budgets, state['used']))
+        if within and s.is_feasible(state) and (best is None or state['value'] < best):
+            best = state['value']
+    return s.sign * best
+
+
+class SolverTest(unittest.TestCase):
+    # the heuristics find a selection meeting the criteria of the config, never better than the optimum
+    # of the config, and the optimum itself on the configs of EXACT; branch_and_bound proves the optimum
+    # of the small problems
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def solve(self, subject, config_fname, algorithm):  # -> (config, selected test cases, status, objective)
+        for path in glob.glob(os.path.join(NEMO_DIR, subject, '*.info')) + [os.path.join(NEMO_DIR, subject, config_fname)]:
+            shutil.copy(path, self.work_dir)
+        formulator = Formulator(self.work_dir, config_fname)
+        s = NemoSolver(formulator, TIME_LIMIT) if algorithm in NemoSolver.algorithms else Solver(formulator)
+        selected_tcs, status = s.solve(algorithm)
+        return formulator.config, selected_tcs, status, s.get_objective(selected_tcs)
+
+    def check_feasible(self, config, selected_tcs):
+        # every crio_id of a coverage criterion is covered, and the budgets are not exceeded
+        for crio in config['absolute_cria']:
+            tc_to_ids = read_info(os.path.join(self.work_dir, crio['file']))
+            if not crio['is_coefficient']:
+                covered = set(c for tc in selected_tcs for c in tc_to_ids[tc])
+                self.assertEqual(covered, set(c for ids in tc_to_ids.values() for c in ids), crio['file'])
+            else:
+                used = sum([float(tc_to_ids[tc][0]) for tc in selected_tcs])
+                self.assertTrue(used <= crio['rhs'] if crio['crio_type'] == '<=' else used >= crio['rhs'], crio['file'])
+
+    def check(self, subject, config_fname, algorithm, exact):
+        config, selected_tcs, status, objective = self.solve(subject, config_fname, algorithm)
+        key = '%s/%s %s' % (subject, config_fname, algorithm)
+        self.assertEqual(status, 'optimal' if algorithm == 'branch_and_bound' and subject == 'example' else 'feasible', key)
+        self.check_feasible(config, selected_tcs)
+        optimum = get_optimum(subject, config['name'])
+        if exact:
+            self.assertAlmostEqual(objective, optimum, places=6, msg=key)
+        elif 'min' in config['min_or_max']:
+            self.assertTrue(objective >= optimum - 1e-6, key)
+        else:
+            self.assertTrue(objective <= optimum + 1e-6, key)
+
+    def test_example(self):
+        for config_path in sorted(glob.glob(os.path.join(NEMO_DIR, 'example', 'config*.json'))):
+            config_fname = os.path.basename(config_path)
+            for algorithm in ALGORITHMS:
+                self.check('example', config_fname, algorithm, config_fname in EXACT or algorithm in NemoSolver.algorithms)
+
+    def test_flex(self):  # against the optimum of CPLEX, e.g. 37.945952 for Linear, reached by local_search
+        for config_fname in ['config.linear.json', 'config.nemo-aux.json']:
+            for algorithm in ALGORITHMS:
+                self.check(os.path.join('subject_programs', 'flex_v5'), config_fname, algorithm,
+                           config_fname == 'config.linear.json' and algorithm == 'local_search')
+
+    def test_branch_and_bound(self):
+        # random instances of the configs of example (with a budget of 6 for rtime.info), against the enumeration
+        rng = random.Random(0)
+        for _ in range(5):
+            write_instance(self.work_dir, rng)
+            for config_path in sorted(glob.glob(os.path.join(NEMO_DIR, 'example', 'config*.json'))):
+                with open(config_path, 'r') as f:
+                    config = json.load(f)
+                for crio in config['absolute_cria']:
+                    if crio['is_coefficient']:
+                        crio['rhs'] = 6
+                with open(os.path.join(self.work_dir, 'config.json'), 'w') as f:
+                    json.dump(config, f)
+                optimum = enumerate_optimum(NemoSolver(Formulator(self.work_dir, 'config.json')))
+                for algorithm in NemoSolver.algorithms:
+                    s = NemoSolver(Formulator(self.work_dir, 'config.json'), TIME_LIMIT)
+                    selected_tcs, status = s.solve(algorithm)
+                    objective = s.get_objective(selected_tcs)
+                    key = '%s %s' % (config['name'], algorithm)
+                    self.check_feasible(config, selected_tcs)
+                    if algorithm == 'branch_and_bound':
+                        self.assertEqual(status, 'optimal', key)
+                        self.assertAlmostEqual(objective, optimum, places=6, msg=key)
+                    else:
+                        self.assertEqual(status, 'feasible', key)
+                        self.assertTrue(s.sign * objective >= s.sign * optimum - 1e-6, key)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+
+import json
+import array
+from collections import OrderedDict
+
+from model import format_number
+
+WRITE_BUFFER = 1 << 20  # bytes buffered by the model writers
+
+# the writers of the model files, by output format: write(model, formulator) -> the path of the model file;
+# each of them reads the Model of model.py, so that one formulation is written in several formats
+# ("output_format": ["cplex_lp", "mps"]), and gets the paths of its files from formulator.get_out_path.
+# The rows are read once in order, from a ModelStream generating them one at a time, except by the writers
+# registered with whole=True (e.g. mps, by column), which need the rows of the whole Model in memory
+writers = OrderedDict()
+whole_model = set()  # the output formats needing the whole Model
+
+
+def writer(name, whole=False):
+    def register(write):
+        writers[name] = write
+        if whole:
+            whole_model.add(name)
+        return write
+    return register
+
+
+def get_writer(name):
+    assert name in writers, 'not implemented yet: %s' % name
+    return writers[name]
+
+
+def get_formats(config):  # e.g. "cplex_lp" -> ['cplex_lp'], ["cplex_lp", "mps"] -> ['cplex_lp', 'mps']
+    formats = config['output_format']
+    return formats if isinstance(formats, list) else [formats]
+
+
+def needs_whole_model(config):  # e.g. ["cplex_lp", "mps"] -> True
+    return any(name in whole_model for name in get_formats(config))
+
+
+def write_linear_objective(f, model, separator):  # e.g. 0.750000*t1+0.250000*t2, or 0 without a term
+    first = True
+    for i, coeff in model.iter_objective():
+        coeff_str = '%0.6f' % coeff
+        if not first and coeff_str[0] != '-':
+            f.write('+')
+        f.write(coeff_str + separator + model.names[i])
+        first = False
+    if first:
+        f.write('0')
+
+
+@writer('lp_solve')
+def write_lp_solve(model, formulator):
+    assert model.expression is None
+    out_path = formulator.get_out_path('.lp_solve')
+    with open(out_path, 'w', WRITE_BUFFER) as f:
+        # objctive function
+        f.write('/*objective function*/\n')
+        f.write(formulator.config['min_or_max'] + ': ')
+        write_linear_objective(f, model, ' ')
+        f.write(';\n')
+        # constraints
+        f.write('/* constraints */\n')
+        for indices, coeffs, ctype, rhs in model.iter_rows():
+            f.write(model.get_lhs(indices, coeffs) + ctype + format_number(rhs) + ';\n')
+        tcs = model.names[:model.num_tcs]
+        for tc in tcs:
+            f.write('0<=' + tc + '<=1;\n')
+        # assign variables as binary would make variables in single-variable equation (e.g. t2 >=1) are 'redefined'
+        # by the solver when solving the equations and therefore produce wrong answer'
+        # (no declaration if the reduction fixed every test case)
+        f.write('/* variables */\n')
+        if tcs:
+            f.write('int ' + ','.join(tcs) + ';\n')
+    return out_path
+
+
+@writer('cplex_lp')
+def write_cplex_lp(model, formulator):
+    assert model.expression is None
+    out_path = formulator.get_out_path('.cplex.lp')
+    with open(out_path, 'w', WRITE_BUFFER) as f:
+        # objctive function
+        if model.minimize:
+            f.write('minimize\n\n')
+        else:
+            f.write('maximize\n\n')
+        # 500 terms per line
+        num_terms = 0
+        for i, coeff in model.iter_objective():
+            coeff_str = '%0.6f' % coeff
+            if coeff_str[0] != '-':
+                coeff_str = '+' + coeff_str
+            if num_terms % 500 != 0:
+                f.write(' ')
+            f.write(coeff_str + ' ' + model.names[i])
+            num_terms += 1
+            if num_terms % 500 == 0:
+                f.write('\n')
+        if num_terms == 0:  # e.g. every test case fixed by the reduction
+            f.write('0')
+        f.write('\n')
+        f.write('\n')
+        # constraints
+        f.write('subject to\n\n')
+        for indices, coeffs, ctype, rhs in model.iter_rows():
+            f.write(model.get_lhs(indices, coeffs) + ctype + format_number(rhs) + '\n')
+        f.write('\n')
+        # variable declaration, 500 variables per line
+        if model.names:
+            f.write('binary\n\n')
+            for k, var in enumerate(model.names):
+                if k % 500 != 0:
+                    f.write(' ')
+                f.write(var)
+                if (k + 1) % 500 == 0:
+                    f.write('\n')
+            f.write('\n')
+        f.write('\nend')
+    return out_path
+
+
+def write_ampl_rows(f, model):
+    # constraints
+    for c_no, (indices, coeffs, ctype, rhs) in enumerate(model.iter_rows()):
+        f.write('subject to c%d: %s;\n' % (c_no + 1, model.get_lhs(indices, coeffs) + ctype + format_number(rhs)))
+
+
+@writer('ampl')
+def write_ampl(model, formulator):
+    assert model.expression is None
+    out_path = formulator.get_out_path('.ampl')
+    with open(out_path, 'w', WRITE_BUFFER) as f:
+        # var declaration
+        for var in model.names:
+            f.write('var %s binary;\n' % var)
+        # objective func
+        if model.minimize:
+            f.write('minimize obj:')
+        else:
+            f.write('maximize obj:')
+        write_linear_objective(f, model, '*')
+        f.write(';\n')
+        write_ampl_rows(f, model)
+    return out_path
+
+
+@writer('couenne_ampl')
+def write_couenne_ampl(model, formulator):  # ampl format
+    assert formulator.config['nonlinear']
+    assert not formulator.config['relax']
+    assert model.expression is not None
+    out_path = formulator.get_out_path('.ampl')
+    with open(out_path, 'w', WRITE_BUFFER) as f:
+        # var declaration
+        for var in model.names:
+            f.write('var %s binary;\n' % var)
+        # the defined variables of the objective, each of them after the variables of its expression
+        for var, expression in model.expression.iter_defined():
+            f.write('var %s = %s;\n' % (var, expression))
+        if model.minimize:
+            f.write('minimize obj:')
+        else:
+            f.write('maximize obj:')
+        # objctive function, one term per line
+        first = True
+        for term in model.expression.iter_terms():
+            if first:
+                f.write(term[1:] if term[0] == '+' else term)
+                first = False
+            else:
+                f.write('\n' + term)
+        if first:
+            f.write('0')
+        f.write(';\n')
+        write_ampl_rows(f, model)
+    return out_path
+
+
+@writer('mints')
+def write_mints(model, formulator):
+    assert model.expression is None
+    # reorder and remap all test cases sequentially, x<new id> in the models: the new id of a test case
+    # is its variable id + 1
+    tcs = model.names[:model.num_tcs]
+    out_path = formulator.get_out_path('.mints.mapping.json')
+    with open(out_path, 'w') as f:
+        json.dump(OrderedDict((tc, i + 1) for i, tc in enumerate(tcs)), f, indent=2, sort_keys=True,
+                  separators=(',', ': '))
+    # objective function, the coefficients scaled to integers and indexed by new id
+    assert len(model.obj_vars) == len(tcs)
+    coeffs = [0] * len(tcs)
+    for i, coeff in zip(model.obj_vars, model.obj_coeffs):
+        coeffs[i] = int(coeff * 1000000)
+    sign = 1 if model.minimize else -1
+    # the dense files of MINTS (.relative, .absolute): one 0/1 column per test case in each row,
+    # unless "mints_dense": false; the sparse pseudo-Boolean model of minisat+ and opbdp (.opb):
+    # the nonzero terms only, e.g.
+    #   * #variable= 3 #constraint= 3
+    #   min: +750000 x1 +250000 x2 +250000 x3 ;
+    #   +1 x1 +1 x3 >= 1 ;
+    dense = formulator.config.get('mints_dense', True)
+    if dense:
+        out_path = formulator.get_out_path('.relative')
+        with open(out_path, 'w') as f:
+            f.write('1\n')
+            f.write(' '.join([str(coeff) for coeff in coeffs]) + '\n')
+        absolute = open(formulator.get_out_path('.absolute'), 'w', WRITE_BUFFER)
+    out_path = formulator.get_out_path('.opb')
+    with open(out_path, 'w', WRITE_BUFFER) as f:
+        f.write(' ' * 64 + '\n')  # the header, known once the constraints are written
+        if any(coeffs):  # the objective is optional
+            f.write('min:')
+            for i, coeff in enumerate(coeffs):
+                if coeff != 0:
+                    f.write(' %+d x%d' % (sign * coeff, i + 1))
+            f.write(' ;\n')
+        for indices, row_coeffs, ctype, rhs in model.iter_rows():
+            assert ctype == '>=' and rhs == 1 and all(c == 1 for c in row_coeffs)
+            newids = sorted([i + 1 for i in indices])
+            assert newids[-1] <= len(tcs)
+            f.write(' '.join(['+1 x%d' % i for i in newids]) + ' >= 1 ;\n')
+            if dense:
+                row = ['0'] * len(tcs)
+                for i in newids:
+                    row[i - 1] = '1'
+                absolute.write('b\n1\n')
+                absolute.write(' '.join(row) + '\n')
+        f.seek(0)
+        f.write(('* #variable= %d #constraint= %d' % (len(tcs), model.num_rows())).ljust(64))
+    if dense:
+        absolute.close()
+    return out_path
+
+
+@writer('mps', whole=True)
+def write_mps(model, formulator):
+    # free MPS, e.g.
+    #   NAME linear
+    #   ROWS
+    #    N obj
+    #    G c1
+    #   COLUMNS
+    #    MARKER 'MARKER' 'INTORG'
+    #    t1 obj 0.75 c1 1
+    #    MARKER 'MARKER' 'INTEND'
+    #   RHS
+    #    rhs c1 1
+    #   BOUNDS
+    #    BV bnd t1
+    #   ENDATA
+    # the rows are the bounds of Model.iter_bounds, as passed to the backends: a strict row over integer
+    # coefficients is written as <= rhs-1 or >= rhs+1 (e.g. 2t1+3t2<5 as L with rhs 4), otherwise rejected
+    assert model.expression is None
+    # the transpose of the objective and the rows, as arrays like the rows of the Model: the entries of
+    # variable i are col_start[i]:col_start[i + 1] of col_rows (0 for the objective, r for row c<r>)
+    # and col_coeffs, in order of row
+    objective = list(model.iter_objective())
+    col_start = array.array('i', [0]) * (len(model.names) + 1)
+    for i, _ in objective:
+        col_start[i + 1] += 1
+    for i in model.row_vars:
+        col_start[i + 1] += 1
+    for i in range(len(model.names)):
+        col_start[i + 1] += col_start[i]
+    col_rows = array.array('i', [0]) * col_start[-1]
+    col_coeffs = array.array('d', [0.0]) * col_start[-1]
+    free = col_start[:-1]  # variable id -> the next entry of its column
+
+    def add_entry(i, r, coeff):
+        col_rows[free[i]] = r
+        col_coeffs[free[i]] = coeff
+        free[i] += 1
+    for i, coeff in objective:
+        add_entry(i, 0, coeff)
+    out_path = formulator.get_out_path('.mps')
+    with open(out_path, 'w', WRITE_BUFFER) as f:
+        f.write('NAME %s\n' % formulator.config['name'])
+        if not model.minimize:
+            f.write('OBJSENSE\n    MAX\n')
+        f.write('ROWS\n N obj\n')
+        rhs = array.array('d')
+        for r, (indices, coeffs, lower, upper) in enumerate(model.iter_bounds()):
+            if lower == upper:
+                row_type = 'E'
+            elif upper == float('inf'):
+                row_type = 'G'
+            else:
+                row_type = 'L'
+            f.write(' %s c%d\n' % (row_type, r + 1))
+            rhs.append(upper if row_type == 'L' else lower)
+            for i, coeff in zip(indices, coeffs):
+                add_entry(i, r + 1, coeff)
+        f.write('COLUMNS\n')
+        f.write(" MARKER 'MARKER' 'INTORG'\n")
+        for i, var in enumerate(model.names):
+            if col_start[i] == col_start[i + 1]:
+                f.write(' %s obj 0\n' % var)
+            for k in range(col_start[i], col_start[i + 1]):
+                f.write(' %s %s %s\n' % (var, 'c%d' % col_rows[k] if col_rows[k] else 'obj', format_number(col_coeffs[k])))
+        f.write(" MARKER 'MARKER' 'INTEND'\n")
+        f.write('RHS\n')
+        for r, value in enumerate(rhs):
+            if value != 0:
+                f.write(' rhs c%d %s\n' % (r + 1, format_number(value)))
+        f.write('BOUNDS\n')
+        for var in model.names:
+            f.write(' BV bnd %s\n' % var)
+        f.write('ENDATA\n')
+    return out_path